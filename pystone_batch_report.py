@@ -0,0 +1,206 @@
+import os
+import re
+import csv
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Tuple, Iterable, Iterator, Optional
+
+from pystone_engine.catalog import Catalog
+from pystone_engine.data import DATA_FOLDER, lookup_name
+from pystone_engine.loader import get_catalog
+from pystone_engine.formatting import Segment, format_date_summary, segments_to_text
+from pystone_pdf import StreamingPdfWriter, export_segments_to_pdf
+from pystone_engine.template import render_template
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# รูปแบบผลลัพธ์: ไฟล์ละคน (txt/pdf) หรือ PDF ไฟล์เดียวต่อกันทั้งหมด
+OUTPUT_FORMATS = ('txt', 'pdf', 'pdf-single')
+
+# จำนวนลูกค้าต่อ 1 งานที่ส่งให้ Worker (ลด Overhead ของการส่งข้อมูลข้าม Process)
+DEFAULT_CHUNK_SIZE = 256
+
+# อักขระที่ใช้ในชื่อไฟล์ไม่ได้
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\s]+')
+
+Customer = Tuple[int, str, str] # (ลำดับ, ชื่อ, วดป.เกิด พ.ศ.)
+
+# =======================================================
+# INPUT
+# =======================================================
+
+def read_customers(path: str) -> List[Customer]:
+    """
+    อ่านรายชื่อลูกค้าจากไฟล์ CSV/Text บรรทัดละคน: "ชื่อ,DD/MM/YYYY" หรือ "DD/MM/YYYY"
+    ข้ามบรรทัดว่างและบรรทัดที่ขึ้นต้นด้วย #
+    """
+    customers = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            cells = [c.strip() for c in row if c.strip()]
+            if not cells or cells[0].startswith('#'):
+                continue
+            name, date_th = (cells[0], cells[1]) if len(cells) > 1 else ('', cells[0])
+            seq = len(customers) + 1
+            customers.append((seq, name or f"ลูกค้า {seq}", date_th))
+    return customers
+
+def safe_filename(seq: int, name: str) -> str:
+    return f"{seq:05d}_{_UNSAFE_FILENAME.sub('_', name).strip('_')[:60] or 'customer'}"
+
+# =======================================================
+# REPORT CONTENT
+# =======================================================
+
+def build_customer_report(name: str, date_th: str, catalog: Catalog) -> List[Segment]:
+    """
+    สร้างเอกสารคำแนะนำของลูกค้า 1 คน เป็น Segments (ข้อความ, tag)
+    ใช้เงื่อนไขเดียวกับการค้นหาโหมด วดป.เกิด ในหน้าหลัก (วัน/เดือน/ปีนักษัตร/ราศี + สีมงคล)
+
+    :raises ValueError: ถ้ารูปแบบวันที่ไม่ถูกต้อง
+    """
+    all_data = catalog.data
+    result = catalog.recommend(date_th)
+    auspice_result, matched, unlucky = result['auspice'], result['stones'], result['unlucky']
+    unlucky_count = result['unlucky_count']
+
+    day_info = next((d for d in all_data['days'] if d['id'] == auspice_result['day_id']), {})
+    lucky_color_ids = result['params'].get('lucky_color_ids', [])
+    lucky_names = ', '.join(lookup_name(all_data['colors'], c, 'name') for c in sorted(lucky_color_ids, key=int)) or '-'
+
+    segments = render_template('customer_report', {
+        'name': name,
+        'date_th': date_th,
+        'date_en': auspice_result['date_en'],
+        'summary': format_date_summary(auspice_result, all_data, unlucky_count),
+        'lucky_colors': lucky_names,
+        'unlucky_colors': day_info.get('unlucky_color', '-') or '-',
+        'match_count': len(matched),
+    })
+    segments.append(('\n', ''))
+
+    for stone in matched:
+        segments.append(('\n', ''))
+        for text, tag in catalog.detail(stone):
+            # หัวข้อของหินแต่ละก้อนเป็นหัวข้อรองของรายงาน
+            segments.append((text, 'subheader' if tag == 'header' else tag))
+        result = unlucky[stone['id']]
+        if result['is_unlucky']:
+            segments.extend([(f"❌ มีสีอัปมงคล: {result['unlucky_colors_found']}", 'key_detail'), ('\n', '')])
+    return segments
+
+# =======================================================
+# WORKER PROCESS
+# =======================================================
+# แคตตาล็อก (Lookup + Index + Cache รายละเอียดหิน) และฟอนต์ PDF กำหนดครั้งเดียวต่อ Worker ใน initializer แล้วใช้ซ้ำทุกงาน
+_WORKER_STATE: Dict[str, Any] = {}
+
+def _init_worker(data_folder: str, font_path: Optional[str] = None):
+    _WORKER_STATE['catalog'] = get_catalog(data_folder, strict=False)
+    _WORKER_STATE['font_path'] = font_path
+
+def _render_chunk(chunk: List[Customer], output_dir: Optional[str], fmt: str) -> List[Tuple[int, str, Any]]:
+    """
+    สร้างรายงานของลูกค้าหลายคนใน Worker
+    :return: List ของ (ลำดับ, สถานะ 'ok'/'error', path ไฟล์ | Segments | ข้อความ Error)
+    """
+    catalog = _WORKER_STATE['catalog']
+    results = []
+    for seq, name, date_th in chunk:
+        try:
+            segments = build_customer_report(name, date_th, catalog)
+            if output_dir is None:
+                results.append((seq, 'ok', segments)) # PDF ไฟล์เดียว: ให้ Process หลักเขียนต่อกัน
+                continue
+            path = os.path.join(output_dir, f"{safe_filename(seq, name)}.{fmt}")
+            if fmt == 'pdf':
+                export_segments_to_pdf(segments, path, font_path=_WORKER_STATE['font_path'], title=name)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(segments_to_text(segments))
+            results.append((seq, 'ok', path))
+        except Exception as e:
+            results.append((seq, 'error', f"{name} ({date_th}): {e}"))
+    return results
+
+def _chunks(customers: List[Customer], size: int) -> Iterator[List[Customer]]:
+    for start in range(0, len(customers), size):
+        yield customers[start:start + size]
+
+def _ordered_results(executor: ProcessPoolExecutor, chunks: Iterable[List[Customer]], window: int,
+                     output_dir: Optional[str], fmt: str) -> Iterator[Tuple[int, str, Any]]:
+    """ส่งงานเป็นหน้าต่างจำกัดจำนวน แล้วคืนผลตามลำดับเดิม (ไม่เก็บผลทั้งหมดไว้ในหน่วยความจำ)"""
+    pending = []
+    for chunk in chunks:
+        pending.append(executor.submit(_render_chunk, chunk, output_dir, fmt))
+        if len(pending) >= window:
+            yield from pending.pop(0).result()
+    for future in pending:
+        yield from future.result()
+
+# =======================================================
+# BATCH RUNNER
+# =======================================================
+
+def run_batch(customers: List[Customer], output: str, fmt: str = 'pdf', workers: Optional[int] = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, data_folder: str = DATA_FOLDER,
+              font_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    สร้างรายงานของลูกค้าทุกคนแบบขนานด้วย Process Pool
+
+    :param output: โฟลเดอร์ผลลัพธ์ (txt/pdf) หรือ path ไฟล์ PDF (pdf-single)
+    :return: สรุปผล {'written': จำนวนที่สำเร็จ, 'errors': [ข้อความ Error], 'pages': จำนวนหน้า (pdf-single)}
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"ไม่รองรับรูปแบบ: {fmt} (รองรับ {', '.join(OUTPUT_FORMATS)})")
+
+    workers = workers or os.cpu_count() or 1
+    window = workers * 2
+    summary = {'written': 0, 'errors': [], 'pages': 0}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_folder, font_path)) as executor:
+        chunks = _chunks(customers, chunk_size)
+        if fmt == 'pdf-single':
+            with StreamingPdfWriter(output, font_path=font_path, title='รายงานหินมงคล') as writer:
+                for _, status, payload in _ordered_results(executor, chunks, window, None, fmt):
+                    if status != 'ok':
+                        summary['errors'].append(payload)
+                        continue
+                    if summary['written']:
+                        writer.page_break() # ลูกค้าแต่ละคนเริ่มหน้าใหม่
+                    writer.write_segments(payload)
+                    summary['written'] += 1
+            summary['pages'] = len(writer.page_objs)
+        else:
+            os.makedirs(output, exist_ok=True)
+            for _, status, payload in _ordered_results(executor, chunks, window, output, fmt):
+                if status == 'ok':
+                    summary['written'] += 1
+                else:
+                    summary['errors'].append(payload)
+    return summary
+
+# =======================================================
+# COMMAND LINE
+# =======================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="สร้างรายงานหินมงคลรายบุคคลจากรายการ วดป.เกิด (แบบขนาน)")
+    parser.add_argument('input', help='ไฟล์ CSV/Text บรรทัดละคน: "ชื่อ,DD/MM/YYYY" หรือ "DD/MM/YYYY" (พ.ศ.)')
+    parser.add_argument('output', help='โฟลเดอร์ผลลัพธ์ หรือไฟล์ .pdf เมื่อใช้ --format pdf-single')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='pdf', dest='fmt')
+    parser.add_argument('--workers', type=int, default=None, help='จำนวน Process (ค่าเริ่มต้น: จำนวน CPU)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--data', default=DATA_FOLDER, help='โฟลเดอร์ข้อมูล JSON')
+    parser.add_argument('--font', default=None, help='ไฟล์ฟอนต์ TrueType สำหรับ PDF')
+    args = parser.parse_args()
+
+    customers = read_customers(args.input)
+    print(f"--- กำลังสร้างรายงาน {len(customers)} รายการ ({args.fmt}) ---")
+    result = run_batch(customers, args.output, args.fmt, args.workers, args.chunk_size, args.data, args.font)
+    print(f"✅ สร้างสำเร็จ {result['written']} รายการ" + (f" ({result['pages']} หน้า)" if args.fmt == 'pdf-single' else ''))
+    for message in result['errors']:
+        print(f"❌ {message}")
+    sys.exit(1 if result['errors'] else 0)
@@ -0,0 +1,409 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import platform
+import statistics
+import subprocess
+from collections import Counter
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from pystone_engine.data import DATA_FOLDER, DATA_FILES, STONES_FILE, load_all_data, save_stones
+from pystone_engine.index import RELATION_FIELDS, StoneIndex
+from pystone_engine.catalog import Catalog
+from pystone_engine.auspice import calculate_auspice_ids
+from pystone_engine.search import (
+    SearchParams, search_by_name, apply_auspice_filter, unlucky_notes,
+    condition_search_params, date_search_params, add_lucky_color_param,
+)
+from pystone_engine.formatting import format_stone_detail
+from pystone_engine.store import record_change, merge_save_stones
+from pystone_engine.records import compact_stones
+from pystone_engine.columns import ColumnStore
+from pystone_engine.memory import deep_sizeof
+from pystone_engine.validate import validate_catalog, id_registry
+from pystone_export import iter_export_rows, iter_column_rows
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_SEED = 2567
+DEFAULT_REPEAT = 3
+DEFAULT_OUTPUT = 'bench_results.json'
+BENCH_ROWS_PER_PAGE = 20  # ขนาดหน้าเริ่มต้นของตารางใน GUI
+DETAIL_SAMPLE_SIZE = 200  # จำนวนหินที่จัดรูปแบบรายละเอียดต่อรอบ
+
+TEXT_FIELDS = ('english_name', 'thai_name', 'other_names', 'description')
+
+# เงื่อนไขค้นหาที่ใช้วัดแต่ละโหมดของ filter_data (ค่าเดียวกันทุกขนาดเพื่อเทียบกันได้)
+BENCH_NAME_TERM = 'หิน'
+BENCH_GROUP_ID = 1
+BENCH_DATE_TH = '15/08/2530'
+BENCH_CONDITION = {'day_id': 1, 'month_id': 8, 'animal_id': 4, 'sign_id': 5}
+
+STARTUP_MODES = ('fast', 'eager') # PyStoneApp() (โหลดบน Background Thread) เทียบกับ PyStoneApp(load_all_data())
+STARTUP_TIMEOUT_S = 600
+
+# รันใน Process ใหม่ (นับเวลา Import ด้วย) ที่โฟลเดอร์ซึ่งมี data/ แล้วพิมพ์ผลเป็น JSON 1 บรรทัด
+# first_interaction_s: หน้าต่างถูกสร้างและ Event Loop ว่างครั้งแรก (ผู้ใช้เริ่มโต้ตอบได้)
+# data_ready_s: โหลดข้อมูล + Index เสร็จและตารางแสดงหน้าแรกแล้ว
+_STARTUP_SCRIPT = '''
+import sys, time, json
+start = time.perf_counter()
+import pystone_gui_app as gui
+app = gui.PyStoneApp(gui.load_all_data()) if sys.argv[1] == 'eager' else gui.PyStoneApp()
+marks = {}
+def first_idle():
+    marks['first_interaction_s'] = time.perf_counter() - start
+    wait_for_data()
+def wait_for_data():
+    if not app.data_loaded:
+        app.after(5, wait_for_data)
+        return
+    app.update_idletasks()
+    marks['data_ready_s'] = time.perf_counter() - start
+    print(json.dumps(marks))
+    app.destroy()
+app.after_idle(first_idle)
+app.mainloop()
+'''
+
+# =======================================================
+# SYNTHETIC CATALOG GENERATOR
+# =======================================================
+
+class CatalogProfile:
+    """
+    สถิติของแคตตาล็อกจริงที่ใช้สร้างข้อมูลจำลอง
+    - จำนวน ID ต่อฟิลด์ความสัมพันธ์ และความถี่ของแต่ละ ID (ทุก ID ใน Lookup มีโอกาสถูกเลือก)
+    - ความยาวข้อความแต่ละฟิลด์ และคลังคำ (ตัดตามช่องว่าง) สำหรับประกอบข้อความไทย/อังกฤษ
+    """
+    def __init__(self, all_data: Dict[str, Any]):
+        stones = all_data['stones']
+        self.id_counts: Dict[str, List[int]] = {}
+        self.id_choices: Dict[str, Tuple[List[int], List[int]]] = {}
+        for field, lookup_key in RELATION_FIELDS.items():
+            per_stone = [str(s.get(field, '')).split() for s in stones]
+            self.id_counts[field] = [len(ids) for ids in per_stone] or [1]
+            frequency = Counter(int(i) for ids in per_stone for i in ids if i.isdigit())
+            valid_ids = [item['id'] for item in all_data.get(lookup_key, [])] or sorted(frequency)
+            # +1 ให้ ID ที่ไม่เคยถูกใช้ยังมีโอกาสปรากฏ
+            self.id_choices[field] = (valid_ids, [frequency.get(i, 0) + 1 for i in valid_ids])
+
+        self.text_lengths: Dict[str, List[int]] = {}
+        self.words: Dict[str, List[str]] = {}
+        for field in TEXT_FIELDS:
+            values = [str(s.get(field, '')) for s in stones]
+            self.text_lengths[field] = [len(v) for v in values] or [10]
+            self.words[field] = [w for v in values for w in v.split()] or ['-']
+
+    def relation_ids(self, rng: random.Random, field: str) -> str:
+        valid_ids, weights = self.id_choices[field]
+        count = min(rng.choice(self.id_counts[field]), len(valid_ids))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(rng.choices(valid_ids, weights, k=count - len(chosen)))
+        return ' '.join(str(i) for i in sorted(chosen))
+
+    def text(self, rng: random.Random, field: str) -> str:
+        target = rng.choice(self.text_lengths[field])
+        words, length = [], -1
+        while length < target:
+            word = rng.choice(self.words[field])
+            words.append(word)
+            length += len(word) + 1
+        return ' '.join(words)
+
+def generate_stones(size: int, seed: int = DEFAULT_SEED, base_path: str = DATA_FOLDER) -> List[Dict[str, Any]]:
+    """
+    สร้างรายการหินจำลอง size รายการ (ผลเหมือนเดิมทุกครั้งเมื่อใช้ seed เดิม)
+    ID ความสัมพันธ์อ้างอิง Lookup ใน base_path เสมอ ลำดับ Key ตรงกับ stones_main_data.json
+    """
+    profile = CatalogProfile(load_all_data(base_path))
+    rng = random.Random(seed)
+    stones = []
+    for stone_id in range(1, size + 1):
+        stone = {
+            'id': stone_id,
+            'english_name': f"{profile.text(rng, 'english_name')} {stone_id}",
+            'thai_name': f"{profile.text(rng, 'thai_name')} {stone_id}",
+            'other_names': profile.text(rng, 'other_names'),
+            'description': profile.text(rng, 'description'),
+        }
+        for field in RELATION_FIELDS:
+            stone[field] = profile.relation_ids(rng, field)
+        stones.append(stone)
+    return stones
+
+def write_catalog(stones: List[Dict[str, Any]], target_path: str, base_path: str = DATA_FOLDER):
+    """เขียนโฟลเดอร์ข้อมูลที่ใช้กับ --data ได้ทันที (หินจำลอง + สำเนาไฟล์ Lookup จาก base_path)"""
+    os.makedirs(target_path, exist_ok=True)
+    for filename in DATA_FILES:
+        if filename != STONES_FILE and os.path.exists(os.path.join(base_path, filename)):
+            shutil.copyfile(os.path.join(base_path, filename), os.path.join(target_path, filename))
+    save_stones(stones, target_path)
+
+# =======================================================
+# HEADLESS OPERATIONS (ขั้นตอนเดียวกับ PyStoneApp โดยไม่สร้างหน้าต่าง)
+# =======================================================
+
+def filter_stones(catalog: Catalog, mode: str) -> List[Dict[str, Any]]:
+    """ขั้นตอนของ PyStoneApp.filter_data ในแต่ละโหมด: สร้าง params, เพิ่มสีมงคล, กรอง AND (ผ่าน Catalog), ตรวจสีอัปมงคล"""
+    all_data = catalog.data
+    params: SearchParams = {}
+    day_id = 0
+    filtered = list(catalog.stones)
+    if mode == 'name':
+        filtered = catalog.search_name(BENCH_NAME_TERM)
+    elif mode == 'group':
+        params = condition_search_params(group_id=BENCH_GROUP_ID)
+    elif mode == 'date':
+        auspice_result = calculate_auspice_ids(BENCH_DATE_TH, all_data)
+        params = date_search_params(auspice_result)
+        day_id = auspice_result['day_id']
+    elif mode == 'condition':
+        params = condition_search_params(**BENCH_CONDITION)
+        day_id = BENCH_CONDITION['day_id']
+    else:
+        raise ValueError(f"ไม่รู้จักโหมดค้นหา: {mode}")
+
+    add_lucky_color_param(params, day_id, all_data)
+    if params:
+        filtered = catalog.search(params)
+    unlucky_notes(filtered, day_id, all_data) # filter_data เก็บผลไว้ใน app.unlucky_notes (วัดเวลารวมกับการกรอง)
+    return filtered
+
+class HeadlessStoneTable:
+    """
+    ส่วนที่ไม่ใช่ Tk ของ PyStoneApp.render_stone_table: ตัดหน้าปัจจุบันและจัดรูปแบบแถวผ่าน Row Cache
+    ใช้ format_stone_row / get_stone_row ของ PyStoneApp โดยตรง (Import tkinter แต่ไม่สร้างหน้าต่าง)
+    """
+    def __init__(self, all_data: Dict[str, Any], rows_per_page: int = BENCH_ROWS_PER_PAGE):
+        from pystone_gui_app import PyStoneApp
+        self.format_stone_row = PyStoneApp.format_stone_row.__get__(self)
+        self.get_stone_row = PyStoneApp.get_stone_row.__get__(self)
+        self._current_row_cache = PyStoneApp._current_row_cache.__get__(self)
+        self.catalog = Catalog(all_data)
+        self.ALL_DATA = all_data
+        self.rows_per_page = rows_per_page
+        self.row_cache = {}
+        self._row_cache_key = None
+        self.unlucky_notes = {}
+
+    def render(self, stones: List[Dict[str, Any]], page: int = 1) -> List[tuple]:
+        start_index = (page - 1) * self.rows_per_page
+        page_stones = stones[start_index:start_index + self.rows_per_page]
+        rows = []
+        for i, stone in enumerate(page_stones):
+            idx = start_index + i + 1
+            tag = 'unlucky' if stone['id'] in self.unlucky_notes else ('odd' if idx % 2 != 0 else 'normal')
+            rows.append(((idx, *self.get_stone_row(stone)), (tag,)))
+        return rows
+
+# =======================================================
+# BENCHMARK
+# =======================================================
+
+def time_operation(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """วัดเวลา func repeat รอบ (setup ไม่นับเวลา) :return: สถิติเป็นวินาที และผลของรอบสุดท้าย"""
+    times, result = [], None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'max_s': max(times),
+            'repeat': repeat, 'result': result}
+
+def benchmark_size(size: int, work_path: str, seed: int = DEFAULT_SEED, repeat: int = DEFAULT_REPEAT,
+                   base_path: str = DATA_FOLDER, log: Callable[[str], None] = print) -> List[Dict[str, Any]]:
+    """สร้างแคตตาล็อกขนาด size ใน work_path แล้ววัดเวลาทุกขั้นตอน :return: ผลลัพธ์ทีละขั้นตอน"""
+    data_path = os.path.join(work_path, f'catalog_{size}')
+    start = time.perf_counter()
+    write_catalog(generate_stones(size, seed, base_path), data_path, base_path)
+    log(f"สร้างแคตตาล็อก {size:,} หิน ({time.perf_counter() - start:.1f} วินาที)")
+
+    results = []
+    def record(operation: str, stats: Dict[str, Any], count: Optional[int] = None):
+        stats.pop('result')
+        results.append({'size': size, 'operation': operation, 'result_count': count, **stats})
+        log(f"  {operation:<32} {stats['median_s'] * 1000:10.2f} ms")
+
+    stats = time_operation(lambda: load_all_data(data_path), repeat)
+    all_data = stats['result']
+    stones = all_data['stones']
+    record('load_all_data', stats, len(stones))
+
+    # หน่วยความจำของหิน: dict จาก JSON เทียบกับ StoneRecord ที่ GUI ใช้ (ขั้นตอนถัดไปใช้ StoneRecord เหมือน GUI)
+    stats = time_operation(lambda: compact_stones(stones), repeat)
+    compact = stats['result']
+    record('compact_stones', stats, len(compact))
+    for kind, records in (('dict', stones), ('compact', compact)):
+        size_bytes = deep_sizeof(records)
+        results.append({'size': size, 'operation': f'memory:stones:{kind}', 'result_count': len(records), 'bytes': size_bytes})
+        log(f"  {f'memory:stones:{kind}':<32} {size_bytes / 1024 ** 2:10.2f} MiB")
+    stones = all_data['stones'] = compact
+
+    # แคตตาล็อกแบบ GUI: Index สร้างตอนโหลด, ColumnStore สร้างเมื่อใช้ครั้งแรก (วัดแยก)
+    catalog = Catalog(all_data)
+    catalog.index
+    stats = time_operation(lambda: ColumnStore(stones), repeat)
+    columns = catalog._columns = stats['result']
+    record('columns:build', stats, len(columns))
+    size_bytes = deep_sizeof(columns)
+    results.append({'size': size, 'operation': 'memory:stones:columns', 'result_count': len(columns), 'bytes': size_bytes})
+    log(f"  {'memory:stones:columns':<32} {size_bytes / 1024 ** 2:10.2f} MiB")
+
+    for mode in ('name', 'group', 'date', 'condition'):
+        stats = time_operation(lambda: filter_stones(catalog, mode), repeat)
+        record(f'filter_data:{mode}', stats, len(stats['result']))
+
+    params = add_lucky_color_param(date_search_params(calculate_auspice_ids(BENCH_DATE_TH, all_data)),
+                                   BENCH_CONDITION['day_id'], all_data)
+    stats = time_operation(lambda: apply_auspice_filter(stones, params), repeat)
+    record('apply_auspice_filter', stats, len(stats['result']))
+
+    # ColumnStore เทียบกับ StoneIndex / รายการหิน (เงื่อนไขเดียวกับด้านบน)
+    stats = time_operation(lambda: columns.match_positions(params), repeat)
+    record('columns:match_positions', stats, len(stats['result']))
+    stats = time_operation(lambda: catalog.index.match_ids(params), repeat)
+    record('index:match_ids', stats, len(stats['result']))
+    stats = time_operation(lambda: [columns.facet_counts(field) for field in RELATION_FIELDS], repeat)
+    record('columns:facet_counts', stats, len(RELATION_FIELDS))
+    stats = time_operation(lambda: [catalog.facet_counts(field) for field in RELATION_FIELDS], repeat)
+    record('catalog:facet_counts', stats, len(RELATION_FIELDS))
+    stats = time_operation(lambda: search_by_name(stones, BENCH_NAME_TERM), repeat)
+    record('search_by_name', stats, len(stats['result']))
+    stats = time_operation(lambda: sum(1 for _ in iter_export_rows(stones, all_data)), repeat)
+    record('export_rows:records', stats, stats['result'])
+    stats = time_operation(lambda: sum(1 for _ in iter_column_rows(columns, range(len(columns)), all_data)), repeat)
+    record('export_rows:columns', stats, stats['result'])
+    catalog = columns = None # คืนหน่วยความจำก่อนขั้นตอนถัดไป
+
+    # validate_catalog แบบที่ get_catalog เรียกตอนโหลด (ใช้ StoneIndex ที่สร้างแล้ว)
+    index = StoneIndex(stones)
+    stats = time_operation(lambda: validate_catalog(all_data, index), repeat)
+    record('validate_catalog', stats, len(stats['result']))
+    index = None
+
+    # check_unlucky_colors_for_results กับหินทั้งแคตตาล็อก (กรณีแย่ที่สุด: ค้นหาตามวันโดยไม่มีเงื่อนไขอื่น)
+    stats = time_operation(lambda: unlucky_notes(stones, BENCH_CONDITION['day_id'], all_data), repeat)
+    record('check_unlucky_colors_for_results', stats, len(stats['result']))
+
+    table = HeadlessStoneTable(all_data)
+    stats = time_operation(lambda: table.render(stones), repeat, setup=table.row_cache.clear)
+    record('render_stone_table', stats, len(stats['result']))
+
+    sample = random.Random(seed).sample(stones, min(DETAIL_SAMPLE_SIZE, len(stones)))
+    stats = time_operation(lambda: [format_stone_detail(s, all_data) for s in sample], repeat)
+    record('format_stone_detail', stats, len(sample))
+
+    stats = time_operation(lambda: save_stones(stones, data_path), repeat)
+    record('save_stones', stats, len(stones))
+
+    registry = id_registry(all_data) # ตรวจหินที่แก้ไขก่อนบันทึกแบบเดียวกับ GUI
+    def edit_one_stone():
+        original = stones[len(stones) // 2]
+        result = merge_save_stones([record_change(original, {**original, 'description': original['description'] + '.'})],
+                                   data_path, registry)
+        stones[len(stones) // 2] = next(s for s in result['records'] if s['id'] == original['id'])
+        return result['applied']
+    stats = time_operation(edit_one_stone, repeat)
+    record('merge_save_stones', stats, stats['result'])
+
+    shutil.rmtree(data_path, ignore_errors=True)
+    return results
+
+def _run_startup(app_path: str, mode: str) -> Dict[str, float]:
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)), PYSTONE_STALL_MS='0')
+    env.pop('PYSTONE_TRACE', None)
+    completed = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT, mode], cwd=app_path, env=env,
+                               capture_output=True, text=True, timeout=STARTUP_TIMEOUT_S)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def benchmark_startup(size: int, work_path: str, seed: int = DEFAULT_SEED, repeat: int = DEFAULT_REPEAT,
+                      base_path: str = DATA_FOLDER, log: Callable[[str], None] = print) -> List[Dict[str, Any]]:
+    """
+    วัดเวลาเปิด PyStoneApp ด้วยแคตตาล็อกขนาด size ในแต่ละ STARTUP_MODES (ต้องมีหน้าจอสำหรับ Tk)
+    :return: ผลลัพธ์ startup:<mode>:first_interaction และ startup:<mode>:data_ready
+    """
+    app_path = os.path.join(work_path, f'startup_{size}')
+    write_catalog(generate_stones(size, seed, base_path), os.path.join(app_path, DATA_FOLDER), base_path)
+    log(f"แคตตาล็อก {size:,} หินสำหรับวัดเวลาเปิดโปรแกรม")
+
+    results = []
+    for mode in STARTUP_MODES:
+        runs = [_run_startup(app_path, mode) for _ in range(repeat)]
+        for mark in ('first_interaction', 'data_ready'):
+            times = [run[f'{mark}_s'] for run in runs]
+            results.append({'size': size, 'operation': f'startup:{mode}:{mark}', 'result_count': None,
+                            'min_s': min(times), 'median_s': statistics.median(times), 'max_s': max(times), 'repeat': repeat})
+            log(f"  {f'startup:{mode}:{mark}':<32} {statistics.median(times) * 1000:10.2f} ms")
+
+    shutil.rmtree(app_path, ignore_errors=True)
+    return results
+
+def run_benchmarks(sizes: List[int], output: str, work_path: str, seed: int = DEFAULT_SEED,
+                   repeat: int = DEFAULT_REPEAT, base_path: str = DATA_FOLDER,
+                   benchmark: Callable[..., List[Dict[str, Any]]] = benchmark_size) -> Dict[str, Any]:
+    """วัดทุกขนาดแล้วเขียนผลเป็น JSON ลง output (เขียนใหม่หลังจบแต่ละขนาด ผลไม่หายหากหยุดกลางทาง)"""
+    report = {
+        'seed': seed,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': [],
+    }
+    for size in sizes:
+        report['results'].extend(benchmark(size, work_path, seed, repeat, base_path))
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+# =======================================================
+# COMMAND LINE
+# =======================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="สร้างแคตตาล็อกหินจำลองขนาดใหญ่ และวัดเวลาการทำงานตามขนาดข้อมูล")
+    parser.add_argument('--data', default=DATA_FOLDER, help='โฟลเดอร์ข้อมูลต้นแบบ (Lookup และสถิติของหิน)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='สร้างโฟลเดอร์ข้อมูลจำลอง')
+    generate_parser.add_argument('size', type=int)
+    generate_parser.add_argument('output', help='โฟลเดอร์ปลายทาง (ใช้กับ --data ของโปรแกรมอื่นได้)')
+
+    run_parser = subparsers.add_parser('run', help='วัดเวลาทุกขั้นตอนที่แต่ละขนาด')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    run_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument('--output', default=DEFAULT_OUTPUT, help='ไฟล์ผลลัพธ์ JSON')
+    run_parser.add_argument('--work', default=None, help='โฟลเดอร์ชั่วคราวสำหรับแคตตาล็อกจำลอง')
+
+    startup_parser = subparsers.add_parser('startup', help='วัดเวลาเปิดโปรแกรมจนใช้งานได้ (ต้องมีหน้าจอ)')
+    startup_parser.add_argument('--sizes', type=int, nargs='+', default=[64, 10_000, 100_000])
+    startup_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    startup_parser.add_argument('--output', default='bench_startup.json', help='ไฟล์ผลลัพธ์ JSON')
+    startup_parser.add_argument('--work', default=None, help='โฟลเดอร์ชั่วคราวสำหรับแคตตาล็อกจำลอง')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        write_catalog(generate_stones(args.size, args.seed, args.data), args.output, args.data)
+        print(f"✅ สร้าง {args.size:,} หินที่ {args.output}")
+        sys.exit(0)
+
+    if args.work:
+        os.makedirs(args.work, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=args.work) as work_path:
+        benchmark = benchmark_startup if args.command == 'startup' else benchmark_size
+        run_benchmarks(args.sizes, args.output, work_path, args.seed, args.repeat, args.data, benchmark)
+    print(f"✅ บันทึกผลที่ {args.output}")
@@ -1,6 +1,16 @@
+import argparse
 import json
 import os
-from typing import List, Dict, Union, Any
+import sys
+import mmap
+import struct
+from array import array
+from typing import List, Dict, Any, Iterator
+
+from pystone_engine.data import split_ids, lookup_name
+from pystone_engine.loader import get_catalog
+from pystone_engine.validate import validate_catalog, format_issues
+from pystone_engine.index import RELATION_FIELDS
 
 # =======================================================
 # CONFIGURATION
@@ -8,122 +18,334 @@ from typing import List, Dict, Union, Any
 # กำหนดพาธไปยังโฟลเดอร์ที่เก็บไฟล์ JSON
 DATA_FOLDER = 'data' 
 
-# =======================================================
-# HELPER FUNCTIONS
-# =======================================================
-
-def split_ids(id_string: str) -> List[int]:
-    """
-    แปลง string ของ IDs ที่คั่นด้วยช่องว่าง (space) เป็น List ของจำนวนเต็ม (integers)
-    เช่น: "1 3 5" -> [1, 3, 5]
-    """
-    if not id_string:
-        return []
-    try:
-        # ใช้ split() เพื่อแยกด้วยช่องว่าง และ list comprehension เพื่อแปลงเป็น int
-        return [int(s.strip()) for s in id_string.split() if s.strip().isdigit()]
-    except ValueError:
-        print(f"Warning: Failed to convert one or more IDs to integer from string: '{id_string}'")
-        return []
-
-def lookup_name(lookup_array: List[Dict[str, Any]], id_val: Union[int, str], display_key: str, default: str = '-') -> str:
-    """
-    ค้นหาชื่อหรือค่าที่ต้องการจาก ID ในตาราง Lookup
-    """
-    if not lookup_array or (not id_val and id_val != 0):
-        return default
-    
-    # ตรวจสอบว่า ID ที่ส่งเข้ามาเป็น str หรือ int
-    target_id = int(id_val) if isinstance(id_val, str) and id_val.isdigit() else id_val
-    
-    # วนหา ID ที่ตรงกัน
-    for item in lookup_array:
-        if item.get('id') == target_id:
-            return str(item.get(display_key, default))
-            
-    return default
-
 # =======================================================
 # CORE DATA HANDLER FUNCTION
 # =======================================================
+# split_ids / lookup_name มาจาก pystone_engine.data (Re-export เพื่อให้ Script เดิมใช้ได้)
 
 def load_all_data(base_path: str = DATA_FOLDER) -> Dict[str, Any]:
     """
-    โหลดไฟล์ JSON ทั้งหมดเข้าสู่หน่วยความจำ
+    โหลดไฟล์ JSON ทั้งหมดเข้าสู่หน่วยความจำ พร้อมพิมพ์สถานะการโหลด
+    ไฟล์ที่เสียจะถูกข้ามและแจ้งเตือน ข้อมูลเป็นชุดเดียวกับที่โมดูลอื่นใน Process ใช้
+    (ดู pystone_engine.loader.get_catalog: เรียกซ้ำไม่ Parse ไฟล์ใหม่)
     
     :param base_path: พาธของโฟลเดอร์ข้อมูล (e.g., 'data')
     :return: Dictionary ที่มีข้อมูลทั้งหมด (stones, groups, days, ...)
     """
-    loaded_data = {
-        'stones': [],
-        'groups': [],
-        'days': [],
-        'months': [],
-        'colors': [],
-        'animals': [],
-        'signs': [],
-        'chakra': [],       
-        'element': [],    
-        'numerology': []         
-    }
-    
-    # Map ชื่อไฟล์กับ key ใน Dictionary
-    file_map = {
-        'stones_main_data.json': 'stones',
-        'lookup_groups.json': 'groups',
-        'lookup_days.json': 'days',
-        'lookup_months.json': 'months',
-        'lookup_colors.json': 'colors',
-        'lookup_chakra.json': 'chakra',
-        'lookup_element.json': 'element',
-        'lookup_numerology.json': 'numerology',    
-    }
-    
     print(f"--- กำลังโหลดข้อมูลจาก '{base_path}' ---")
+    loaded_data = get_catalog(base_path, strict=False, log=print).data
+    print("--------------------------------------")
+    return loaded_data
 
-    # 1. โหลดไฟล์ JSON ที่เป็น Array ทั่วไป
-    for filename, key in file_map.items():
-        file_path = os.path.join(base_path, filename)
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        loaded_data[key] = data
-                        print(f"✅ โหลด {filename} ({len(data)} รายการ)")
-                    else:
-                        print(f"❌ Error: {filename} ไม่ได้เป็น List")
-            except json.JSONDecodeError:
-                print(f"❌ Error: {filename} รูปแบบ JSON ไม่ถูกต้อง")
-            except Exception as e:
-                print(f"❌ Error ในการเปิด/อ่าน {filename}: {e}")
+# =======================================================
+# COLUMNAR BINARY EXPORT / IMPORT (สำหรับงานวิเคราะห์ข้อมูล)
+# =======================================================
+# โครงสร้างไฟล์ (Little-endian, ทุก Section จัดแนว 8 ไบต์เพื่ออ่านด้วย numpy.memmap ได้ตรง ๆ):
+#   'PSTC' | version u16 | reserved u16 | row_count u32 | meta_len u32 | meta (JSON) | ... sections
+#   meta['columns'][i] = {'name', 'kind', 'offset', ...}  offset นับจากต้นไฟล์
+#     kind 'int32'/'int64'  : ค่าความกว้างคงที่ n ค่า
+#     kind 'bool'           : uint8 n ค่า
+#     kind 'str'/'json'     : offsets uint32 (n+1) ชี้เข้า String Heap (UTF-8)
+#     kind 'ids'            : offsets uint32 (n+1) ชี้เข้า values int32 (รายการ ID ความสัมพันธ์)
+#   meta['layouts']         : ลำดับ Key ของหินแต่ละแบบ + คอลัมน์ '__layout__' (uint16) บอกว่าแถวใช้แบบไหน
+#                             (เก็บทั้งลำดับ Key และ Key ที่ไม่มีในแถว จึงแปลงกลับเป็น JSON ได้ตรงตามต้นฉบับ)
+COLUMNAR_MAGIC = b'PSTC'
+COLUMNAR_VERSION = 1
+LAYOUT_COLUMN = '__layout__'
+
+_HEADER = struct.Struct('<4sHHII')
+_KIND_FORMATS = {'int32': 'i', 'int64': 'q', 'bool': 'B', 'offsets': 'I', 'ids': 'i', 'layout': 'H'}
+_NUMPY_DTYPES = {'i': '<i4', 'q': '<i8', 'B': 'u1', 'I': '<u4', 'H': '<u2'}
+
+_ABSENT = object() # แถวที่ไม่มี Key นี้
+
+def _require_little_endian():
+    # array / memoryview.cast ใช้ Byte Order ของเครื่อง ซึ่งต้องตรงกับไฟล์ (Little-endian)
+    if sys.byteorder != 'little':
+        raise OSError("ไฟล์ Columnar รองรับเฉพาะเครื่อง Little-endian")
+
+def _pad8(size: int) -> int:
+    return (8 - size % 8) % 8
+
+def _column_kind(field: str, values: List[Any]) -> str:
+    """เลือกชนิดคอลัมน์จากค่าทั้งหมด (_ABSENT คือแถวที่ไม่มี Key นี้)"""
+    present = [v for v in values if v is not _ABSENT]
+    if present and all(isinstance(v, bool) for v in present):
+        return 'bool'
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return 'int32' if all(-2**31 <= v < 2**31 for v in present) else 'int64'
+    if all(isinstance(v, str) for v in present):
+        # ฟิลด์ความสัมพันธ์เก็บเป็น ID ได้ก็ต่อเมื่อแปลงกลับเป็น string เดิมได้ทุกแถว
+        if field in RELATION_FIELDS and all(' '.join(str(i) for i in split_ids(v)) == v for v in present):
+            return 'ids'
+        return 'str'
+    return 'json'
+
+def export_columnar(stones: List[Dict[str, Any]], file_path: str) -> Dict[str, Any]:
+    """
+    ส่งออกข้อมูลหินเป็นไฟล์ Binary แบบคอลัมน์ (ID ความกว้างคงที่, รายการความสัมพันธ์แบบ Offset, String Heap)
+
+    :return: meta ของไฟล์ที่เขียน
+    """
+    _require_little_endian()
+    row_count = len(stones)
+    layouts: List[List[str]] = []
+    layout_index: Dict[tuple, int] = {}
+    row_layouts = []
+    fields: List[str] = []
+    for stone in stones:
+        keys = tuple(stone.keys())
+        if keys not in layout_index:
+            layout_index[keys] = len(layouts)
+            layouts.append(list(keys))
+            fields.extend(k for k in keys if k not in fields)
+        row_layouts.append(layout_index[keys])
+
+    heap = bytearray()
+    sections: List[bytes] = []
+    columns = []
+
+    def add_section(data: bytes) -> int:
+        sections.append(data)
+        return len(sections) - 1
+
+    columns.append({'name': LAYOUT_COLUMN, 'kind': 'layout', 'section': add_section(array('H', row_layouts).tobytes())})
+
+    for field in fields:
+        values = [stone.get(field, _ABSENT) for stone in stones]
+        kind = _column_kind(field, values)
+        column = {'name': field, 'kind': kind}
+        if kind in ('int32', 'int64', 'bool'):
+            column['section'] = add_section(array(_KIND_FORMATS[kind], [0 if v is _ABSENT else int(v) for v in values]).tobytes())
+        elif kind == 'ids':
+            offsets, ids = array('I', [0]), array('i')
+            for v in values:
+                ids.extend(split_ids('' if v is _ABSENT else v))
+                offsets.append(len(ids))
+            column['section'] = add_section(offsets.tobytes())
+            column['values_section'] = add_section(ids.tobytes())
         else:
-            print(f"⚠️ คำเตือน: ไม่พบไฟล์ {filename} ที่ {file_path}")
-            
-    # 2. โหลดไฟล์ zodiacs พิเศษ (มี 2 Keys: animals และ signs)
-    zodiac_path = os.path.join(base_path, 'lookup_zodiacs.json')
-    if os.path.exists(zodiac_path):
+            offsets = array('I', [len(heap)])
+            for v in values:
+                if v is not _ABSENT:
+                    heap.extend((v if kind == 'str' else json.dumps(v, ensure_ascii=False)).encode('utf-8'))
+                offsets.append(len(heap))
+            column['section'] = add_section(offsets.tobytes())
+        columns.append(column)
+    heap_section = add_section(bytes(heap))
+
+    # คำนวณ offset ของทุก Section (meta มีขนาดขึ้นกับ offset จึงวนจนขนาดคงที่)
+    meta_len = 0
+    while True:
+        position = _HEADER.size + meta_len
+        position += _pad8(position)
+        offsets_by_section = []
+        for data in sections:
+            offsets_by_section.append((position, len(data)))
+            position += len(data) + _pad8(len(data))
+        meta = {
+            'version': COLUMNAR_VERSION,
+            'row_count': row_count,
+            'layouts': layouts,
+            'heap': {'offset': offsets_by_section[heap_section][0], 'length': len(heap)},
+            'columns': [_resolve_column_offsets(c, offsets_by_section) for c in columns],
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        if len(meta_bytes) == meta_len:
+            break
+        meta_len = len(meta_bytes)
+
+    with open(file_path, 'wb') as f:
+        f.write(_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, 0, row_count, meta_len))
+        f.write(meta_bytes)
+        f.write(b'\0' * _pad8(_HEADER.size + meta_len))
+        for data in sections:
+            f.write(data)
+            f.write(b'\0' * _pad8(len(data)))
+    return meta
+
+def _resolve_column_offsets(column: Dict[str, Any], offsets_by_section: List[tuple]) -> Dict[str, Any]:
+    resolved = {'name': column['name'], 'kind': column['kind']}
+    resolved['offset'] = offsets_by_section[column['section']][0]
+    if 'values_section' in column:
+        resolved['values_offset'], values_length = offsets_by_section[column['values_section']]
+        resolved['values_count'] = values_length // 4
+    return resolved
+
+class ColumnarCatalog:
+    """
+    อ่านไฟล์ Columnar แบบ Zero-copy ผ่าน mmap + memoryview (ไม่แปลงทั้งไฟล์เป็น Object)
+    ใช้ numpy_column() เพื่อได้ numpy array ที่ชี้ไปยังไฟล์โดยตรง (ต้องติดตั้ง numpy)
+
+    ใช้แบบ Context Manager: with ColumnarCatalog(path) as catalog: ...
+    """
+    def __init__(self, file_path: str):
+        _require_little_endian()
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mmap)
+        self._views: List[memoryview] = []
+
+        magic, version, _, self.row_count, meta_len = _HEADER.unpack_from(self._buf, 0)
+        if magic != COLUMNAR_MAGIC:
+            self.close()
+            raise ValueError(f"{file_path} ไม่ใช่ไฟล์ Columnar ของ PyStone")
+        if version > COLUMNAR_VERSION:
+            self.close()
+            raise ValueError(f"ไม่รองรับไฟล์ Columnar เวอร์ชัน {version}")
+        self.meta = json.loads(bytes(self._buf[_HEADER.size:_HEADER.size + meta_len]).decode('utf-8'))
+        self.columns = {c['name']: c for c in self.meta['columns']}
+        self.layouts = self.meta['layouts']
+        heap = self.meta['heap']
+        self._heap = self._slice(heap['offset'], heap['length'])
+        self._id_values = {name: self.relation_values(name) for name, c in self.columns.items() if c['kind'] == 'ids'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def _slice(self, offset: int, length: int, fmt: str = 'B') -> memoryview:
+        view = self._buf[offset:offset + length]
+        if fmt != 'B':
+            view = view.cast(fmt)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        """ปล่อย memoryview ทั้งหมดก่อนปิด mmap (numpy array ที่ยังอ้างอิงอยู่ต้องถูกลบก่อน)"""
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        if getattr(self, '_buf', None) is not None:
+            self._buf.release()
+            self._buf = None
+            self._mmap.close()
+        self._file.close()
+
+    def _column(self, name: str) -> Dict[str, Any]:
+        if name not in self.columns:
+            raise KeyError(f"ไม่มีคอลัมน์ '{name}'")
+        return self.columns[name]
+
+    def column(self, name: str) -> memoryview:
+        """
+        คืน memoryview ของคอลัมน์ (ไม่คัดลอกข้อมูล)
+        int/bool/layout -> ค่าของแต่ละแถว, str/json/ids -> offsets (n+1)
+        """
+        column = self._column(name)
+        kind = column['kind']
+        fmt = _KIND_FORMATS['offsets'] if kind in ('str', 'json', 'ids') else _KIND_FORMATS[kind]
+        count = self.row_count + 1 if kind in ('str', 'json', 'ids') else self.row_count
+        return self._slice(column['offset'], count * struct.calcsize(fmt), fmt)
+
+    def relation_values(self, name: str) -> memoryview:
+        """คืน memoryview ของ ID ความสัมพันธ์ทั้งหมดของคอลัมน์ 'ids' (ใช้คู่กับ offsets จาก column())"""
+        column = self._column(name)
+        return self._slice(column['values_offset'], column['values_count'] * 4, _KIND_FORMATS['ids'])
+
+    def numpy_column(self, name: str, values: bool = False):
+        """คืน numpy array แบบ Zero-copy ของคอลัมน์ (values=True สำหรับค่า ID ของคอลัมน์ 'ids')"""
         try:
-            with open(zodiac_path, 'r', encoding='utf-8') as f:
-                zodiac_data = json.load(f)
-                loaded_data['animals'] = zodiac_data.get('animals', [])
-                loaded_data['signs'] = zodiac_data.get('signs', [])
-                print(f"✅ โหลด lookup_zodiacs.json (Animals: {len(loaded_data['animals'])}, Signs: {len(loaded_data['signs'])} รายการ)")
-        except Exception as e:
-             print(f"❌ Error ในการโหลด/อ่าน lookup_zodiacs.json: {e}")
-    else:
-        print(f"⚠️ คำเตือน: ไม่พบไฟล์ lookup_zodiacs.json")
+            import numpy
+        except ImportError:
+            raise ImportError("numpy_column ต้องติดตั้ง numpy (pip install numpy) หรือใช้ column() ที่คืน memoryview แทน")
+        column = self._column(name)
+        if values:
+            return numpy.frombuffer(self._mmap, dtype=_NUMPY_DTYPES['i'], count=column['values_count'], offset=column['values_offset'])
+        view = self.column(name)
+        return numpy.frombuffer(self._mmap, dtype=_NUMPY_DTYPES[view.format], count=len(view), offset=column['offset'])
 
-    print("--------------------------------------")
-    return loaded_data
+    def _value(self, column: Dict[str, Any], view: memoryview, row: int) -> Any:
+        kind = column['kind']
+        if kind in ('int32', 'int64'):
+            return view[row]
+        if kind == 'bool':
+            return bool(view[row])
+        if kind == 'ids':
+            values = self._id_values[column['name']]
+            return ' '.join(str(i) for i in values[view[row]:view[row + 1]])
+        text = bytes(self._heap[view[row]:view[row + 1]]).decode('utf-8')
+        return text if kind == 'str' else json.loads(text)
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """สร้าง dict ของหินทีละแถว โดยลำดับ Key ตรงกับต้นฉบับ"""
+        views = {name: self.column(name) for name in self.columns}
+        layout_view = views[LAYOUT_COLUMN]
+        for row in range(self.row_count):
+            yield {key: self._value(self.columns[key], views[key], row) for key in self.layouts[layout_view[row]]}
+
+def import_columnar(file_path: str) -> List[Dict[str, Any]]:
+    """อ่านไฟล์ Columnar กลับเป็น List ของหิน (ตรงกับ stones_main_data.json ทุกประการ)"""
+    with ColumnarCatalog(file_path) as catalog:
+        return list(catalog.iter_rows())
+
+def export_stones_json_to_columnar(file_path: str, base_path: str = DATA_FOLDER) -> Dict[str, Any]:
+    """อ่าน stones_main_data.json โดยตรง (ไม่ผ่าน load_all_data) แล้วส่งออกเป็นไฟล์ Columnar"""
+    with open(os.path.join(base_path, 'stones_main_data.json'), 'r', encoding='utf-8') as f:
+        return export_columnar(json.load(f), file_path)
+
+def import_columnar_to_stones_json(file_path: str, json_path: str):
+    """แปลงไฟล์ Columnar กลับเป็น JSON รูปแบบเดียวกับ stones_main_data.json"""
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(import_columnar(file_path), f, ensure_ascii=False, indent=2)
+
+# =======================================================
+# VALIDATION REPORT
+# =======================================================
+
+def validate_data_folder(base_path: str = DATA_FOLDER) -> int:
+    """
+    รายงานปัญหาข้อมูล (ฟิลด์/ชนิดข้อมูลของทุกรายการ, ID ซ้ำ, ID ที่อ้างถึง Lookup ที่ไม่มีอยู่)
+    :return: จำนวนปัญหาที่พบ
+    """
+    # ไม่ส่ง log: ปัญหาที่ get_catalog พบตอนโหลดอยู่ในรายงานด้านล่างแล้ว
+    catalog = get_catalog(base_path, strict=False)
+    for e in catalog.load_errors:
+        print(e)
+    issues = validate_catalog(catalog.data, catalog.index, full=True)
+    if issues:
+        print(format_issues(issues))
+        print(f"❌ พบปัญหา {len(issues)} รายการ")
+    else:
+        print(f"✅ ข้อมูลถูกต้อง ({len(catalog.stones)} หิน)")
+    return len(issues)
 
 # =======================================================
 # EXAMPLE USAGE (โค้ดสำหรับทดสอบการทำงาน)
 # =======================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ตรวจ/ทดลองอ่านข้อมูลหินและตาราง Lookup")
+    parser.add_argument('--data', default=DATA_FOLDER, help='โฟลเดอร์ข้อมูล JSON')
+    parser.add_argument('--validate', action='store_true',
+                        help='รายงานปัญหาข้อมูล (Exit code 1 เมื่อพบปัญหา) แทนการแสดงตัวอย่าง')
+    parser.add_argument('--export-columnar', metavar='FILE',
+                        help='ส่งออก stones_main_data.json ของ --data เป็นไฟล์ Columnar')
+    parser.add_argument('--import-columnar', metavar='FILE',
+                        help='แปลงไฟล์ Columnar กลับเป็น JSON ของหิน (เขียนที่ --output)')
+    parser.add_argument('--output', metavar='JSON',
+                        help='ไฟล์ JSON ของ --import-columnar (ค่าเริ่มต้น: FILE แต่เปลี่ยนนามสกุลเป็น .json)')
+    args = parser.parse_args()
+    if args.validate:
+        sys.exit(1 if validate_data_folder(args.data) else 0)
+    if args.export_columnar:
+        meta = export_stones_json_to_columnar(args.export_columnar, args.data)
+        print(f"✅ ส่งออก {meta['row_count']} หิน ({len(meta['columns']) - 1} คอลัมน์) ไปที่ {args.export_columnar}")
+        sys.exit(0)
+    if args.import_columnar:
+        output = args.output or os.path.splitext(args.import_columnar)[0] + '.json'
+        import_columnar_to_stones_json(args.import_columnar, output)
+        print(f"✅ แปลง {args.import_columnar} เป็น {output}")
+        sys.exit(0)
+
     # 1. โหลดข้อมูลทั้งหมด
-    ALL_DATA = load_all_data()
+    ALL_DATA = load_all_data(args.data)
 
     # 2. ดึงข้อมูลหินตัวอย่าง (เช่น Agate ID: 1)
     agate_stone = ALL_DATA['stones'][0] if ALL_DATA['stones'] else None
@@ -0,0 +1,95 @@
+"""
+PyStone Engine: ตรรกะหลักแบบ Headless (ไม่ใช้ Tk) ที่ GUI, Script และ Service ใช้ร่วมกัน
+
+Submodule ถูก Import เมื่อใช้ชื่อนั้นครั้งแรกเท่านั้น (PEP 562) เช่น
+`from pystone_engine import calculate_auspice_ids` จะโหลดเพียง data, auspice และ timing
+ไม่โหลด Index / Template จนกว่าจะถูกเรียกใช้
+
+ทุก Submodule Import เฉพาะ pystone_engine และ Standard Library (ใช้ได้โดยไม่ต้องมีโฟลเดอร์ของ Repo ใน sys.path)
+
+    data        โหลด/บันทึก JSON, split_ids, lookup_name
+    auspice     คำนวณ วดป.เกิด, สีมงคล/อัปมงคล
+    index       StoneIndex (Inverted Index)
+    search      apply_auspice_filter, ค้นหาชื่อ, recommend
+    formatting  Segments, ข้อความสรุป, รายละเอียดหิน/Lookup ผ่าน Template
+    template    Template Engine ของรายงาน (ไฟล์ .tpl ที่ปรับแต่งได้, Compile แล้ว Cache)
+    catalog     Catalog (ข้อมูล + Index + Cache)
+    loader      get_catalog (Catalog ที่โหลดครั้งเดียวแล้วใช้ร่วมกันทั้ง Process, Thread-safe)
+    shared      SharedCatalog (แคตตาล็อก + Index ในไฟล์ mmap ที่หลาย Process อ่านร่วมกัน)
+    watch       DataWatcher (ตรวจไฟล์ใน data/ ที่เปลี่ยน), diff_stones, patch_stones
+    store       บันทึกเฉพาะรายการที่แก้ไข (File Lock + revision + Merge) สำหรับหลายโปรแกรมพร้อมกัน,
+                Cascade การลบ/เปลี่ยน ID ของ Lookup ไปยังหินที่อ้างถึง
+    timing      จับเวลา operation (timed), Histogram, cProfile (PYSTONE_PROFILE) และ Trace Event (PYSTONE_TRACE)
+    records     StoneRecord (หินแบบ __slots__ + ID แบบ bytes ใช้แทน dict ได้), compact_stones
+    memory      รายงานขนาดหน่วยความจำแยกตามโครงสร้าง, tracemalloc
+    validate    ตรวจ Schema และ ID ที่อ้างถึง (validate_catalog ตอนโหลด, validate_stone ตอนบันทึก)
+    columns     ColumnStore (แคตตาล็อกแบบคอลัมน์: array ของ ID/ชื่อ/ความสัมพันธ์แบบ CSR) และ StoneRow
+"""
+import importlib
+from typing import Any, List
+
+# ชื่อที่ Export -> Submodule ที่เก็บชื่อนั้น
+_LAZY_ATTRS = {
+    # data
+    'DATA_FOLDER': 'data', 'DataLoadError': 'data', 'load_all_data': 'data', 'save_stones': 'data',
+    'split_ids': 'data', 'lookup_name': 'data', 'format_lookup_list': 'data', 'generate_new_id': 'data',
+    'file_lock': 'data', 'LockTimeout': 'data',
+    # auspice
+    'convert_date_th_to_en': 'auspice', 'calculate_auspice_ids': 'auspice',
+    'get_lucky_color_ids': 'auspice', 'get_unlucky_color_ids': 'auspice', 'check_unlucky_color': 'auspice',
+    # index
+    'StoneIndex': 'index', 'RELATION_FIELDS': 'index', 'LOOKUP_FIELDS': 'index', 'PARAM_TO_STONE_KEY': 'index',
+    # search
+    'apply_auspice_filter': 'search', 'search_by_name': 'search', 'unlucky_notes': 'search',
+    'condition_search_params': 'search', 'date_search_params': 'search', 'add_lucky_color_param': 'search',
+    'recommend': 'search',
+    # formatting
+    'Segment': 'formatting', 'join_line_segments': 'formatting', 'segments_to_text': 'formatting',
+    'format_date_summary': 'formatting', 'format_condition_summary': 'formatting',
+    'format_stone_detail': 'formatting', 'format_lookup_detail': 'formatting',
+    # template
+    'TemplateError': 'template', 'get_template': 'template', 'render_template': 'template',
+    'export_default_templates': 'template',
+    # catalog
+    'Catalog': 'catalog',
+    # loader
+    'get_catalog': 'loader', 'clear_catalog_cache': 'loader',
+    # shared
+    'SharedCatalog': 'shared', 'build_shared_catalog': 'shared',
+    # watch
+    'DataWatcher': 'watch', 'diff_stones': 'watch', 'patch_stones': 'watch',
+    # store
+    'record_change': 'store', 'merge_save_records': 'store', 'merge_save_stones': 'store',
+    'referencing_stones': 'store', 'cascade_lookup_change': 'store',
+    # timing
+    'timed': 'timing', 'record_timing': 'timing', 'timing_snapshot': 'timing', 'reset_timings': 'timing',
+    'last_profile': 'timing', 'start_trace': 'timing', 'stop_trace': 'timing', 'write_trace': 'timing',
+    'is_tracing': 'timing',
+    # records
+    'StoneRecord': 'records', 'compact_stones': 'records',
+    # memory
+    'deep_sizeof': 'memory', 'memory_report': 'memory', 'format_memory_report': 'memory',
+    'traced_allocation': 'memory',
+    # validate
+    'validate_catalog': 'validate', 'validate_stone': 'validate', 'validate_lookup_item': 'validate',
+    'id_registry': 'validate', 'format_issues': 'validate',
+    # columns
+    'ColumnStore': 'columns', 'StoneRow': 'columns',
+}
+
+_SUBMODULES = ('data', 'auspice', 'index', 'search', 'formatting', 'template', 'catalog', 'loader', 'shared', 'watch', 'store', 'timing', 'records', 'memory', 'validate', 'columns')
+
+__all__ = list(_LAZY_ATTRS)
+
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'{__name__}.{module_name}'), name)
+    globals()[name] = value # ครั้งถัดไปไม่ต้องผ่าน __getattr__
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | set(_SUBMODULES))
@@ -0,0 +1,143 @@
+import datetime
+import re
+from typing import Dict, List, Any, Set, Union
+
+from pystone_engine.data import split_ids
+from pystone_engine.timing import timed
+
+# =======================================================
+# AUSPICE CALCULATION (วดป.เกิด -> วัน/เดือน/ปีนักษัตร/ราศี)
+# =======================================================
+
+def convert_date_th_to_en(date_th: str) -> Union[datetime.date, None]:
+    if not re.match(r'^\d{1,2}/\d{1,2}/\d{4}$', date_th): return None
+    try:
+        day, month, year_th = map(int, date_th.split('/'))
+        year_en = year_th - 543
+        return datetime.date(year_en, month, day)
+    except ValueError:
+        return None
+
+def get_day_id_from_date(date_en: datetime.date) -> int:
+    python_day_of_week = date_en.weekday() 
+    
+    day_map = { 0: 2, 1: 3, 3: 6, 4: 7, 5: 8, 6: 1 }
+
+    if python_day_of_week == 2: return 4 
+    
+    return day_map.get(python_day_of_week, 0)
+
+def get_animal_id_from_date(date_en: datetime.date, all_data: Dict[str, Any]) -> int:
+    year = date_en.year
+    month = date_en.month
+    day = date_en.day
+    
+    is_before_songkran = (month < 4) or (month == 4 and day < 13)
+    if is_before_songkran: year -= 1
+        
+    animal_id = ((year + 8) % 12) + 1
+    return animal_id
+
+def get_sign_id_from_date(date_en: datetime.date, all_data: Dict[str, Any]) -> int:
+    month = date_en.month
+    day = date_en.day
+    zodiac_signs = all_data.get('signs', [])
+    
+    for sign in zodiac_signs:
+        start_m, start_d = sign['start_month'], sign['start_day']
+        end_m, end_d = sign['end_month'], sign['end_day']
+        sign_id = sign['id']
+        
+        if start_m > end_m: 
+            is_start_month = (month == start_m and day >= start_d)
+            is_end_month = (month == end_m and day <= end_d)
+            if is_start_month or is_end_month:
+                return sign_id
+        else:
+            is_start_month = (month == start_m and day >= start_d)
+            is_end_month = (month == end_m and day <= end_d)
+            is_mid_month = (month > start_m and month < end_m)
+            
+            if is_start_month or is_end_month or is_mid_month:
+                 return sign_id
+            
+    return 0
+
+@timed('search.auspice')
+def calculate_auspice_ids(date_th: str, all_data: Dict[str, Any]) -> Dict[str, Union[int, str]]:
+    date_en = convert_date_th_to_en(date_th)
+    if not date_en: return {'error': "รูปแบบวันที่ไม่ถูกต้อง (DD/MM/YYYY พ.ศ.)"}
+        
+    day_id = get_day_id_from_date(date_en)
+    month_id = date_en.month
+    animal_id = get_animal_id_from_date(date_en, all_data)
+    sign_id = get_sign_id_from_date(date_en, all_data)
+    
+    return {
+        'date_en': date_en.strftime('%Y-%m-%d'),
+        'day_id': day_id,
+        'month_id': month_id,
+        'animal_id': animal_id,
+        'sign_id': sign_id
+    }
+
+# =======================================================
+# LUCKY / UNLUCKY COLORS
+# =======================================================
+
+def get_lucky_color_ids(day_id: int, all_data: Dict[str, Any]) -> List[str]:
+    """
+    ดึง ID สีมงคลของวันนั้นๆ
+    """
+    if day_id == 0: return []
+
+    day_data = next((d for d in all_data.get('days', []) if d['id'] == day_id), None)
+    if not day_data or not day_data.get('lucky_color'): return []
+        
+    lucky_color_names_str = day_data['lucky_color']
+    lucky_color_names = [name.strip() for name in lucky_color_names_str.split(',') if name.strip()]
+    
+    lucky_color_ids = set()
+    for name in lucky_color_names:
+        color_item = next((c for c in all_data.get('colors', []) if c['name'] == name), None)
+        if color_item:
+            # เก็บเป็น str ID เพื่อให้เข้ากันกับ stone_ids ใน apply_auspice_filter
+            lucky_color_ids.add(str(color_item['id'])) 
+            
+    return list(lucky_color_ids)
+
+def get_unlucky_color_ids(day_id: int, all_data: Dict[str, Any]) -> Set[int]:
+    """
+    ดึง ID สีอัปมงคลของวันนั้นๆ (int)
+    """
+    if day_id == 0: return set()
+
+    day_data = next((d for d in all_data.get('days', []) if d['id'] == day_id), None)
+    if not day_data or not day_data.get('unlucky_color'): return set()
+        
+    unlucky_color_names_str = day_data['unlucky_color']
+    unlucky_color_names = [name.strip() for name in unlucky_color_names_str.split(',') if name.strip()]
+    
+    unlucky_color_ids = set()
+    for name in unlucky_color_names:
+        color_item = next((c for c in all_data.get('colors', []) if c['name'] == name), None)
+        if color_item:
+            unlucky_color_ids.add(color_item['id'])
+    return unlucky_color_ids
+
+def check_unlucky_color(stone_color_ids: str, day_id: int, all_data: Dict[str, Any]) -> Dict[str, Union[bool, str]]:
+    unlucky_color_ids = get_unlucky_color_ids(day_id, all_data)
+    if not unlucky_color_ids: return {'is_unlucky': False, 'unlucky_colors_found': ''}
+
+    stone_ids_list = [str(id) for id in split_ids(stone_color_ids)]
+
+    unlucky_colors_found = []
+    
+    for stone_id in stone_ids_list:
+        if int(stone_id) in unlucky_color_ids:
+            unlucky_colors_found.append(next((c['name'] for c in all_data['colors'] if c['id'] == int(stone_id)), f"ID:{stone_id}"))
+
+    return {
+        'is_unlucky': len(unlucky_colors_found) > 0,
+        'unlucky_colors_found': ', '.join(unlucky_colors_found)
+    }
@@ -0,0 +1,150 @@
+from typing import Dict, List, Any, Iterable, Optional, Set
+
+from pystone_engine.data import DATA_FOLDER, load_all_data
+from pystone_engine.index import StoneIndex
+from pystone_engine.columns import ColumnStore, USE_NUMPY
+from pystone_engine.search import SearchParams, recommend
+from pystone_engine.formatting import Segment, format_stone_detail, format_lookup_detail
+
+# =======================================================
+# CATALOG (ข้อมูล + Index + Cache ต่อเวอร์ชันข้อมูล)
+# =======================================================
+
+class Catalog:
+    """
+    แคตตาล็อกหินแบบ Headless สำหรับ Script / Service / Batch
+    สร้าง StoneIndex / ColumnStore เมื่อใช้ครั้งแรก และ Cache รายละเอียดตาม (stone id, version)
+    แก้ข้อมูลผ่าน apply_stones / apply_lookup หรือเรียก invalidate() หลังแก้ไขข้อมูลใน data เอง
+    เพื่อเพิ่ม version และล้าง Cache (แคตตาล็อกจาก get_catalog ถูกใช้ร่วมกันทั้ง Process)
+    """
+    def __init__(self, all_data: Dict[str, Any]):
+        self.data = all_data
+        self.version = 0
+        self._index: Optional[StoneIndex] = None
+        self._columns: Optional[ColumnStore] = None
+        self._order: Dict[int, int] = {}
+        self._detail_cache: Dict[tuple, List[Segment]] = {}
+        self.issues: List[Dict[str, Any]] = [] # ผลของ validate_catalog ตอนโหลดผ่าน get_catalog
+        self.load_errors: List[Exception] = [] # DataLoadError ของไฟล์ที่ get_catalog ข้าม
+
+    @classmethod
+    def load(cls, base_path: str = DATA_FOLDER) -> 'Catalog':
+        return cls(load_all_data(base_path))
+
+    @property
+    def stones(self) -> List[Dict[str, Any]]:
+        return self.data['stones']
+
+    @property
+    def index(self) -> StoneIndex:
+        if self._index is None:
+            self._index = StoneIndex(self.stones)
+            self._order = {s['id']: i for i, s in enumerate(self.stones)}
+        return self._index
+
+    @property
+    def columns(self) -> ColumnStore:
+        """หินแบบคอลัมน์สำหรับ Scan/นับ/Export จำนวนมาก (ตำแหน่งแถวตรงกับ self.stones, สร้างใหม่เมื่อข้อมูลเปลี่ยน)"""
+        if self._columns is None:
+            self._columns = ColumnStore(self.stones)
+        return self._columns
+
+    def invalidate(self):
+        """ข้อมูลเปลี่ยน: เพิ่ม version, สร้าง Index ใหม่เมื่อใช้ครั้งถัดไป, ล้าง Cache"""
+        self.version += 1
+        self._index = None
+        self._columns = None
+        self._detail_cache.clear()
+
+    def reload(self, all_data: Dict[str, Any]):
+        self.data = all_data
+        self.invalidate()
+
+    def apply_stones(self, stones: List[Dict[str, Any]], removed: Iterable[Dict[str, Any]],
+                     added: Iterable[Dict[str, Any]]) -> Set[int]:
+        """
+        ใช้รายการหินชุดใหม่ (removed/added จาก diff_stones): ปรับ Index เฉพาะหินที่เปลี่ยน
+        แทนการสร้างใหม่ทั้งหมด, สร้างลำดับ id ใหม่, เพิ่ม version และล้าง Cache
+        :return: set ของ stone id ที่เปลี่ยน
+        """
+        self.data['stones'] = stones
+        if self._index is None:
+            changed = {s.get('id') for s in removed} | {s.get('id') for s in added}
+        else:
+            changed = self._index.update(removed, added)
+            self._order = {s['id']: i for i, s in enumerate(stones)}
+        self.version += 1
+        self._columns = None
+        self._detail_cache.clear()
+        return changed
+
+    def apply_lookup(self, key: str, items: List[Dict[str, Any]]):
+        """ใช้ตาราง Lookup ชุดใหม่ (รายละเอียดหินแสดงชื่อจาก Lookup: เพิ่ม version และล้าง Cache)"""
+        self.data[key] = items
+        self.version += 1
+        self._detail_cache.clear()
+
+    def stone(self, stone_id: int) -> Optional[Dict[str, Any]]:
+        index = self.index
+        if stone_id not in index.all_ids:
+            return None
+        return self.stones[self._order[stone_id]]
+
+    def stones_by_ids(self, stone_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """หินของ stone id ที่มีในแคตตาล็อก เรียงตามแคตตาล็อก (อ่านจากลำดับ id โดยไม่ Scan หินทั้งหมด)"""
+        self.index # ลำดับ id ถูกสร้างพร้อม Index
+        order = self._order
+        return [self.stones[i] for i in sorted(order[sid] for sid in stone_ids if sid in order)]
+
+    def positions(self, stones: Iterable[Dict[str, Any]]) -> List[int]:
+        """ตำแหน่งแถวของหินใน self.stones / self.columns (ข้ามหินที่ไม่มีในแคตตาล็อก)"""
+        self.index # ลำดับ id ถูกสร้างพร้อม Index
+        order = self._order
+        return [order[s['id']] for s in stones if s['id'] in order]
+
+    def search(self, params: SearchParams) -> List[Dict[str, Any]]:
+        """
+        ค้นหาด้วย params รูปแบบเดียวกับ apply_auspice_filter (ผลลัพธ์เรียงตามแคตตาล็อก)
+        มี numpy: Scan คอลัมน์ ID ของ ColumnStore ไม่มี: Intersect ชุด ID ของ StoneIndex (เร็วกว่า Loop ของ Python)
+        """
+        if USE_NUMPY:
+            stones = self.stones
+            return [stones[pos] for pos in self.columns.match_positions(params)]
+        return self.stones_by_ids(self.index.match_ids(params))
+
+    def search_name(self, search_term: str) -> List[Dict[str, Any]]:
+        """ผลเดียวกับ search_by_name แต่ตรวจแต่ละข้อความใน String Table ของ ColumnStore ครั้งเดียว"""
+        stones = self.stones
+        return [stones[pos] for pos in self.columns.search_name(search_term)]
+
+    def facet_counts(self, field: str, params: Optional[SearchParams] = None) -> Dict[int, int]:
+        """
+        จำนวนหินที่ตรง params (None = ทั้งหมด) แยกตาม ID ในฟิลด์ความสัมพันธ์ field (ID ที่ไม่มีหินไม่อยู่ในผล)
+        มี numpy: นับจากคอลัมน์แบบ CSR ของ ColumnStore ไม่มี: Intersect กับชุด ID ของแต่ละตัวเลือกใน StoneIndex
+        """
+        if USE_NUMPY:
+            columns = self.columns
+            return columns.facet_counts(field, columns.match_positions(params) if params else None)
+        index = self.index
+        base_ids = index.match_ids(params) if params else index.all_ids
+        counts = {rel_id: len(base_ids & ids) for rel_id, ids in index.postings[field].items()}
+        return {rel_id: count for rel_id, count in counts.items() if count}
+
+    def recommend(self, date_th: str) -> Dict[str, Any]:
+        """ดู pystone_engine.search.recommend (ใช้ Index ของแคตตาล็อก)"""
+        return recommend(date_th, self.data, self.stones, self.index)
+
+    def detail(self, stone: Dict[str, Any]) -> List[Segment]:
+        cache_key = (stone['id'], self.version)
+        content = self._detail_cache.get(cache_key)
+        if content is None:
+            content = format_stone_detail(stone, self.data)
+            self._detail_cache[cache_key] = content
+        return content
+
+    def has_detail(self, stone_id: int) -> bool:
+        """รายละเอียดของหินนี้อยู่ใน Cache ของเวอร์ชันปัจจุบันแล้ว (ใช้เลือกหินที่ต้องเตรียมล่วงหน้า)"""
+        return (stone_id, self.version) in self._detail_cache
+
+    def lookup_detail(self, key: str) -> List[Segment]:
+        return format_lookup_detail(key, self.data.get(key, []))
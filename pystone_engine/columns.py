@@ -0,0 +1,406 @@
+import os
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from pystone_engine.index import RELATION_FIELDS, PARAM_TO_STONE_KEY, WEDNESDAY_DAY_ID, WEDNESDAY_NIGHT_ID, parse_ids
+from pystone_engine.auspice import get_unlucky_color_ids
+from pystone_engine.search import SearchParams
+from pystone_engine.records import pack_relation_ids
+from pystone_engine.timing import timed
+
+try:
+    import numpy # ไม่บังคับ: มี numpy จะ Scan/นับด้วย Vector Operation แทน Loop ของ Python
+except ImportError:
+    numpy = None
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+NAME_FIELDS = ('thai_name', 'english_name', 'other_names') # เก็บเป็นเลขของ String Table
+TEXT_FIELDS = ('description',) # เก็บเป็น UTF-8 ต่อกัน แปลงเป็น str เมื่ออ่านแถวนั้นเท่านั้น
+
+# PYSTONE_NUMPY=0 บังคับใช้ Loop ของ Python (เทียบผล/เวลา)
+USE_NUMPY = numpy is not None and os.environ.get('PYSTONE_NUMPY', '1') != '0'
+
+MISSING_ID = -1 # แถวที่ id ไม่ใช่ int (ค่าจริงอยู่ใน Override)
+
+# ชนิดของ array ค่า ID ความสัมพันธ์ เริ่มจากเล็กสุด ขยายเมื่อมี ID เกินช่วง
+_VALUE_TYPECODES = ('H', 'i', 'q')
+
+_MISSING = object()
+
+# =======================================================
+# COLUMN STORE (Struct of Arrays)
+# =======================================================
+
+class ColumnStore(Sequence):
+    """
+    แคตตาล็อกหินแบบคอลัมน์ในหน่วยความจำ (สร้างจากรายการหิน อ่านอย่างเดียว: ข้อมูลเปลี่ยนให้สร้างใหม่ ดู Catalog.columns)
+    - ids: array('q') ตามตำแหน่งแถว
+    - ชื่อ (NAME_FIELDS): String Table เดียว (strings) + array เลขของข้อความต่อแถว
+    - ฟิลด์ความสัมพันธ์: แบบ CSR ต่อฟิลด์ relation_offsets[field] (n+1) ชี้เข้า relation_values[field]
+    - description: UTF-8 ต่อกัน + Offset แปลงเป็น str เฉพาะแถวที่ถูกอ่าน
+    - ค่าที่ไม่เข้ากับคอลัมน์ (revision, Key อื่น, ชนิดไม่ตรง, ข้อความ ID ที่ไม่ใช่รูปแบบมาตรฐาน) เก็บใน Override ต่อแถว
+      และลำดับ Key ของแต่ละแถวเก็บเป็น Layout จึงแปลงกลับเป็น dict ได้ตรงตามต้นฉบับ
+
+    ใช้แทน List ของหินได้: store[pos] คืน StoneRow (Mapping แบบอ่านจากคอลัมน์) สำหรับ Export
+    การค้นหา/นับ (match_positions, facet_counts, search_name, unlucky_notes) วนบน array โดยตรงหรือใช้ numpy ถ้ามี
+    ตำแหน่งแถวตรงกับรายการหินที่ใช้สร้าง จึงแปลงผลเป็นหินเดิมได้ด้วย stones[pos]
+    """
+    @timed('columns.build')
+    def __init__(self, stones: Iterable[Dict[str, Any]]):
+        self.ids = array('q')
+        self.strings: List[str] = []
+        self._string_ids: Optional[Dict[str, int]] = {} # ใช้ระหว่างสร้างเท่านั้น
+        self.names: Dict[str, array] = {field: array('I') for field in NAME_FIELDS}
+        self.relation_offsets: Dict[str, array] = {field: array('I', [0]) for field in RELATION_FIELDS}
+        self.relation_values: Dict[str, array] = {field: array(_VALUE_TYPECODES[0]) for field in RELATION_FIELDS}
+        self._text_heaps: Dict[str, bytearray] = {field: bytearray() for field in TEXT_FIELDS}
+        self._text_offsets: Dict[str, array] = {field: array('Q', [0]) for field in TEXT_FIELDS}
+        self._overrides: Dict[int, Dict[str, Any]] = {}
+        self.layouts: List[Tuple[str, ...]] = []
+        self._layout_keys: List[frozenset] = []
+        self._layout_ids: Dict[Tuple[str, ...], int] = {}
+        self._row_layouts = array('I')
+        self.sorted_ids = array('q') # id เรียงลำดับ + ตำแหน่งแถว (หาแถวจาก id ด้วย Binary Search)
+        self._sorted_positions = array('I')
+        self._lower_strings: Optional[List[str]] = None
+        self._numpy_cache: Dict[Tuple[str, str], Any] = {}
+        for stone in stones:
+            self._append(stone)
+        self._string_ids = None
+        # id ซ้ำ: ใช้ตำแหน่งหลังสุด (เหมือน Catalog.stone) แถวที่ id ไม่ใช่ int ค้นด้วย id ไม่ได้
+        order = sorted((pos for pos in range(len(self.ids)) if 'id' not in self._overrides.get(pos, ())),
+                       key=lambda pos: (self.ids[pos], pos))
+        self.sorted_ids.extend(self.ids[pos] for pos in order)
+        self._sorted_positions.extend(order)
+
+    # --- Build ---
+
+    def _layout_id(self, keys: Tuple[str, ...]) -> int:
+        layout_id = self._layout_ids.get(keys)
+        if layout_id is None:
+            layout_id = self._layout_ids[keys] = len(self.layouts)
+            self.layouts.append(keys)
+            self._layout_keys.append(frozenset(keys))
+        return layout_id
+
+    def _string_id(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def _extend_values(self, field: str, ids: Iterable[int]):
+        values = self.relation_values[field]
+        start = len(values)
+        try:
+            values.extend(ids)
+        except OverflowError: # ID เกินช่วงของชนิดปัจจุบัน: ขยายทั้งคอลัมน์แล้วเพิ่มใหม่
+            del values[start:]
+            typecode = _VALUE_TYPECODES[_VALUE_TYPECODES.index(values.typecode) + 1]
+            self.relation_values[field] = array(typecode, values)
+            self._extend_values(field, ids)
+            return
+        self.relation_offsets[field].append(len(self.relation_values[field]))
+
+    def _append(self, stone: Dict[str, Any]):
+        pos = len(self.ids)
+        keys = tuple(stone)
+        self._row_layouts.append(self._layout_id(keys))
+        overrides = {}
+
+        stone_id = stone.get('id')
+        if stone_id.__class__ is int and -2**63 <= stone_id < 2**63:
+            self.ids.append(stone_id)
+        else:
+            self.ids.append(MISSING_ID)
+            overrides['id'] = stone_id
+
+        for field in NAME_FIELDS:
+            value = stone.get(field, '')
+            if value.__class__ is not str:
+                overrides[field] = value
+                value = ''
+            self.names[field].append(self._string_id(value))
+
+        relation_ids = getattr(stone, 'relation_ids', None)
+        for field in RELATION_FIELDS:
+            # bytes = ข้อความรูปแบบมาตรฐาน "1 3 5" (StoneRecord เก็บแบบนี้อยู่แล้ว ค่าอื่นแปลงผ่าน Cache ของ records)
+            ids = relation_ids(field) if relation_ids is not None else None
+            if ids.__class__ is not bytes:
+                value = stone.get(field, '')
+                ids = pack_relation_ids(value)
+                if ids.__class__ is not bytes:
+                    overrides[field] = value # เช่น "01" หรือเว้นวรรคซ้ำ: ค้นหาด้วย ID ที่อ่านได้ แต่คืนข้อความเดิม
+                    ids = parse_ids(value)
+            self._extend_values(field, ids)
+
+        for field in TEXT_FIELDS:
+            value = stone.get(field, '')
+            if value.__class__ is str:
+                self._text_heaps[field] += value.encode('utf-8')
+            else:
+                overrides[field] = value
+            self._text_offsets[field].append(len(self._text_heaps[field]))
+
+        for key in keys:
+            if key not in _COLUMN_FIELDS:
+                overrides[key] = stone[key]
+        if overrides:
+            self._overrides[pos] = overrides
+
+    # --- Row Access ---
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, pos: Union[int, slice]) -> Union['StoneRow', List['StoneRow']]:
+        if isinstance(pos, slice):
+            return [StoneRow(self, i) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError(pos)
+        return StoneRow(self, pos)
+
+    def rows(self, positions: Iterable[int]) -> List['StoneRow']:
+        return [StoneRow(self, pos) for pos in positions]
+
+    def position(self, stone_id: Any) -> Optional[int]:
+        if stone_id.__class__ is not int:
+            return None
+        i = bisect_right(self.sorted_ids, stone_id) - 1
+        if i < 0 or self.sorted_ids[i] != stone_id:
+            return None
+        return self._sorted_positions[i]
+
+    def stone(self, stone_id: Any) -> Optional['StoneRow']:
+        pos = self.position(stone_id)
+        return None if pos is None else StoneRow(self, pos)
+
+    def keys_at(self, pos: int) -> Tuple[str, ...]:
+        return self.layouts[self._row_layouts[pos]]
+
+    def has_key(self, pos: int, key: str) -> bool:
+        return key in self._layout_keys[self._row_layouts[pos]]
+
+    def value(self, pos: int, key: str, default: Any = _MISSING) -> Any:
+        """ค่าของ key ในแถว pos (แถวนั้นไม่มี key: คืน default หรือ KeyError ถ้าไม่ระบุ)"""
+        if key not in self._layout_keys[self._row_layouts[pos]]:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        overrides = self._overrides.get(pos)
+        if overrides is not None:
+            value = overrides.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        if key == 'id':
+            return self.ids[pos]
+        if key in self.names:
+            return self.strings[self.names[key][pos]]
+        if key in self.relation_values:
+            offsets = self.relation_offsets[key]
+            return ' '.join(map(str, self.relation_values[key][offsets[pos]:offsets[pos + 1]]))
+        offsets = self._text_offsets[key] # TEXT_FIELDS
+        return self._text_heaps[key][offsets[pos]:offsets[pos + 1]].decode('utf-8')
+
+    def iter_values(self, positions: Iterable[int], keys: Iterable[str], default: Any = '') -> Iterator[tuple]:
+        """
+        Tuple ของค่าตาม keys ทีละแถวใน positions สำหรับอ่านหลายแถว เช่น Export (ไม่สร้าง StoneRow / dict)
+        ค่าเหมือน StoneRow.get(key, default) ยกเว้นฟิลด์ความสัมพันธ์ที่คืน array ของ ID (แบบ relation_ids)
+        """
+        columns = []
+        for key in keys:
+            if key == 'id':
+                columns.append((key, 0, self.ids, None))
+            elif key in self.names:
+                columns.append((key, 1, self.names[key], self.strings))
+            elif key in self.relation_values:
+                columns.append((key, 2, self.relation_values[key], self.relation_offsets[key]))
+            elif key in self._text_heaps:
+                columns.append((key, 3, self._text_heaps[key], self._text_offsets[key]))
+            else:
+                columns.append((key, 4, None, None)) # Key นอกคอลัมน์อยู่ใน Override เสมอ
+        layouts, layout_keys, overrides = self._row_layouts, self._layout_keys, self._overrides
+        for pos in positions:
+            present, row_overrides = layout_keys[layouts[pos]], overrides.get(pos)
+            values = []
+            for key, kind, column, extra in columns:
+                if kind == 2: # ID ความสัมพันธ์อ่านจากคอลัมน์เสมอ (ข้อความต้นฉบับที่ไม่ใช่รูปแบบมาตรฐานอ่านได้ทาง value)
+                    values.append(column[extra[pos]:extra[pos + 1]])
+                elif key not in present:
+                    values.append(default)
+                elif row_overrides is not None and key in row_overrides:
+                    values.append(row_overrides[key])
+                elif kind == 0:
+                    values.append(column[pos])
+                elif kind == 1:
+                    values.append(extra[column[pos]])
+                elif kind == 3:
+                    values.append(column[extra[pos]:extra[pos + 1]].decode('utf-8'))
+                else:
+                    values.append(default)
+            yield tuple(values)
+
+    def relation_ids(self, pos: int, field: str) -> array:
+        offsets = self.relation_offsets[field]
+        return self.relation_values[field][offsets[pos]:offsets[pos + 1]]
+
+    # --- Scans (ทำงานกับตำแหน่งแถว ไม่สร้าง dict ของหิน) ---
+
+    def _numpy(self, kind: str, field: str):
+        """numpy array ที่ชี้ไปยัง array ของคอลัมน์ (Cache ไว้: คอลัมน์ไม่ถูกแก้หลังสร้าง)"""
+        cached = self._numpy_cache.get((kind, field))
+        if cached is None:
+            source = {'offsets': self.relation_offsets, 'values': self.relation_values, 'names': self.names}[kind][field]
+            cached = self._numpy_cache[(kind, field)] = numpy.frombuffer(source, dtype=source.typecode)
+        return cached
+
+    def _mask_any(self, field: str, rel_ids: Iterable[int]):
+        """Mask ของแถวที่มี ID ใด ID หนึ่งในฟิลด์ (bytearray 0/1 หรือ numpy bool)"""
+        wanted = {int(i) for i in rel_ids}
+        if USE_NUMPY:
+            offsets = self._numpy('offsets', field)
+            hits = numpy.flatnonzero(numpy.isin(self._numpy('values', field), list(wanted)))
+            mask = numpy.zeros(len(self), dtype=bool)
+            mask[numpy.searchsorted(offsets, hits, side='right') - 1] = True
+            return mask
+        mask = bytearray(len(self))
+        offsets = self.relation_offsets[field]
+        for i, value in enumerate(self.relation_values[field]):
+            if value in wanted:
+                mask[bisect_right(offsets, i) - 1] = 1
+        return mask
+
+    def _mask_and(self, a, b):
+        if USE_NUMPY:
+            return a & b
+        # AND ทีละ byte ผ่าน int ขนาดใหญ่ (ทำใน C)
+        return bytearray((int.from_bytes(a, 'little') & int.from_bytes(b, 'little')).to_bytes(len(a), 'little'))
+
+    def _mask_positions(self, mask) -> List[int]:
+        if USE_NUMPY:
+            return numpy.flatnonzero(mask).tolist()
+        positions, pos = [], mask.find(1)
+        while pos != -1:
+            positions.append(pos)
+            pos = mask.find(1, pos + 1)
+        return positions
+
+    @timed('columns.match')
+    def match_positions(self, params: SearchParams) -> List[int]:
+        """ตำแหน่งแถวที่ตรงทุกเงื่อนไข (ตรรกะเดียวกับ StoneIndex.match_ids / apply_auspice_filter) เรียงตามแคตตาล็อก"""
+        mask = None
+        lucky_ids = params.get('lucky_color_ids')
+        if lucky_ids:
+            mask = self._mask_any('color_ids', lucky_ids)
+
+        for param_key, param_val in params.items():
+            if param_key not in PARAM_TO_STONE_KEY or not param_val or param_val == '0':
+                continue
+            field, value = PARAM_TO_STONE_KEY[param_key], int(param_val)
+            wanted = (WEDNESDAY_DAY_ID, WEDNESDAY_NIGHT_ID) if param_key == 'day_id' and value == WEDNESDAY_DAY_ID else (value,)
+            field_mask = self._mask_any(field, wanted)
+            mask = field_mask if mask is None else self._mask_and(mask, field_mask)
+        return list(range(len(self))) if mask is None else self._mask_positions(mask)
+
+    @timed('columns.facets')
+    def facet_counts(self, field: str, positions: Optional[Iterable[int]] = None) -> Dict[int, int]:
+        """จำนวนหิน (ในแถว positions หรือทั้งหมด) ที่มีแต่ละ ID ในฟิลด์ความสัมพันธ์"""
+        offsets, values = self.relation_offsets[field], self.relation_values[field]
+        if USE_NUMPY:
+            np_offsets, np_values = self._numpy('offsets', field), self._numpy('values', field)
+            rows = numpy.repeat(numpy.arange(len(self)), numpy.diff(np_offsets))
+            if positions is not None:
+                selected = numpy.zeros(len(self), dtype=bool)
+                selected[numpy.fromiter(positions, dtype=numpy.int64)] = True
+                keep = selected[rows]
+                rows, np_values = rows[keep], np_values[keep]
+            width = int(np_values.max()) + 1 if len(np_values) else 1
+            pairs = numpy.unique(rows.astype(numpy.int64) * width + np_values) # 1 ครั้งต่อ (แถว, ID)
+            counts = numpy.bincount(pairs % width)
+            return {int(i): int(c) for i, c in enumerate(counts) if c}
+        counts: Dict[int, int] = {}
+        for pos in (range(len(self)) if positions is None else positions):
+            for rel_id in set(values[offsets[pos]:offsets[pos + 1]]):
+                counts[rel_id] = counts.get(rel_id, 0) + 1
+        return counts
+
+    @timed('columns.name')
+    def search_name(self, search_term: str) -> List[int]:
+        """ตำแหน่งแถวที่ชื่อไทย/อังกฤษ/ชื่ออื่นมีคำค้น (ตรรกะเดียวกับ search_by_name) ตรวจแต่ละข้อความใน String Table ครั้งเดียว"""
+        term = search_term.strip().lower()
+        if not term:
+            return list(range(len(self)))
+        if self._lower_strings is None:
+            self._lower_strings = [s.lower() for s in self.strings]
+        matched = {i for i, s in enumerate(self._lower_strings) if term in s}
+        if not matched:
+            return []
+        if USE_NUMPY:
+            wanted = numpy.fromiter(matched, dtype=numpy.int64)
+            mask = numpy.zeros(len(self), dtype=bool)
+            for field in NAME_FIELDS:
+                mask |= numpy.isin(self._numpy('names', field), wanted)
+            return numpy.flatnonzero(mask).tolist()
+        thai, english, other = (self.names[f] for f in NAME_FIELDS)
+        return [pos for pos in range(len(self)) if thai[pos] in matched or english[pos] in matched or other[pos] in matched]
+
+    @timed('columns.unlucky')
+    def unlucky_notes(self, positions: Iterable[int], day_id: int, all_data: Dict[str, Any]) -> Dict[int, str]:
+        """ผลเดียวกับ search.unlucky_notes ของหินในแถว positions แต่หา ID สีอัปมงคลของวันครั้งเดียว"""
+        unlucky_ids = get_unlucky_color_ids(day_id, all_data) if day_id else set()
+        if not unlucky_ids:
+            return {}
+        color_names: Dict[int, str] = {}
+        for color in all_data.get('colors', []):
+            color_names.setdefault(color['id'], color['name'])
+        notes = {}
+        for pos in positions:
+            found = [color_names.get(i, f"ID:{i}") for i in self.relation_ids(pos, 'color_ids') if i in unlucky_ids]
+            if found:
+                notes[self.value(pos, 'id')] = f"❌ มีสีอัปมงคล: {', '.join(found)}"
+        return notes
+
+_COLUMN_FIELDS = frozenset(('id',) + NAME_FIELDS + tuple(RELATION_FIELDS) + TEXT_FIELDS)
+
+# =======================================================
+# ROW VIEW
+# =======================================================
+
+class StoneRow(Mapping):
+    """
+    หินหนึ่งแถวของ ColumnStore ในรูป Mapping (อ่านอย่างเดียว ใช้แทน dict ของหินใน format_stone_detail / Export)
+    อ่านค่าจากคอลัมน์ทุกครั้ง (description แปลงจาก UTF-8 เมื่ออ่านเท่านั้น) ใช้ dict(row) เมื่อต้องการสำเนาที่แก้ไขได้
+    """
+    __slots__ = ('store', 'pos')
+
+    def __init__(self, store: ColumnStore, pos: int):
+        self.store = store
+        self.pos = pos
+
+    def __getitem__(self, key: str) -> Any:
+        return self.store.value(self.pos, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.store.value(self.pos, key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return self.store.has_key(self.pos, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.keys_at(self.pos))
+
+    def __len__(self) -> int:
+        return len(self.store.keys_at(self.pos))
+
+    def relation_ids(self, field: str) -> array:
+        return self.store.relation_ids(self.pos, field)
+
+    def __repr__(self) -> str:
+        return f"StoneRow({self.pos}, {dict(self.items())!r})"
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import List, Dict, Union, Any, Callable, Optional, Iterator
+
+from pystone_engine.timing import timed
+
+try:
+    import fcntl # POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt # Windows
+except ImportError:
+    msvcrt = None
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+DATA_FOLDER = 'data'
+STONES_FILE = 'stones_main_data.json'
+
+# Map ชื่อไฟล์กับ key ใน Dictionary (lookup_zodiacs.json แยกเป็น animals และ signs)
+DATA_FILES = {
+    'stones_main_data.json': 'stones',
+    'lookup_groups.json': 'groups',
+    'lookup_days.json': 'days',
+    'lookup_months.json': 'months',
+    'lookup_colors.json': 'colors',
+    'lookup_zodiacs.json': ('animals', 'signs'),
+    'lookup_element.json': 'element', # FIX: ใช้คีย์ 'element' (ไม่มี s)
+    'lookup_chakra.json': 'chakra',
+    'lookup_numerology.json': 'numerology',
+}
+
+# เวลารอ Lock ของไฟล์ข้อมูลก่อนแจ้งว่ามีผู้อื่นกำลังบันทึก (วินาที)
+LOCK_TIMEOUT = 10.0
+
+class DataLoadError(Exception):
+    """ไฟล์ข้อมูลเปิดไม่ได้หรือมีรูปแบบ JSON ไม่ถูกต้อง"""
+    def __init__(self, filename: str, message: str):
+        super().__init__(message)
+        self.filename = filename
+
+class LockTimeout(Exception):
+    """รอ Lock ของไฟล์ข้อมูลนานเกิน LOCK_TIMEOUT (มีโปรแกรมอื่นกำลังบันทึกไฟล์เดียวกัน)"""
+
+# =======================================================
+# HELPER FUNCTIONS
+# =======================================================
+
+def split_ids(id_string: str) -> List[int]:
+    """
+    แปลง string ของ IDs ที่คั่นด้วยช่องว่าง (space) เป็น List ของจำนวนเต็ม (integers)
+    เช่น: "1 3 5" -> [1, 3, 5]
+    """
+    if not id_string: return []
+    try: return [int(s.strip()) for s in id_string.split() if s.strip().isdigit()]
+    except (ValueError, AttributeError): return []
+
+def lookup_name(lookup_array: List[Dict[str, Any]], id_val: Union[int, str], display_key: str, default: str = '-') -> str:
+    """ค้นหาชื่อหรือค่าที่ต้องการจาก ID ในตาราง Lookup"""
+    if not lookup_array or (not id_val and id_val != 0): return default
+    
+    target_id = None
+    if isinstance(id_val, str) and id_val.isdigit():
+        target_id = int(id_val)
+    elif isinstance(id_val, int):
+         target_id = id_val
+    
+    if target_id is None:
+        return default
+
+    for item in lookup_array:
+        if item.get('id') == target_id:
+            return str(item.get(display_key, default))
+    return default
+
+def format_lookup_list(ids_str, lookup_data, display_key):
+    ids = split_ids(ids_str)
+    names = [lookup_name(lookup_data, id, display_key) for id in ids]
+    return ', '.join(names) if names else '-'
+
+def generate_new_id(stones: List[Dict[str, Any]]) -> int:
+    """สร้าง ID ใหม่โดยการหา ID ที่มีค่าสูงสุดแล้วบวก 1"""
+    if not stones:
+        return 1
+    max_id = max(stone.get('id', 0) for stone in stones)
+    return max_id + 1
+
+# =======================================================
+# LOAD / SAVE
+# =======================================================
+
+def empty_data() -> Dict[str, Any]:
+    return {key: [] for keys in DATA_FILES.values() for key in (keys if isinstance(keys, tuple) else (keys,))}
+
+def _read_data_file(filename: str, key: Union[str, tuple], path: str) -> Dict[str, list]:
+    try:
+        with timed('load.read', file=filename), open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with timed('load.parse', file=filename):
+            content = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise DataLoadError(filename, f"❌ ไฟล์ {filename} มีรูปแบบ JSON ไม่ถูกต้อง: {e}") from e
+    except Exception as e:
+        raise DataLoadError(filename, f"❌ เกิดข้อผิดพลาดในการโหลดไฟล์ {filename}: {e}") from e
+
+    if isinstance(key, tuple):
+        if not isinstance(content, dict):
+            raise DataLoadError(filename, f"❌ Error: {filename} ไม่ได้เป็น Object")
+        return {sub_key: content.get(sub_key, []) for sub_key in key}
+    if not isinstance(content, list):
+        raise DataLoadError(filename, f"❌ Error: {filename} ไม่ได้เป็น List")
+    return {key: content}
+
+@timed('load')
+def load_all_data(base_path: str = DATA_FOLDER, strict: bool = True,
+                  log: Optional[Callable[[str], None]] = None,
+                  errors: Optional[List[DataLoadError]] = None) -> Dict[str, Any]:
+    """
+    โหลดไฟล์ JSON ทั้งหมดเข้าสู่หน่วยความจำ (ไม่มีการเรียก UI ใด ๆ)
+
+    :param strict: True = โยน DataLoadError เมื่อไฟล์เสีย, False = ข้ามไฟล์นั้นแล้วแจ้งผ่าน log
+    :param log: Callback รับข้อความสถานะการโหลดแต่ละไฟล์ (เช่น print)
+    :param errors: (เมื่อไม่ strict) List ที่รับ DataLoadError ของไฟล์ที่ถูกข้าม
+    :raises DataLoadError: เมื่อ strict และมีไฟล์ที่อ่านไม่ได้
+    """
+    log = log or (lambda message: None)
+    data = empty_data()
+
+    for filename, key in DATA_FILES.items():
+        path = os.path.join(base_path, filename)
+        if not os.path.exists(path):
+            log(f"⚠️ คำเตือน: ไม่พบไฟล์ {filename} ที่ {path}")
+            continue
+        try:
+            loaded = _read_data_file(filename, key, path)
+        except DataLoadError as e:
+            if strict:
+                raise
+            if errors is not None:
+                errors.append(e)
+            log(str(e))
+            continue
+        data.update(loaded)
+        counts = ', '.join(f"{k}: {len(v)}" for k, v in loaded.items()) if len(loaded) > 1 else len(loaded[key])
+        log(f"✅ โหลด {filename} ({counts} รายการ)")
+    return data
+
+@contextmanager
+def file_lock(path: str, timeout: float = LOCK_TIMEOUT) -> Iterator[None]:
+    """
+    Advisory Lock ระหว่าง Process/เครื่องที่ใช้โฟลเดอร์ข้อมูลร่วมกัน (ล็อกไฟล์ <path>.lock)
+    ผู้อ่านไม่ต้องล็อก เพราะการเขียนใช้ write_json_atomic (อ่านได้ไฟล์เก่าหรือใหม่ครบทั้งไฟล์เสมอ)
+
+    :raises LockTimeout: เมื่อรอนานเกิน timeout
+    """
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                elif msvcrt is not None:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"ไฟล์ {os.path.basename(path)} กำลังถูกบันทึกโดยโปรแกรมอื่น (รอเกิน {timeout:g} วินาที)")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+def _json_default(value: Any) -> Any:
+    """Record แบบ Mapping ที่ไม่ใช่ dict (เช่น StoneRecord) เขียนเป็น Object ตามลำดับ Key เดิม"""
+    if isinstance(value, Mapping):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def write_json_temp(path: str, content: Any) -> str:
+    """
+    เขียน JSON ลงไฟล์ชั่วคราวข้าง path (ชื่อไม่ซ้ำต่อ Process/Thread จึงเขียนนอก Lock ได้)
+    :return: path ของไฟล์ชั่วคราว (ผู้เรียก os.replace หรือลบเอง)
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False, indent=2, default=_json_default)
+    except BaseException:
+        discard_file(tmp_path)
+        raise
+    return tmp_path
+
+def discard_file(path: str):
+    """ลบไฟล์ (เช่นไฟล์ชั่วคราวที่ไม่ใช้แล้ว) หากมีอยู่"""
+    if os.path.exists(path):
+        os.remove(path)
+
+def write_json_atomic(path: str, content: Any):
+    """เขียน JSON ลงไฟล์ชั่วคราวแล้ว os.replace (ผู้อ่านไม่เห็นไฟล์ที่เขียนไม่ครบ)"""
+    tmp_path = write_json_temp(path, content)
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        discard_file(tmp_path)
+        raise
+
+def file_stamp(path: str) -> Optional[tuple]:
+    """
+    (inode, mtime_ns, size) ของไฟล์ ใช้ตรวจว่าไฟล์ถูกเขียนใหม่หรือไม่ (None = ไม่มีไฟล์)
+    write_json_atomic ได้ inode ใหม่ทุกครั้ง จึงเห็นการเขียนซ้ำภายในเวลาเดียวกันของ mtime ด้วย
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+@timed('save')
+def save_stones(stones_data: List[Dict[str, Any]], base_path: str = DATA_FOLDER) -> str:
+    """
+    บันทึกข้อมูลหินทั้งหมดทับไฟล์ JSON หลัก (ภายใต้ Lock และเขียนแบบ Atomic)
+    การแก้ไขบางรายการจากหลายโปรแกรมพร้อมกันให้ใช้ pystone_engine.store.merge_save_records แทน
+    :return: path ของไฟล์ที่บันทึก (โยน Exception เดิมหากบันทึกไม่ได้)
+    """
+    file_path = os.path.join(base_path, STONES_FILE)
+    with file_lock(file_path):
+        write_json_atomic(file_path, stones_data)
+    return file_path
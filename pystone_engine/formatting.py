@@ -0,0 +1,227 @@
+from typing import Dict, List, Any, Union, Tuple
+
+from pystone_engine.data import split_ids, lookup_name
+from pystone_engine.timing import timed
+from pystone_engine.template import render_template
+
+# =======================================================
+# STRUCTURED TEXT SEGMENTS
+# =======================================================
+# รายงานรายละเอียดถูกสร้างเป็น List ของ (ข้อความ, tag) โดย tag '' = ข้อความปกติ
+# ใช้ได้ทั้งใส่ลง tk.Text ครั้งเดียวพร้อม Tag และส่งต่อให้ Exporter
+Segment = Tuple[str, str]
+
+def join_line_segments(lines: List[Segment]) -> List[Segment]:
+    """รวมบรรทัด (ข้อความ, tag) เป็น Segment Stream โดยคั่นแต่ละบรรทัดด้วย newline"""
+    segments = []
+    for i, line in enumerate(lines):
+        if i:
+            segments.append(('\n', ''))
+        segments.append(line)
+    return segments
+
+def segments_to_text(segments: List[Segment]) -> str:
+    """แปลง Segment Stream เป็นข้อความล้วน (สำหรับ Export .txt)"""
+    return ''.join(text for text, _ in segments)
+
+# =======================================================
+# SUMMARIES
+# =======================================================
+
+def format_date_summary(auspice_result: Dict[str, Union[int, str]], all_data: Dict[str, Any], unlucky_count: int = 0) -> str:
+    """สร้างข้อความสรุป วดป.เกิด (วัน/สีมงคล/อัปมงคล, เดือน, ปีนักษัตร, ราศี)"""
+
+    d_id = auspice_result['day_id']
+    m_id = auspice_result['month_id']
+    a_id = auspice_result['animal_id']
+    s_id = auspice_result['sign_id']
+
+
+    # ตรรกะการแสดงผลสำหรับวันพุธ (กลางวัน/กลางคืน)
+    day_info_html = ""
+    if d_id == 4:
+        day_info_day = next((d for d in all_data['days'] if d['id'] == 4), None)
+        day_info_night = next((d for d in all_data['days'] if d['id'] == 5), None)
+
+        if day_info_day and day_info_night:
+            day_info_html = (
+                f"📅 วันพุธ | "
+                f"กลางวัน: มงคล:{day_info_day['lucky_color']} | อัปมงคล:{day_info_day['unlucky_color']} "
+                f"กลางคืน: มงคล:{day_info_night['lucky_color']} | อัปมงคล:{day_info_night['unlucky_color']}"
+            )
+    else:
+        day_info = next((d for d in all_data['days'] if d['id'] == d_id), None)
+        if day_info:
+             day_info_html = (
+                f"📅 วัน{day_info['name']} | "
+                f"มงคล: {day_info['lucky_color']} | อัปมงคล: {day_info['unlucky_color']}"
+            )
+
+    month_name = lookup_name(all_data['months'], m_id, 'name')
+    animal_name = lookup_name(all_data['animals'], a_id, 'thai_name')
+    sign_name = lookup_name(all_data['signs'], s_id, 'name')
+
+    # FIX: รวม Unlucky Count ในวงเล็บ
+    unlucky_note = f" (❌ {unlucky_count} มีหินสีอัปมงคล)" if unlucky_count > 0 else ""
+
+    summary = (
+        f"{day_info_html} | "
+        f"📆 เดือน{month_name} | ปีนักษัตร: {animal_name} | ราศี: {sign_name}"
+        f"{unlucky_note}"
+    )
+    return summary
+
+
+def format_condition_summary(day_id: int, all_data: Dict[str, Any], unlucky_count: int = 0) -> str:
+    """สร้างข้อความสรุปสีมงคล/อัปมงคลของวันที่เลือกในโหมด Condition"""
+    # ตรรกะการแสดงผลสำหรับวันพุธ (กลางวัน/กลางคืน)
+    day_info_html = ""
+    if day_id == 4 or day_id == 5:
+        day_info_day = next((d for d in all_data['days'] if d['id'] == 4), None)
+        day_info_night = next((d for d in all_data['days'] if d['id'] == 5), None)
+        
+        if day_info_day and day_info_night:
+            day_info_html = (
+                f"📅 วันพุธ | "
+                f"กลางวัน: มงคล:{day_info_day['lucky_color']} | อัปมงคล:{day_info_day['unlucky_color']} "
+                f"กลางคืน: มงคล:{day_info_night['lucky_color']} | อัปมงคล:{day_info_night['unlucky_color']}"
+            )
+    else:
+        day_info = next((d for d in all_data['days'] if d['id'] == day_id), None)
+        if day_info:
+             day_info_html = (
+                f"📅 วัน{day_info['name']} | "
+                f"มงคล: {day_info['lucky_color']} | อัปมงคล: {day_info['unlucky_color']}"
+            )
+    
+    # FIX: รวม Unlucky Count ในวงเล็บ
+    unlucky_note = f" (❌ {unlucky_count} มีหินสีอัปมงคล)" if unlucky_count > 0 else ""
+    return f"{day_info_html}{unlucky_note}"
+
+
+def get_next_element_name(current_name: str) -> str:
+    """Helper function สำหรับแสดงวัฏจักรส่งเสริม (ใช้ชื่อธาตุในการคำนวณ)"""
+
+    # ลำดับการส่งเสริม (相生 - Shēng) ตามหลักปรัชญาจีน: ไม้ -> ไฟ -> ดิน -> ทอง/โลหะ -> น้ำ -> ไม้
+    relationship = {
+        "ไม้": "ไฟ",
+        "ไฟ": "ดิน", 
+        "ดิน": "ทอง/โลหะ",
+        "ทอง/โลหะ": "น้ำ",
+        "น้ำ": "ไม้"
+    }
+
+    # ค้นหาธาตุที่ถูกสร้างโดยธาตุปัจจุบัน
+    return relationship.get(current_name, 'N/A')
+
+
+# =======================================================
+# DETAIL VIEWS (ผ่าน Template ที่ Compile แล้ว ดู pystone_engine.template)
+# =======================================================
+
+def stone_detail_context(stone: Dict[str, Any], all_data: Dict[str, Any]) -> Dict[str, Any]:
+    """เตรียมค่าทั้งหมดที่ Template 'stone_detail' ใช้ (แปลง ID เป็นชื่อ, ค้นรายละเอียดจักระ/ธาตุ/เลข)"""
+    def format_lookup_list_local(ids_str, lookup_data, display_key):
+        ids = split_ids(ids_str)
+        names = [lookup_name(lookup_data, id, display_key) for id in ids]
+        return ', '.join(names) if names else '-'
+
+    # --- CHAKRA ---
+    chakra_lookup = {c['id']: c for c in all_data.get('chakra', [])}
+    chakras = []
+    for ch_id in split_ids(stone.get('chakra_ids', '')):
+        item = chakra_lookup.get(ch_id)
+        if item:
+            chakras.append({
+                'found': True,
+                'id': ch_id,
+                # FIX: ใช้ชื่อจักระที่ถูกต้องในการนำเสนอ (แยกส่วน 'ธาตุ' ออก)
+                'name_th': item.get('name_th', 'N/A').split('ธาตุ: ')[0].strip(),
+                'location': item.get('location', '-'),
+                'auspice_detail_th': item.get('auspice_detail_th', 'N/A'),
+                'color': item.get('color', '-'),
+            })
+        else:
+            chakras.append({'found': False, 'id': ch_id})
+
+    # --- ELEMENT ---
+    element_lookup = {e['id']: e for e in all_data.get('element', [])} # Use 'element' (no s)
+    elements = []
+    for el_id in split_ids(stone.get('element_ids', '')):
+        item = element_lookup.get(el_id)
+        if item:
+            name_th = item.get('name_th', 'N/A')
+            elements.append({
+                'found': True,
+                'id': el_id,
+                'name_th': name_th,
+                'description': item.get('description', '-'),
+                'auspice_detail_th': item.get('auspice_detail_th', 'N/A'),
+                'next_element': get_next_element_name(name_th),
+            })
+        else:
+            elements.append({'found': False, 'id': el_id})
+
+    # --- NUMEROLOGY (เรียงตามค่าตัวเลข) ---
+    numerology_ids = split_ids(stone.get('numerology_ids', ''))
+    numbers = sorted(
+        [item for item in all_data.get('numerology', []) if item.get('id') in numerology_ids],
+        key=lambda x: x.get('number_value', 99)
+    )
+
+    return {
+        'stone': stone,
+        'thai_name': stone['thai_name'],
+        'english_name': stone['english_name'],
+        'other_names': stone.get('other_names', '-'),
+        'short_description': stone.get('description', '-')[:200],
+        'description': stone.get('description', '-'),
+        'groups': format_lookup_list_local(stone.get('group_ids', ''), all_data['groups'], 'name'),
+        'colors': format_lookup_list_local(stone.get('color_ids', ''), all_data['colors'], 'name'),
+        'good_days': format_lookup_list_local(stone.get('good_days', ''), all_data['days'], 'name'),
+        'good_months': format_lookup_list_local(stone.get('good_months', ''), all_data['months'], 'name'),
+        'good_zodiac_animals': format_lookup_list_local(stone.get('good_zodiac_animals', ''), all_data['animals'], 'thai_name'),
+        'good_zodiac_signs': format_lookup_list_local(stone.get('good_zodiac_signs', ''), all_data['signs'], 'name'),
+        'chakras': chakras,
+        'elements': elements,
+        'has_numerology': bool(numerology_ids),
+        'numbers': [{'number_value': n.get('number_value', 'N/A'), 'auspice_detail_th': n.get('auspice_detail_th', 'N/A')} for n in numbers],
+    }
+
+@timed('detail')
+def format_stone_detail(stone: Dict[str, Any], all_data: Dict[str, Any]) -> List[Segment]:
+    """
+    จัดรูปแบบรายละเอียดหินเป็น Segments (ข้อความ, tag) โดยมีส่วนขยาย Chakra/Element/Numerology
+    รูปแบบมาจาก Template 'stone_detail' (ปรับแต่งได้ใน data/templates)
+    """
+    return render_template('stone_detail', stone_detail_context(stone, all_data))
+
+
+LOOKUP_HEADERS = {'chakra': '🧘‍♂️ 7 จักระ (Chakra)', 'element': '🌟 5 ธาตุ (Wǔxíng)', 'numerology': '🔢 เลขศาสตร์ (Numerology)'}
+
+def lookup_detail_context(key: str, lookup_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """เตรียมค่าที่ Template 'lookup_<key>' ใช้ (ประวัติ + รายละเอียดมงคล ของทุกรายการ)"""
+    if key == 'numerology':
+        sorted_data = sorted([d for d in lookup_data if d.get('number_value') in range(1, 10)], key=lambda x: x.get('number_value', 0))
+        items = [{'number_value': item.get('number_value'), 'auspice_detail_th': item.get('auspice_detail_th', 'N/A')} for item in sorted_data]
+    else: # สำหรับ Chakra และ Element (ที่มีรายละเอียดประวัติแยกรายตัว)
+        items = []
+        for item in sorted(lookup_data, key=lambda x: x.get('id', 0)):
+            name_th = item.get('name_th', '-')
+            items.append({
+                'id': item.get('id'),
+                'name_th': name_th,
+                'name_upper': name_th.upper(),
+                'history_th': item.get('history_th', 'N/A'),
+                'auspice_detail_th': item.get('auspice_detail_th', 'N/A'),
+                'location': item.get('location', '-'),
+                'element_name': name_th.split('ธาตุ: ')[-1].strip() if 'ธาตุ:' in name_th else name_th,
+                'logo': item.get('logo', '-'),
+                'description': item.get('description', '-'),
+                'next_element': get_next_element_name(name_th),
+            })
+    return {'key': key, 'display_name': LOOKUP_HEADERS.get(key, 'รายละเอียด'), 'items': items if lookup_data else []}
+
+def format_lookup_detail(key: str, lookup_data: List[Dict[str, Any]]) -> List[Segment]:
+    """จัดรูปแบบ Lookup (จักระ, ธาตุ, เลขมงคล) เป็น Segments ผ่าน Template 'lookup_<key>'"""
+    return render_template(f'lookup_{key}', lookup_detail_context(key, lookup_data))
@@ -0,0 +1,158 @@
+from typing import Dict, List, Any, Set, Iterable, Tuple, Union
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# ฟิลด์ความสัมพันธ์ในหินที่ต้องสร้าง Index (stone key -> lookup key)
+RELATION_FIELDS = {
+    'group_ids': 'groups',
+    'color_ids': 'colors',
+    'good_days': 'days',
+    'good_months': 'months',
+    'good_zodiac_animals': 'animals',
+    'good_zodiac_signs': 'signs',
+    'chakra_ids': 'chakra',
+    'element_ids': 'element',
+    'numerology_ids': 'numerology',
+}
+
+# lookup key -> ฟิลด์ของหินที่อ้างถึงตารางนั้น (กลับด้านของ RELATION_FIELDS)
+LOOKUP_FIELDS: Dict[str, Tuple[str, ...]] = {
+    lookup_key: tuple(field for field, key in RELATION_FIELDS.items() if key == lookup_key)
+    for lookup_key in RELATION_FIELDS.values()
+}
+
+# Map parameter key (ตามที่ใช้ใน apply_auspice_filter) กับ stone data key
+PARAM_TO_STONE_KEY = {
+    'group_id': 'group_ids',
+    'day_id': 'good_days',
+    'month_id': 'good_months',
+    'animal_id': 'good_zodiac_animals',
+    'sign_id': 'good_zodiac_signs',
+}
+
+# วันพุธกลางวัน (4) ต้องรวมหินของพุธกลางคืน (5) ด้วย
+WEDNESDAY_DAY_ID = 4
+WEDNESDAY_NIGHT_ID = 5
+
+EMPTY: frozenset = frozenset()
+
+# =======================================================
+# HELPER FUNCTIONS
+# =======================================================
+
+def parse_ids(id_string: str) -> List[int]:
+    """แปลง string ของ IDs ที่คั่นด้วยช่องว่างเป็น List ของ int (เหมือน split_ids)"""
+    if not id_string:
+        return []
+    return [int(s) for s in str(id_string).split() if s.isdigit()]
+
+def stone_relation_ids(stone: Dict[str, Any], field: str) -> Iterable[int]:
+    """ID ในฟิลด์ความสัมพันธ์ของหิน: StoneRecord อ่านจาก ID ที่เก็บไว้โดยตรง, dict ธรรมดาใช้ parse_ids"""
+    relation_ids = getattr(stone, 'relation_ids', None)
+    if relation_ids is not None:
+        return relation_ids(field)
+    return parse_ids(stone.get(field, ''))
+
+# =======================================================
+# INVERTED INDEX
+# =======================================================
+
+class StoneIndex:
+    """
+    Inverted Index ของหิน: (ฟิลด์ความสัมพันธ์, lookup id) -> set ของ stone id
+    ใช้หาผลลัพธ์และนับจำนวน (Facet Count) ด้วยการ Intersect ชุด ID แทนการวนกรองหินทุกครั้ง
+    """
+    def __init__(self, stones: List[Dict[str, Any]]):
+        self.postings: Dict[str, Dict[int, Set[int]]] = {field: {} for field in RELATION_FIELDS}
+        self.all_ids: Set[int] = set()
+        for stone in stones:
+            self.add_stone(stone)
+
+    def add_stone(self, stone: Dict[str, Any]):
+        """เพิ่มหินหนึ่งรายการเข้า Index"""
+        stone_id = stone.get('id')
+        self.all_ids.add(stone_id)
+        for field, postings in self.postings.items():
+            for rel_id in stone_relation_ids(stone, field):
+                postings.setdefault(rel_id, set()).add(stone_id)
+
+    def remove_stone(self, stone: Dict[str, Any]):
+        """ลบหินหนึ่งรายการออกจาก Index"""
+        stone_id = stone.get('id')
+        self.all_ids.discard(stone_id)
+        for field, postings in self.postings.items():
+            for rel_id in stone_relation_ids(stone, field):
+                ids = postings.get(rel_id)
+                if ids is not None:
+                    ids.discard(stone_id)
+
+    def update(self, removed: Iterable[Dict[str, Any]], added: Iterable[Dict[str, Any]]) -> Set[int]:
+        """
+        ปรับ Index เฉพาะหินที่เปลี่ยน (ผลของ diff_stones) แทนการสร้างใหม่ทั้งหมด
+        :return: set ของ stone id ที่เปลี่ยน
+        """
+        changed = set()
+        for stone in removed:
+            self.remove_stone(stone)
+            changed.add(stone.get('id'))
+        for stone in added:
+            self.add_stone(stone)
+            changed.add(stone.get('id'))
+        return changed
+
+    def ids_for(self, field: str, rel_id: int) -> Set[int]:
+        """คืน set ของ stone id ที่มี rel_id ในฟิลด์ที่กำหนด"""
+        return self.postings.get(field, {}).get(rel_id, EMPTY)
+
+    def ids_for_any(self, field: str, rel_ids: Iterable[int]) -> Set[int]:
+        """คืน set ของ stone id ที่มี ID ใด ID หนึ่งในฟิลด์ที่กำหนด (OR Logic)"""
+        result = set()
+        for rel_id in rel_ids:
+            result |= self.ids_for(field, rel_id)
+        return result
+
+    def referencing(self, lookup_key: str, lookup_id: int) -> Set[int]:
+        """stone id ของหินที่อ้างถึงรายการ Lookup (lookup_key, lookup_id) ในฟิลด์ใดก็ได้ (ไม่ต้องไล่ดูหินทุกรายการ)"""
+        result = set()
+        for field in LOOKUP_FIELDS.get(lookup_key, ()):
+            result |= self.ids_for(field, lookup_id)
+        return result
+
+    def ids_for_param(self, param_key: str, param_val: Union[int, str]) -> Set[int]:
+        """
+        คืน set ของ stone id ตามเงื่อนไขเดียวของ apply_auspice_filter
+        (รวมกรณีพิเศษ: ค้นด้วยพุธกลางวันจะรวมพุธกลางคืนด้วย)
+        """
+        field = PARAM_TO_STONE_KEY[param_key]
+        value = int(param_val)
+        if param_key == 'day_id' and value == WEDNESDAY_DAY_ID:
+            return self.ids_for_any(field, (WEDNESDAY_DAY_ID, WEDNESDAY_NIGHT_ID))
+        return self.ids_for(field, value)
+
+    def match_ids(self, params: Dict[str, Union[str, List[str]]]) -> Set[int]:
+        """
+        หา stone id ที่ตรงกับทุกเงื่อนไข (AND) ตามรูปแบบ params เดียวกับ apply_auspice_filter
+        โดย lucky_color_ids เป็นเงื่อนไข OR (มีสีมงคลอย่างน้อย 1 สี)
+        """
+        result = self.all_ids
+        lucky_ids = params.get('lucky_color_ids')
+        if lucky_ids:
+            result = result & self.ids_for_any('color_ids', (int(c) for c in lucky_ids))
+
+        for param_key, param_val in params.items():
+            if param_key not in PARAM_TO_STONE_KEY or not param_val or param_val == '0':
+                continue
+            result = result & self.ids_for_param(param_key, param_val)
+            if not result:
+                break
+        return set(result)
+
+    def facet_counts(self, base_ids: Set[int], candidates: Dict[int, Set[int]]) -> Dict[int, int]:
+        """
+        นับจำนวนหินที่จะได้หากเพิ่มตัวเลือกแต่ละตัวเข้าไปในการค้นหาปัจจุบัน
+
+        :param base_ids: ผลลัพธ์ของเงื่อนไขอื่น ๆ ที่เลือกอยู่
+        :param candidates: option id -> set ของ stone id ที่ตัวเลือกนั้นให้ผล
+        """
+        return {option_id: len(base_ids & ids) for option_id, ids in candidates.items()}
@@ -0,0 +1,74 @@
+import os
+import threading
+from typing import Dict, List, Callable, Optional, Tuple
+
+from pystone_engine.data import DATA_FOLDER, DataLoadError, load_all_data
+from pystone_engine.catalog import Catalog
+from pystone_engine.records import compact_stones
+from pystone_engine.timing import timed
+from pystone_engine.validate import validate_catalog, format_issues
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# เก็บหินเป็น StoneRecord (PYSTONE_COMPACT=0 = dict ตาม JSON)
+COMPACT_RECORDS = os.environ.get('PYSTONE_COMPACT', '1') != '0'
+
+# จำนวนปัญหาข้อมูลที่แจ้งผ่าน log ตอนโหลด (ทั้งหมดอยู่ใน catalog.issues)
+LOG_ISSUES_LIMIT = 10
+
+# =======================================================
+# SHARED CATALOG LOADER (โหลดครั้งเดียวต่อ Process ต่อโฟลเดอร์ข้อมูล)
+# =======================================================
+_lock = threading.Lock()
+_catalogs: Dict[str, Tuple[Catalog, List[DataLoadError]]] = {}
+
+def get_catalog(base_path: str = DATA_FOLDER, strict: bool = True,
+                log: Optional[Callable[[str], None]] = None) -> Catalog:
+    """
+    Catalog ของโฟลเดอร์ข้อมูลที่ใช้ร่วมกันทั้ง Process: ไฟล์ JSON ถูก Parse ครั้งแรกที่เรียกเท่านั้น
+    (หินผ่าน compact_stones ตาม COMPACT_RECORDS, สร้าง StoneIndex และตรวจด้วย validate_catalog
+    ผลอยู่ใน catalog.issues แล้ว) เรียกจากหลาย Thread ได้:
+    Thread ที่มาระหว่างโหลดจะรอผลชุดเดียวกัน
+
+    ไฟล์ที่เสียถูกข้ามและจำไว้กับแคตตาล็อก strict=True โยน DataLoadError แรกทุกครั้งที่เรียก
+    จนกว่าจะ clear_catalog_cache() หลังแก้ไฟล์ ผู้ที่แก้ข้อมูลต้องผ่าน catalog.apply_stones / apply_lookup
+    (หรือเรียก catalog.invalidate()) เพื่อให้ Index, ลำดับ id และ version ตรงกันสำหรับทุกผู้ใช้
+
+    :param log: Callback รับข้อความสถานะการโหลด (เช่น print) ครั้งถัดไปแจ้งเฉพาะไฟล์ที่ถูกข้าม
+    :raises DataLoadError: เมื่อ strict และมีไฟล์ที่อ่านไม่ได้
+    """
+    log = log or (lambda message: None)
+    key = os.path.abspath(base_path)
+    with _lock:
+        entry = _catalogs.get(key)
+        if entry is None:
+            errors: List[DataLoadError] = []
+            data = load_all_data(base_path, strict=False, log=log, errors=errors)
+            if COMPACT_RECORDS:
+                with timed('load.compact'):
+                    data['stones'] = compact_stones(data['stones'])
+            catalog = Catalog(data)
+            catalog.load_errors = errors
+            with timed('load.index'):
+                catalog.index
+            catalog.issues = validate_catalog(data, catalog.index)
+            if catalog.issues:
+                log(f"⚠️ พบปัญหาข้อมูล {len(catalog.issues)} รายการ:\n{format_issues(catalog.issues, LOG_ISSUES_LIMIT)}")
+            entry = _catalogs[key] = (catalog, errors)
+        else:
+            log(f"ใช้ข้อมูลที่โหลดไว้แล้วจาก '{base_path}'")
+            for e in entry[1]:
+                log(str(e))
+    catalog, errors = entry
+    if strict and errors:
+        raise errors[0]
+    return catalog
+
+def clear_catalog_cache(base_path: Optional[str] = None):
+    """ลืมแคตตาล็อกที่โหลดไว้ (None = ทุกโฟลเดอร์) การเรียก get_catalog ครั้งถัดไปอ่านไฟล์ใหม่"""
+    with _lock:
+        if base_path is None:
+            _catalogs.clear()
+        else:
+            _catalogs.pop(os.path.abspath(base_path), None)
@@ -0,0 +1,108 @@
+import sys
+import tracemalloc
+from typing import Dict, List, Any, Callable, Optional, Set, Tuple
+
+# =======================================================
+# DEEP SIZE (ขนาดของ Object รวมทุก Object ที่อ้างถึง)
+# =======================================================
+
+def _slot_names(cls: type) -> List[str]:
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return names
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """
+    ขนาดโดยประมาณ (bytes) ของ obj รวม dict/list/tuple/set ภายใน, __slots__ และ __dict__ ของ Object
+    Object ที่อยู่ใน seen แล้วไม่นับซ้ำ: ส่ง seen ชุดเดียวกันเมื่อวัดหลายโครงสร้าง
+    เพื่อให้ข้อความที่ Intern/ใช้ร่วมกันถูกนับที่โครงสร้างแรกเท่านั้น
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, type):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, int, float, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(item.__dict__)
+            for name in _slot_names(type(item)):
+                value = getattr(item, name, None)
+                if value is not None:
+                    stack.append(value)
+    return total
+
+# =======================================================
+# MEMORY REPORT (แยกตามโครงสร้าง)
+# =======================================================
+
+def memory_report(all_data: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    ขนาดของแต่ละโครงสร้างในหน่วยความจำ เรียงจากใหญ่ไปเล็ก
+    :param all_data: ข้อมูลจาก load_all_data (แต่ละ key เป็น 1 แถว)
+    :param extra: โครงสร้างอื่นที่ต้องการวัด เช่น {'stone_index': index, 'row_cache': cache}
+    :return: [{'name', 'count' (จำนวนรายการ หรือ None), 'bytes', 'per_item'}]
+    """
+    seen: Set[int] = set()
+    rows = []
+    # วัดหินก่อน: ข้อความที่ Index/Cache ใช้ร่วมกับหินถูกนับเป็นของหิน
+    structures = sorted(all_data.items(), key=lambda kv: kv[0] != 'stones')
+    structures += list((extra or {}).items())
+    for name, value in structures:
+        size = deep_sizeof(value, seen)
+        count = len(value) if hasattr(value, '__len__') else None
+        rows.append({'name': name, 'count': count, 'bytes': size,
+                     'per_item': size / count if count else None})
+    rows.sort(key=lambda r: r['bytes'], reverse=True)
+    return rows
+
+def format_memory_report(rows: List[Dict[str, Any]]) -> str:
+    """ข้อความตารางของ memory_report (รวมยอดท้ายตาราง)"""
+    lines = [f"{'โครงสร้าง':<20} {'รายการ':>10} {'KiB':>12} {'bytes/รายการ':>14}"]
+    for row in rows:
+        count = '-' if row['count'] is None else f"{row['count']:,}"
+        per_item = '-' if row['per_item'] is None else f"{row['per_item']:,.0f}"
+        lines.append(f"{row['name']:<20} {count:>10} {row['bytes'] / 1024:>12,.1f} {per_item:>14}")
+    lines.append(f"{'รวม':<20} {'':>10} {sum(r['bytes'] for r in rows) / 1024:>12,.1f}")
+    return '\n'.join(lines)
+
+# =======================================================
+# TRACEMALLOC
+# =======================================================
+
+def traced_allocation(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, int, int]:
+    """
+    เรียก func ภายใต้ tracemalloc
+    :return: (ผลลัพธ์, หน่วยความจำที่ยังถูกใช้หลังเรียก (bytes), หน่วยความจำสูงสุดระหว่างเรียก (bytes))
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        result = func(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return result, current - before, peak - before
+
+def top_allocations(limit: int = 15) -> List[str]:
+    """บรรทัดโค้ดที่จองหน่วยความจำมากที่สุด (ต้องเริ่ม tracemalloc ก่อน เช่น PYTHONTRACEMALLOC=1)"""
+    if not tracemalloc.is_tracing():
+        return []
+    return [str(stat) for stat in tracemalloc.take_snapshot().statistics('lineno')[:limit]]
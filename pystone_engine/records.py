@@ -0,0 +1,168 @@
+import sys
+from collections.abc import MutableMapping
+from typing import Dict, List, Any, Iterable, Iterator, Tuple, Union
+
+from pystone_engine.index import RELATION_FIELDS, parse_ids
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# ฟิลด์ที่รู้จักของหิน (เก็บใน __slots__) ฟิลด์อื่น เช่น revision เก็บใน Dict เสริมของแต่ละรายการ
+STONE_FIELDS = ('id', 'english_name', 'thai_name', 'other_names', 'description') + tuple(RELATION_FIELDS)
+
+# ข้อความที่ซ้ำกันบ่อยระหว่างหิน -> sys.intern ให้ทุกรายการใช้ Object เดียวกัน
+INTERNED_FIELDS = frozenset(('english_name', 'thai_name', 'other_names'))
+
+_SLOT_OF = {field: f'_{field}' for field in STONE_FIELDS}
+_MISSING = object()
+
+# =======================================================
+# PACKING (ID ของความสัมพันธ์เก็บเป็น bytes: 1 byte ต่อ ID, ID 0-255)
+# =======================================================
+_ID_TEXT = [str(i) for i in range(256)]
+
+# ข้อความ ID ที่แปลงแล้ว (ชุด ID เดียวกันซ้ำกันมากระหว่างหิน เช่น good_days) ล้างเมื่อเกินขนาด
+PACK_CACHE_SIZE = 65536
+_packed: Dict[str, Union[bytes, str]] = {}
+
+# ลำดับ Key ของหิน (ส่วนใหญ่เหมือนกันทั้งไฟล์) ใช้ Tuple เดียวกัน
+_KEY_ORDERS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def pack_relation_ids(value: Any) -> Union[bytes, Any]:
+    """แปลง "1 3 5" เป็น b'\\x01\\x03\\x05' ถ้าแปลงกลับได้ข้อความเดิมทุกตัวอักษร ไม่เช่นนั้นเก็บค่าเดิม"""
+    if value.__class__ is not str:
+        return value
+    packed = _packed.get(value)
+    if packed is not None:
+        return packed
+    try:
+        packed = bytes(map(int, value.split()))
+    except ValueError: # ไม่ใช่ตัวเลข หรือ ID เกิน 255
+        packed = value
+    if packed is not value and _unpack_ids(packed) != value: # เช่น "01" หรือเว้นวรรคซ้ำ: คงข้อความเดิมเพื่อบันทึกกลับได้ตรงกับไฟล์
+        packed = value
+    if len(_packed) >= PACK_CACHE_SIZE:
+        _packed.clear()
+    _packed[value] = packed
+    return packed
+
+def _unpack_ids(ids: bytes) -> str:
+    return ' '.join([_ID_TEXT[i] for i in ids])
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if value.__class__ is str else value
+
+_PACKERS = {**{field: pack_relation_ids for field in RELATION_FIELDS}, **{field: _intern for field in INTERNED_FIELDS}}
+
+def _shared_keys(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    return _KEY_ORDERS.setdefault(keys, keys)
+
+# =======================================================
+# COMPACT STONE RECORD
+# =======================================================
+
+class StoneRecord(MutableMapping):
+    """
+    หินหนึ่งรายการแบบประหยัดหน่วยความจำ ใช้แทน dict ได้ (stone['thai_name'], get, in, items, dict(stone), **stone)
+    - ฟิลด์ที่รู้จักเก็บใน __slots__ (ไม่มี __dict__ ต่อรายการ)
+    - ชื่อ/ชื่ออื่น ผ่าน sys.intern
+    - ฟิลด์ความสัมพันธ์เก็บเป็น bytes ของ ID (อ่านผ่าน relation_ids() โดยไม่ต้อง Split ข้อความ)
+      แต่ stone['color_ids'] ยังคืนข้อความ เช่น "1 3 5" (สร้างจาก ID ทุกครั้งที่อ่าน)
+    - ลำดับ Key คงตามไฟล์ JSON (บันทึกกลับแล้วไฟล์ไม่เปลี่ยนลำดับ)
+
+    copy() คืน StoneRecord ใหม่ ใช้ dict(stone) เมื่อต้องการ dict ธรรมดา
+    """
+    __slots__ = ('_keys', '_extra') + tuple(_SLOT_OF.values())
+
+    def __init__(self, data: Union[Dict[str, Any], Iterable[Tuple[str, Any]]] = (), **kwargs: Any):
+        self._extra: Union[Dict[str, Any], None] = None
+        if kwargs or not isinstance(data, dict):
+            data = dict(data, **kwargs)
+        for key, value in data.items():
+            slot = _SLOT_OF.get(key)
+            if slot is None:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = value
+            else:
+                packer = _PACKERS.get(key)
+                setattr(self, slot, value if packer is None else packer(value))
+        self._keys: Tuple[str, ...] = _shared_keys(tuple(data))
+
+    def _store(self, key: str, value: Any) -> bool:
+        """เก็บค่า :return: True ถ้าเป็น Key ใหม่ของรายการนี้"""
+        slot = _SLOT_OF.get(key)
+        if slot is None:
+            if self._extra is None:
+                self._extra = {}
+            is_new = key not in self._extra
+            self._extra[key] = value
+            return is_new
+        is_new = not hasattr(self, slot)
+        packer = _PACKERS.get(key)
+        setattr(self, slot, value if packer is None else packer(value))
+        return is_new
+
+    def __getitem__(self, key: str) -> Any:
+        slot = _SLOT_OF.get(key)
+        if slot is not None:
+            value = getattr(self, slot, _MISSING)
+        else:
+            value = self._extra.get(key, _MISSING) if self._extra else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        if value.__class__ is bytes and key in RELATION_FIELDS:
+            return _unpack_ids(value)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key: str, value: Any):
+        if self._store(key, value):
+            self._keys = _shared_keys(self._keys + (key,))
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        slot = _SLOT_OF.get(key)
+        if slot is None:
+            del self._extra[key]
+        else:
+            delattr(self, slot)
+        self._keys = _shared_keys(tuple(k for k in self._keys if k != key))
+
+    def __contains__(self, key: object) -> bool:
+        slot = _SLOT_OF.get(key)
+        if slot is None:
+            return bool(self._extra) and key in self._extra
+        return hasattr(self, slot)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def relation_ids(self, field: str) -> Iterable[int]:
+        """ID ของฟิลด์ความสัมพันธ์ (bytes ที่วนได้เป็น int หรือ List ของ int ถ้าเก็บเป็นข้อความ)"""
+        value = getattr(self, _SLOT_OF[field], '')
+        if value.__class__ is bytes:
+            return value
+        return parse_ids(value)
+
+    def copy(self) -> 'StoneRecord':
+        return StoneRecord(self.items())
+
+    def __repr__(self) -> str:
+        return f"StoneRecord({dict(self.items())!r})"
+
+    def __reduce__(self):
+        return (StoneRecord, (dict(self.items()),))
+
+def compact_stones(stones: Iterable[Dict[str, Any]]) -> List[StoneRecord]:
+    """แปลงรายการหิน (dict จาก JSON) เป็น StoneRecord (รายการที่เป็น StoneRecord อยู่แล้วใช้ Object เดิม)"""
+    return [stone if isinstance(stone, StoneRecord) else StoneRecord(stone) for stone in stones]
@@ -0,0 +1,155 @@
+from typing import Dict, List, Any, Iterable, Union, Optional
+
+from pystone_engine.auspice import calculate_auspice_ids, get_lucky_color_ids, check_unlucky_color
+from pystone_engine.index import PARAM_TO_STONE_KEY, stone_relation_ids
+from pystone_engine.timing import timed
+
+SearchParams = Dict[str, Union[str, List[str]]]
+
+# =======================================================
+# SEARCH PARAMETERS (รูปแบบเดียวกับที่ filter_data ส่งให้ apply_auspice_filter)
+# =======================================================
+
+def condition_search_params(day_id: int = 0, month_id: int = 0, animal_id: int = 0, sign_id: int = 0,
+                            group_id: int = 0) -> SearchParams:
+    """สร้าง params จาก ID ที่เลือก (0 = ไม่ระบุเงื่อนไขนั้น)"""
+    params = {}
+    for key, value in (('group_id', group_id), ('day_id', day_id), ('month_id', month_id),
+                       ('animal_id', animal_id), ('sign_id', sign_id)):
+        if value:
+            params[key] = str(value)
+    return params
+
+def date_search_params(auspice_result: Dict[str, Union[int, str]]) -> SearchParams:
+    """สร้าง params ของโหมด วดป.เกิด จากผลของ calculate_auspice_ids"""
+    return {
+        'day_id': str(auspice_result['day_id']),
+        'month_id': str(auspice_result['month_id']),
+        'animal_id': str(auspice_result['animal_id']),
+        'sign_id': str(auspice_result['sign_id']),
+    }
+
+@timed('search.lucky_colors')
+def add_lucky_color_param(params: SearchParams, day_id: int, all_data: Dict[str, Any]) -> SearchParams:
+    """เพิ่มเงื่อนไขสีมงคลของวัน (OR) ก่อนส่งไปกรอง"""
+    if day_id:
+        lucky_color_ids = get_lucky_color_ids(day_id, all_data)
+        if lucky_color_ids:
+            params['lucky_color_ids'] = lucky_color_ids
+    return params
+
+# =======================================================
+# FILTERING
+# =======================================================
+
+@timed('search.name')
+def search_by_name(stones: List[Dict[str, Any]], search_term: str) -> List[Dict[str, Any]]:
+    """ค้นหาจากชื่อไทย/อังกฤษ/ชื่ออื่น (ไม่สนตัวพิมพ์เล็กใหญ่) ค่าว่าง = ทั้งหมด"""
+    search_term = search_term.strip().lower()
+    if not search_term:
+        return list(stones)
+    return [s for s in stones if search_term in s['thai_name'].lower() or search_term in s['english_name'].lower() or search_term in s['other_names'].lower()]
+
+@timed('search.filter')
+def apply_auspice_filter(stones: List[Dict[str, Any]], params: SearchParams) -> List[Dict[str, Any]]:
+    """
+    ใช้ AND logic เพื่อกรองหินตาม ID ต่างๆ (Day, Month, Animal, Sign, Group, และ Lucky Color)
+    """
+
+    filtered = []
+    required_lucky_ids = set(params.get('lucky_color_ids', []))
+
+    for stone in stones:
+        is_match = True
+
+        # 1. CHECK LUCKY COLOR CONDITION (OR Logic - ต้องมีสีมงคลอย่างน้อย 1 สี)
+        if required_lucky_ids:
+            stone_color_ids = set([str(id) for id in stone_relation_ids(stone, 'color_ids')])
+
+            # ถ้าไม่มีสีมงคลใดๆ เลยในหินนี้ -> NOT A MATCH
+            if not (required_lucky_ids.intersection(stone_color_ids)):
+                is_match = False
+
+        if not is_match:
+            continue
+
+        # 2. CHECK GENERAL AND CONDITIONS (วัน, เดือน, นักษัตร, ราศี)
+        for param_key, param_val in params.items():
+            if param_key == 'lucky_color_ids':
+                continue # ข้ามสีมงคล เพราะถูกตรวจสอบแล้ว
+
+            stone_key = PARAM_TO_STONE_KEY.get(param_key)
+
+            if not stone_key or not param_val or param_val == '0': continue
+
+            # Check IDs against stone's relation IDs
+            stone_ids = [str(id) for id in stone_relation_ids(stone, stone_key)]
+
+            # Special handling for Wednesday (Day ID 4:กลางวัน, 5:กลางคืน)
+            if param_key == 'day_id' and param_val == '4':
+                # ถ้าค้นด้วย ID 4 (พุธกลางวัน) ต้องรวมหินที่เหมาะกับ ID 4 หรือ ID 5
+                if '4' not in stone_ids and '5' not in stone_ids:
+                    is_match = False
+                    break
+            elif param_val not in stone_ids:
+                is_match = False
+                break
+
+        if is_match:
+            filtered.append(stone)
+
+    return filtered
+
+@timed('search.unlucky')
+def unlucky_notes(stones: Iterable[Dict[str, Any]], day_id: int, all_data: Dict[str, Any]) -> Dict[int, str]:
+    """
+    หมายเหตุสีอัปมงคลของหินที่มีสีอัปมงคลของวันที่ระบุ เป็นผลของการค้นหาแต่ละครั้ง
+    (ไม่เขียน Flag ลงในหินของแคตตาล็อกที่ใช้ร่วมกัน)
+    :return: {stone id: หมายเหตุ} เฉพาะหินที่มีสีอัปมงคล (len = จำนวนหินที่มีสีอัปมงคล)
+    """
+    notes = {}
+    if not day_id:
+        return notes
+    for stone in stones:
+        result = check_unlucky_color(stone['color_ids'], day_id, all_data)
+        if result['is_unlucky']:
+            notes[stone['id']] = f"❌ มีสีอัปมงคล: {result['unlucky_colors_found']}"
+    return notes
+
+# =======================================================
+# RECOMMENDATION (โหมด วดป.เกิด)
+# =======================================================
+
+def recommend(date_th: str, all_data: Dict[str, Any], stones: Optional[List[Dict[str, Any]]] = None,
+              index=None) -> Dict[str, Any]:
+    """
+    หาหินที่แนะนำสำหรับ วดป.เกิด (พ.ศ.) ตามตรรกะเดียวกับโหมด วดป.เกิด ของ filter_data
+
+    :param index: StoneIndex ของ stones (ถ้ามีจะใช้ Index แทนการวนกรอง)
+    :return: {'auspice': ผล calculate_auspice_ids, 'params': เงื่อนไขที่ใช้,
+              'stones': หินที่ตรง (ลำดับตามแคตตาล็อก), 'unlucky': {stone id: ผล check_unlucky_color},
+              'unlucky_count': จำนวนหินที่มีสีอัปมงคล}
+    :raises ValueError: ถ้ารูปแบบวันที่ไม่ถูกต้อง
+    """
+    auspice_result = calculate_auspice_ids(date_th, all_data)
+    if 'error' in auspice_result:
+        raise ValueError(auspice_result['error'])
+
+    stones = all_data['stones'] if stones is None else stones
+    day_id = auspice_result['day_id']
+    params = add_lucky_color_param(date_search_params(auspice_result), day_id, all_data)
+
+    if index is not None:
+        matched_ids = index.match_ids(params)
+        matched = [s for s in stones if s.get('id') in matched_ids]
+    else:
+        matched = apply_auspice_filter(stones, params)
+
+    unlucky = {s['id']: check_unlucky_color(s.get('color_ids', ''), day_id, all_data) for s in matched}
+    return {
+        'auspice': auspice_result,
+        'params': params,
+        'stones': matched,
+        'unlucky': unlucky,
+        'unlucky_count': sum(1 for r in unlucky.values() if r['is_unlucky']),
+    }
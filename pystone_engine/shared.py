@@ -0,0 +1,275 @@
+import os
+import json
+import mmap
+import time
+import struct
+import bisect
+from collections.abc import Sequence
+from typing import Dict, List, Any, Set, Optional
+
+from pystone_engine.data import _json_default
+from pystone_engine.index import RELATION_FIELDS, PARAM_TO_STONE_KEY, WEDNESDAY_DAY_ID, WEDNESDAY_NIGHT_ID, stone_relation_ids
+from pystone_engine.search import SearchParams
+from pystone_engine.formatting import Segment, format_stone_detail, format_lookup_detail
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# ไฟล์แคตตาล็อกที่แชร์ระหว่าง Process (mmap แบบอ่านอย่างเดียว)
+#   Header: magic, format version, generation, ความยาว Meta (JSON)
+#   Sections (จัดแนว 8 bytes): stone_offsets, stones (JSON ต่อหิน), ids + id_positions (เรียงตาม id),
+#   name_offsets + names (ชื่อตัวพิมพ์เล็กสำหรับค้นหา), postings (ตำแหน่งหินต่อ lookup id)
+SHARED_MAGIC = b'PSSC'
+SHARED_VERSION = 1
+_HEADER = struct.Struct('<4sHIQ')
+
+NAME_FIELDS = ('thai_name', 'english_name', 'other_names')
+NAME_SEPARATOR = b'\x00'
+
+# ความถี่สูงสุดที่ตรวจว่าไฟล์ถูกสลับ (os.replace) เป็นเวอร์ชันใหม่
+REFRESH_INTERVAL = 1.0
+
+def _pad8(size: int) -> int:
+    return (8 - size % 8) % 8
+
+# =======================================================
+# BUILD (Process หลัก)
+# =======================================================
+
+def build_shared_catalog(all_data: Dict[str, Any], path: str, generation: int) -> int:
+    """
+    เขียนแคตตาล็อก (หิน + Lookup + Inverted Index) เป็นไฟล์สำหรับ mmap
+    เขียนไฟล์ชั่วคราวแล้ว os.replace ทับ path (Worker ที่เปิดไฟล์เดิมอยู่ยังอ่านของเดิมได้จนกว่าจะสลับ)
+
+    :return: ขนาดไฟล์ (bytes)
+    """
+    if struct.pack('=I', 1) != struct.pack('<I', 1):
+        raise RuntimeError("ไฟล์แคตตาล็อกแบบแชร์รองรับเฉพาะเครื่อง Little-endian")
+
+    stones = all_data['stones']
+    sections: List[tuple] = [] # (ชื่อ, bytes)
+
+    stone_blobs = [json.dumps(s, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+                   for s in stones]
+    name_blobs = [NAME_SEPARATOR.join(str(s.get(f, '')).lower().encode('utf-8') for f in NAME_FIELDS) + NAME_SEPARATOR
+                  for s in stones]
+    sections.append(('stone_offsets', _offsets(stone_blobs)))
+    sections.append(('stones', b''.join(stone_blobs)))
+    sections.append(('name_offsets', _offsets(name_blobs)))
+    sections.append(('names', b''.join(name_blobs)))
+
+    # id -> ตำแหน่ง (id ซ้ำ: ใช้ตำแหน่งหลังสุด เหมือน Catalog.stone)
+    by_id = sorted((s.get('id'), pos) for pos, s in enumerate(stones))
+    sections.append(('ids', struct.pack(f'<{len(by_id)}q', *(i for i, _ in by_id))))
+    sections.append(('id_positions', struct.pack(f'<{len(by_id)}I', *(p for _, p in by_id))))
+
+    postings: Dict[str, Dict[int, List[int]]] = {field: {} for field in RELATION_FIELDS}
+    for pos, stone in enumerate(stones):
+        for field, field_postings in postings.items():
+            for rel_id in stone_relation_ids(stone, field):
+                field_postings.setdefault(rel_id, []).append(pos)
+
+    posting_dir: Dict[str, Dict[str, List[int]]] = {}
+    posting_bytes = bytearray()
+    for field, field_postings in postings.items():
+        posting_dir[field] = {}
+        for rel_id, positions in field_postings.items():
+            positions = sorted(set(positions))
+            posting_dir[field][str(rel_id)] = [len(posting_bytes) // 4, len(positions)]
+            posting_bytes += struct.pack(f'<{len(positions)}I', *positions)
+    sections.append(('postings', bytes(posting_bytes)))
+
+    # ตำแหน่ง Section นับจากจุดเริ่มข้อมูลหลัง Meta (Reader บวกตำแหน่งเริ่มเอง)
+    relative, cursor = {}, 0
+    for name, blob in sections:
+        relative[name] = [cursor, len(blob)]
+        cursor += len(blob) + _pad8(len(blob))
+    meta = {
+        'count': len(stones),
+        'lookups': {k: v for k, v in all_data.items() if k != 'stones'},
+        'sections': relative,
+        'postings': posting_dir,
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(SHARED_MAGIC, SHARED_VERSION, generation, len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(b'\x00' * _pad8(_HEADER.size + len(meta_bytes)))
+        for _, blob in sections:
+            f.write(blob)
+            f.write(b'\x00' * _pad8(len(blob)))
+        size = f.tell()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+def _offsets(blobs: List[bytes]) -> bytes:
+    offsets, cursor = [0], 0
+    for blob in blobs:
+        cursor += len(blob)
+        offsets.append(cursor)
+    return struct.pack(f'<{len(offsets)}Q', *offsets)
+
+# =======================================================
+# READ (Worker Process)
+# =======================================================
+
+class _Segment:
+    """ไฟล์แคตตาล็อก 1 เวอร์ชันที่ mmap ไว้ (หน้าข้อมูลใช้ร่วมกันทุก Process ผ่าน Page Cache)"""
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        magic, version, self.generation, meta_len = _HEADER.unpack_from(buf, 0)
+        if magic != SHARED_MAGIC or version != SHARED_VERSION:
+            raise ValueError(f"ไม่ใช่ไฟล์แคตตาล็อกแบบแชร์ที่รองรับ: {path}")
+        meta = json.loads(bytes(buf[_HEADER.size:_HEADER.size + meta_len]).decode('utf-8'))
+        data_start = _HEADER.size + meta_len + _pad8(_HEADER.size + meta_len)
+
+        def section(name: str) -> memoryview:
+            offset, length = meta['sections'][name]
+            return buf[data_start + offset:data_start + offset + length]
+
+        self.count: int = meta['count']
+        self.lookups: Dict[str, Any] = meta['lookups']
+        self.posting_dir: Dict[str, Dict[str, List[int]]] = meta['postings']
+        self.stone_offsets = section('stone_offsets').cast('Q')
+        self.stone_bytes = section('stones')
+        self.name_offsets = section('name_offsets').cast('Q')
+        names_offset, names_length = meta['sections']['names']
+        self.names_start = data_start + names_offset
+        self.names_end = self.names_start + names_length
+        self.ids = section('ids').cast('q')
+        self.id_positions = section('id_positions').cast('I')
+        self.postings = section('postings').cast('I')
+
+    def stone_at(self, pos: int) -> Dict[str, Any]:
+        return json.loads(bytes(self.stone_bytes[self.stone_offsets[pos]:self.stone_offsets[pos + 1]]).decode('utf-8'))
+
+    def find_name(self, term: bytes, start: int) -> int:
+        """หา term ใน Blob ชื่อโดยตรงบน mmap (ไม่คัดลอก) คืนตำแหน่งในไฟล์ หรือ -1"""
+        return self._mmap.find(term, start, self.names_end)
+
+    def positions_for(self, field: str, rel_id: int) -> memoryview:
+        entry = self.posting_dir.get(field, {}).get(str(rel_id))
+        if entry is None:
+            return self.postings[0:0]
+        start, count = entry
+        return self.postings[start:start + count]
+
+class SharedStones(Sequence):
+    """รายการหินแบบอ่านจากไฟล์ทีละรายการ (ไม่เก็บ dict ของหินทั้งหมดไว้ใน Worker)"""
+    def __init__(self, segment: _Segment):
+        self._segment = segment
+
+    def __len__(self) -> int:
+        return self._segment.count
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self._segment.stone_at(i) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError(pos)
+        return self._segment.stone_at(pos)
+
+class SharedCatalog:
+    """
+    แคตตาล็อกแบบอ่านอย่างเดียวจากไฟล์ build_shared_catalog สำหรับ Worker หลาย Process
+    มี Method เดียวกับ Catalog ที่ SearchService ใช้ (search, search_name, stone, detail, lookup_detail)
+
+    version คือ generation ของไฟล์: การอ่าน version จะตรวจ (ไม่เกิน REFRESH_INTERVAL ครั้ง/วินาที)
+    ว่าไฟล์ถูกสลับเป็นเวอร์ชันใหม่หรือไม่ ถ้าใช่จะ mmap ไฟล์ใหม่แทน
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._segment = _Segment(path)
+        self._checked_at = time.monotonic()
+        self._bind()
+
+    def _bind(self):
+        self.stones = SharedStones(self._segment)
+        self.data = dict(self._segment.lookups, stones=self.stones)
+
+    def refresh(self) -> bool:
+        """mmap ไฟล์ใหม่ถ้าถูกสลับแล้ว (Segment เดิมถูกคืนเมื่อไม่มีผู้ใช้)"""
+        self._checked_at = time.monotonic()
+        try:
+            if os.stat(self.path).st_ino == self._segment.inode:
+                return False
+            self._segment = _Segment(self.path)
+        except (OSError, ValueError):
+            return False # กำลังเขียน/ไฟล์หาย: ใช้ของเดิมต่อ
+        self._bind()
+        return True
+
+    @property
+    def version(self) -> int:
+        if time.monotonic() - self._checked_at >= REFRESH_INTERVAL:
+            self.refresh()
+        return self._segment.generation
+
+    # --- Search (ตรรกะเดียวกับ StoneIndex.match_ids แต่ใช้ตำแหน่งหินแทน id) ---
+
+    def _positions_any(self, field: str, rel_ids) -> Set[int]:
+        result = set()
+        for rel_id in rel_ids:
+            result.update(self._segment.positions_for(field, rel_id))
+        return result
+
+    def match_positions(self, params: SearchParams) -> Set[int]:
+        result: Optional[Set[int]] = None
+        lucky_ids = params.get('lucky_color_ids')
+        if lucky_ids:
+            result = self._positions_any('color_ids', (int(c) for c in lucky_ids))
+
+        for param_key, param_val in params.items():
+            if param_key not in PARAM_TO_STONE_KEY or not param_val or param_val == '0':
+                continue
+            field, value = PARAM_TO_STONE_KEY[param_key], int(param_val)
+            if param_key == 'day_id' and value == WEDNESDAY_DAY_ID:
+                positions = self._positions_any(field, (WEDNESDAY_DAY_ID, WEDNESDAY_NIGHT_ID))
+            else:
+                positions = set(self._segment.positions_for(field, value))
+            result = positions if result is None else result & positions
+            if not result:
+                break
+        return set(range(self._segment.count)) if result is None else result
+
+    def search(self, params: SearchParams) -> List[Dict[str, Any]]:
+        segment = self._segment
+        return [segment.stone_at(pos) for pos in sorted(self.match_positions(params))]
+
+    def search_name(self, search_term: str) -> List[Dict[str, Any]]:
+        """ตรรกะเดียวกับ search_by_name แต่หาใน Blob ชื่อตัวพิมพ์เล็กที่ mmap ไว้"""
+        segment = self._segment
+        term = search_term.strip().lower().encode('utf-8')
+        if not term:
+            return list(self.stones)
+        if NAME_SEPARATOR in term:
+            return []
+        offsets, base = segment.name_offsets, segment.names_start
+        matched, found = [], segment.find_name(term, base)
+        while found != -1:
+            pos = bisect.bisect_right(offsets, found - base) - 1
+            matched.append(pos)
+            found = segment.find_name(term, base + offsets[pos + 1]) # ข้ามไปหินถัดไป
+        return [segment.stone_at(pos) for pos in matched]
+
+    def stone(self, stone_id: int) -> Optional[Dict[str, Any]]:
+        segment = self._segment
+        i = bisect.bisect_right(segment.ids, stone_id) - 1
+        if i < 0 or segment.ids[i] != stone_id:
+            return None
+        return segment.stone_at(segment.id_positions[i])
+
+    def detail(self, stone: Dict[str, Any]) -> List[Segment]:
+        return format_stone_detail(stone, self.data)
+
+    def lookup_detail(self, key: str) -> List[Segment]:
+        return format_lookup_detail(key, self.data.get(key, []))
@@ -0,0 +1,221 @@
+import os
+from typing import Dict, List, Any, Callable, Optional, Set
+
+from pystone_engine.data import (
+    DATA_FOLDER, STONES_FILE, LockTimeout, file_lock, file_stamp, write_json_temp, discard_file,
+    generate_new_id, _read_data_file,
+)
+from pystone_engine.catalog import Catalog
+from pystone_engine.index import LOOKUP_FIELDS, stone_relation_ids
+from pystone_engine.timing import timed
+from pystone_engine.validate import Issue, validate_stone
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# เลขเวอร์ชันของแต่ละรายการ เพิ่มขึ้นทุกครั้งที่รายการนั้นถูกบันทึก (ไม่มี = 0)
+REVISION_KEY = 'revision'
+
+# reason ของ Conflict ที่ผู้อื่นแก้ฟิลด์เดียวกัน ('fields' = ฟิลด์ที่ทั้งสองฝ่ายแก้เป็นค่าต่างกัน)
+EDITED_BY_OTHERS = "ถูกแก้ไขโดยผู้ใช้อื่น"
+
+# จำนวนครั้งที่ merge_save_records ทำใหม่เมื่อไฟล์ถูกบันทึกโดยผู้อื่นระหว่าง Merge
+MERGE_RETRIES = 5
+
+_MISSING = object() # รายการไม่มี Key นี้
+
+RecordChange = Dict[str, Any] # ผลของ record_change
+Validator = Callable[[Dict[str, Any]], List[Issue]] # รายการ -> ปัญหาที่พบ (ว่าง = บันทึกได้)
+
+# =======================================================
+# RECORD CHANGES
+# =======================================================
+
+def record_change(original: Optional[Dict[str, Any]], updated: Optional[Dict[str, Any]]) -> RecordChange:
+    """
+    การแก้ไข 1 รายการเทียบกับข้อมูลที่โหลดมา
+    :param original: รายการตอนโหลด (None = เพิ่มใหม่)
+    :param updated: รายการหลังแก้ไข (None = ลบ)
+    """
+    return {'id': (updated if updated is not None else original)['id'], 'original': original, 'updated': updated}
+
+def _revision(record: Dict[str, Any]) -> int:
+    return record.get(REVISION_KEY, 0) or 0
+
+def _merge_fields(original: Dict[str, Any], updated: Dict[str, Any], current: Dict[str, Any]) -> tuple:
+    """
+    Three-way merge ระดับฟิลด์: นำฟิลด์ที่เราแก้ไปใส่ในรายการล่าสุดบนดิสก์
+    :return: (รายการที่ Merge แล้ว, ฟิลด์ที่ขัดแย้ง (ทั้งสองฝ่ายแก้เป็นค่าต่างกัน))
+    """
+    merged, conflict_fields = dict(current), []
+    for field in (set(original) | set(updated) | set(current)) - {REVISION_KEY}:
+        base, mine, theirs = original.get(field, _MISSING), updated.get(field, _MISSING), current.get(field, _MISSING)
+        if mine == base:
+            continue # เราไม่ได้แก้ฟิลด์นี้
+        if theirs != base and theirs != mine:
+            conflict_fields.append(field)
+        elif mine is _MISSING:
+            merged.pop(field, None)
+        else:
+            merged[field] = mine
+    return merged, sorted(conflict_fields)
+
+def _invalid(record_id: Any, record: Dict[str, Any], validator: Optional[Validator]) -> Optional[Dict[str, Any]]:
+    """Conflict ของรายการที่ validator พบปัญหา (None = บันทึกได้)"""
+    issues = validator(record) if validator is not None else None
+    if not issues:
+        return None
+    return {'id': record_id, 'reason': "ข้อมูลไม่ถูกต้อง: " + '; '.join(i['message'] for i in issues),
+            'fields': sorted({i['field'] for i in issues if i['field']})}
+
+# =======================================================
+# MERGE SAVE
+# =======================================================
+
+def _apply_changes(records: List[Dict[str, Any]], changes: List[RecordChange],
+                   validator: Optional[Validator]) -> Dict[str, Any]:
+    """ใส่การแก้ไขทีละรายการลงใน records ที่อ่านจากดิสก์ (ตรวจด้วยเลข revision) คืนผลแบบ merge_save_records"""
+    positions = {r.get('id'): i for i, r in enumerate(records)}
+    conflicts, renumbered, applied = [], {}, 0
+
+    for change in changes:
+        original, updated = change['original'], change['updated']
+        pos = positions.get(change['id'])
+        current = records[pos] if pos is not None else None
+
+        if original is None: # เพิ่มใหม่
+            new_record = dict(updated)
+            invalid = _invalid(change['id'], new_record, validator)
+            if invalid is not None:
+                conflicts.append(invalid)
+                continue
+            if current is not None:
+                new_record['id'] = generate_new_id([r for r in records if r is not None])
+                renumbered[change['id']] = new_record['id']
+            new_record[REVISION_KEY] = 1
+            positions[new_record['id']] = len(records)
+            records.append(new_record)
+            applied += 1
+            continue
+
+        if current is None:
+            if updated is not None:
+                conflicts.append({'id': change['id'], 'reason': "ถูกลบโดยผู้ใช้อื่นแล้ว", 'fields': []})
+            continue # ลบรายการที่ถูกลบไปแล้ว: ไม่ต้องทำอะไร
+
+        if updated is None: # ลบ
+            if _revision(current) != _revision(original):
+                conflicts.append({'id': change['id'], 'reason': "ถูกแก้ไขโดยผู้ใช้อื่นก่อนลบ", 'fields': []})
+                continue
+            records[pos] = None
+            del positions[change['id']]
+            applied += 1
+            continue
+
+        if _revision(current) == _revision(original):
+            merged = dict(updated)
+        else:
+            merged, conflict_fields = _merge_fields(original, updated, current)
+            if conflict_fields:
+                conflicts.append({'id': change['id'], 'reason': EDITED_BY_OTHERS, 'fields': conflict_fields})
+                continue
+        invalid = _invalid(change['id'], merged, validator)
+        if invalid is not None:
+            conflicts.append(invalid)
+            continue
+        merged[REVISION_KEY] = _revision(current) + 1
+        records[pos] = merged
+        applied += 1
+
+    return {'records': [r for r in records if r is not None], 'applied': applied,
+            'conflicts': conflicts, 'renumbered': renumbered}
+
+@timed('save.merge')
+def merge_save_records(filename: str, changes: List[RecordChange], base_path: str = DATA_FOLDER,
+                       validator: Optional[Validator] = None, all_or_nothing: bool = False) -> Dict[str, Any]:
+    """
+    บันทึกเฉพาะรายการที่แก้ไขลงไฟล์ List JSON ที่อาจมีโปรแกรมอื่นแก้ไขอยู่พร้อมกัน
+    อ่านไฟล์ล่าสุด, ใส่การแก้ไขของเรา (ตรวจด้วยเลข revision) และเขียนไฟล์ชั่วคราวนอก Lock
+    ภายใต้ Lock เพียงตรวจว่าไฟล์ยังเป็นชุดที่อ่านมา (file_stamp) แล้ว os.replace
+    หากผู้อื่นบันทึกระหว่างนั้น: ทำใหม่จากไฟล์ล่าสุด (ไม่เกิน MERGE_RETRIES ครั้ง)
+
+    - revision บนดิสก์ตรงกับตอนโหลด: ใช้การแก้ไขของเรา
+    - ถูกแก้โดยผู้อื่นแต่คนละฟิลด์: Merge ระดับฟิลด์
+    - ฟิลด์เดียวกันถูกแก้ต่างกัน / ถูกลบโดยผู้อื่น / ถูกแก้ก่อนเราลบ: ไม่บันทึกรายการนั้น และรายงานเป็น Conflict
+    - เพิ่มใหม่แต่ ID ชนกับรายการที่ผู้อื่นเพิ่ม: ใช้ ID ใหม่ (ดู renumbered)
+    - รายการที่จะเขียน (หลัง Merge) ไม่ผ่าน validator: ไม่บันทึกรายการนั้น และรายงานเป็น Conflict
+
+    :param validator: ตรวจรายการทีละรายการก่อนเขียน (เช่น validate_stone) None = ไม่ตรวจ
+    :param all_or_nothing: มี Conflict แม้รายการเดียว = ไม่บันทึกรายการใดเลย (applied = 0)
+        สำหรับการแก้หลายรายการที่ต้องสำเร็จพร้อมกัน เช่น Cascade ก่อนลบรายการ Lookup
+    :return: {'records': รายการทั้งหมดบนดิสก์หลังบันทึก, 'applied': จำนวนรายการที่บันทึก,
+              'conflicts': [{'id', 'reason', 'fields'}], 'renumbered': {id เดิม: id ใหม่},
+              'base_stamp': file_stamp ของไฟล์ที่อ่านมา Merge (เทียบกับ DataWatcher.is_current
+              เพื่อรู้ว่ามีการแก้จากภายนอกรวมอยู่ใน records หรือไม่)}
+    :raises LockTimeout: เมื่อรอ Lock นานเกินไป หรือไฟล์ถูกบันทึกโดยผู้อื่นทุกครั้งที่ลอง
+    :raises DataLoadError, OSError
+    """
+    path = os.path.join(base_path, filename)
+
+    for _ in range(MERGE_RETRIES):
+        stamp = file_stamp(path)
+        records = _read_data_file(filename, 'records', path)['records'] if stamp is not None else []
+        result = dict(_apply_changes(list(records), changes, validator), base_stamp=stamp)
+        if all_or_nothing and result['conflicts']:
+            return dict(result, records=records, applied=0)
+        if not result['applied']:
+            return result
+
+        tmp_path = write_json_temp(path, result['records'])
+        try:
+            with file_lock(path):
+                if file_stamp(path) == stamp:
+                    os.replace(tmp_path, path)
+                    return result
+        finally:
+            discard_file(tmp_path)
+    raise LockTimeout(f"ไฟล์ {filename} ถูกบันทึกโดยโปรแกรมอื่นตลอด (ลอง {MERGE_RETRIES} ครั้ง)")
+
+def merge_save_stones(changes: List[RecordChange], base_path: str = DATA_FOLDER,
+                      registry: Optional[Dict[str, Set[int]]] = None, all_or_nothing: bool = False) -> Dict[str, Any]:
+    """
+    merge_save_records ของไฟล์หินหลัก
+    :param registry: ID ของ Lookup (validate.id_registry) เพื่อตรวจหินที่แก้ไขก่อนบันทึก None = ไม่ตรวจ
+    """
+    validator = None if registry is None else (lambda stone: validate_stone(stone, registry))
+    return merge_save_records(STONES_FILE, changes, base_path, validator, all_or_nothing)
+
+# =======================================================
+# CASCADE (ลบ/เปลี่ยน ID ของรายการ Lookup ในหินที่อ้างถึง)
+# =======================================================
+
+def referencing_stones(catalog: Catalog, lookup_key: str, lookup_id: int) -> List[Dict[str, Any]]:
+    """
+    หินที่อ้างถึงรายการ Lookup (lookup_key, lookup_id) ตามลำดับแคตตาล็อก
+    หา stone id จาก StoneIndex.referencing แล้วอ่านหินตามลำดับ id ของแคตตาล็อก (ไม่ Scan หินทั้งหมด)
+    """
+    return catalog.stones_by_ids(catalog.index.referencing(lookup_key, lookup_id))
+
+def cascade_lookup_change(catalog: Catalog, lookup_key: str, old_id: int,
+                          new_id: Optional[int] = None) -> List[RecordChange]:
+    """
+    การแก้ไขหินที่อ้างถึงรายการ Lookup ที่ถูกลบ (new_id = None: เอา ID ออก) หรือเปลี่ยน ID (แทนด้วย new_id)
+    แก้เฉพาะหินใน StoneIndex.referencing และเฉพาะฟิลด์ที่อ้างถึงตารางนั้น
+    บันทึกทั้งหมดในครั้งเดียวด้วย merge_save_stones(changes, ..., all_or_nothing=True) ก่อนลบ/เปลี่ยนรายการ Lookup
+    (หินที่บันทึกไม่ได้ = ยกเลิกการลบ จึงไม่เหลือหินที่อ้างถึง ID ที่ไม่มีอยู่)
+    """
+    changes = []
+    for stone in referencing_stones(catalog, lookup_key, old_id):
+        updated = dict(stone.items())
+        for field in LOOKUP_FIELDS[lookup_key]:
+            ids = list(stone_relation_ids(stone, field))
+            if old_id not in ids:
+                continue
+            replaced = []
+            for rel_id in ids:
+                rel_id = new_id if rel_id == old_id else rel_id
+                if rel_id is not None and rel_id not in replaced:
+                    replaced.append(rel_id)
+            updated[field] = ' '.join(map(str, replaced))
+        changes.append(record_change(stone, updated))
+    return changes
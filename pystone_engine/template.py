@@ -0,0 +1,383 @@
+import os
+import re
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Any, Tuple, Optional
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# ร้านค้าปรับแต่งรูปแบบรายงานได้โดยวางไฟล์ <ชื่อ Template>.tpl ในโฟลเดอร์นี้ (ไม่ต้องแก้โค้ด)
+TEMPLATE_FOLDER = os.path.join('data', 'templates')
+TEMPLATE_EXT = '.tpl'
+
+Segment = Tuple[str, str]
+
+# =======================================================
+# TEMPLATE SYNTAX (บรรทัดต่อบรรทัด)
+# =======================================================
+#   [tag]ข้อความ {field} {item.field}   -> 1 บรรทัด พร้อม Tag สำหรับ Text Widget / PDF (ไม่ระบุ = ข้อความปกติ)
+#   {% for item in items %} ... {% endfor %}
+#   {% if field %} ... {% else %} ... {% endif %}   (ใช้ {% if not field %} ได้)
+#   {# หมายเหตุ #}                                   -> บรรทัดหมายเหตุ ไม่แสดงผล
+#   {{ และ }}                                        -> วงเล็บปีกกาตามตัวอักษร
+# ค่าที่ไม่มีใน Context จะแสดงเป็น '-'
+
+_TAG_PREFIX = re.compile(r'^\[([a-z_]+)\]')
+_DIRECTIVE = re.compile(r'^\s*\{%\s*(.+?)\s*%\}\s*$')
+_COMMENT = re.compile(r'^\s*\{#.*#\}\s*$')
+_PLACEHOLDER = re.compile(r'\{\{|\}\}|\{([A-Za-z_][\w.]*)\}')
+_FOR = re.compile(r'^for\s+([A-Za-z_]\w*)\s+in\s+([A-Za-z_][\w.]*)$')
+_IF = re.compile(r'^if\s+(not\s+)?([A-Za-z_][\w.]*)$')
+
+MISSING = '-'
+
+class TemplateError(Exception):
+    """Template มีรูปแบบไม่ถูกต้อง"""
+
+# =======================================================
+# DEFAULT TEMPLATES
+# =======================================================
+
+DEFAULT_TEMPLATES: Dict[str, str] = {
+    'stone_detail': """\
+[header]### รายละเอียดหิน: {thai_name} ({english_name})
+ชื่ออื่น ๆ: {other_names}
+
+[subheader]### 1. ข้อมูลทั่วไป (และมงคลพื้นฐาน)
+[title]----------------------------------------------
+คำอธิบายโดยย่อ: {short_description}...
+**กลุ่มมงคล:** {groups}
+**สีหลัก:** {colors}
+**วันมงคล:** {good_days}
+**เดือนมงคล:** {good_months}
+**ปีนักษัตรมงคล:** {good_zodiac_animals}
+**ราศีมงคล:** {good_zodiac_signs}
+{% if chakras %}
+
+[subheader]### 2. ความเชื่อมโยงกับจักระ
+[title]----------------------------------------------
+{% for c in chakras %}
+{% if c.found %}
+[title]--- จักระ: {c.name_th} ---
+ - **ตำแหน่ง:** {c.location}
+ - **ความหมายหลัก:** {c.auspice_detail_th}
+ - สี: {c.color}
+{% else %}
+[title]--- จักระ ID {c.id} (ไม่พบรายละเอียด) ---
+{% endif %}
+{% endfor %}
+{% endif %}
+{% if elements %}
+
+[subheader]### 3. ความเชื่อมโยงกับธาตุ (五行)
+[title]----------------------------------------------
+{% for e in elements %}
+{% if e.found %}
+[title]--- ธาตุ: {e.name_th} ---
+ - **คำจำกัดความ:** {e.description}
+ - **ความหมายมงคล:** {e.auspice_detail_th}
+ - วัฏจักรส่งเสริม: {e.name_th} สร้าง {e.next_element}
+{% else %}
+[title]--- ธาตุ ID {e.id} (ไม่พบรายละเอียด) ---
+{% endif %}
+{% endfor %}
+{% endif %}
+{% if has_numerology %}
+
+[subheader]### 4. ความเชื่อมโยงกับเลขมงคล (เลขศาสตร์)
+[title]----------------------------------------------
+{% for n in numbers %}
+[title]--- เลข: {n.number_value} ---
+ - **ความหมาย:** {n.auspice_detail_th}
+{% endfor %}
+{% endif %}
+
+[subheader]### 5. คำอธิบายฉบับเต็ม
+[title]----------------------------------------------
+{description}
+""",
+
+    'lookup_numerology': """\
+[header]### {display_name}
+
+{% if not items %}
+❌ ไม่พบข้อมูลในไฟล์ JSON
+{% else %}
+[subheader]### 1. ประวัติและความเป็นมา
+เลขศาสตร์มีรากฐานจากหลายอารยธรรม (เช่น พีทาโกรัส) เชื่อว่าตัวเลขแต่ละตัวมี 'ความสั่นสะเทือนทางพลังงาน' ที่ส่งผลต่อชะตาชีวิตและบุคลิกภาพของมนุษย์
+
+[subheader]### 2. รายละเอียดมงคลเลข 1-9
+[title]----------------------------------------------
+{% for item in items %}
+[title]--- [{item.number_value}] เลข {item.number_value} ---
+ - มงคล: {item.auspice_detail_th}
+
+{% endfor %}
+
+{% endif %}
+""",
+
+    'lookup_chakra': """\
+[header]### {display_name}
+
+{% if not items %}
+❌ ไม่พบข้อมูลในไฟล์ JSON
+{% else %}
+{% for item in items %}
+[title]----------------------------------------------
+[title]--- {item.name_upper} (ID: {item.id}) ---
+[key_detail]**1. ประวัติและความเป็นมา:**
+{item.history_th}
+
+[key_detail]**2. รายละเอียดเชิงมงคล:**
+ - ความเชื่อหลัก: {item.auspice_detail_th}
+ - ตำแหน่ง: {item.location}
+ - ธาตุ: {item.element_name}
+ - สัญลักษณ์/โลโก้: {item.logo}
+
+{% endfor %}
+
+{% endif %}
+""",
+
+    'lookup_element': """\
+[header]### {display_name}
+
+{% if not items %}
+❌ ไม่พบข้อมูลในไฟล์ JSON
+{% else %}
+{% for item in items %}
+[title]----------------------------------------------
+[title]--- {item.name_upper} (ID: {item.id}) ---
+[key_detail]**1. ประวัติและความเป็นมา:**
+{item.history_th}
+
+[key_detail]**2. รายละเอียดเชิงมงคล:**
+ - ความเชื่อหลัก: {item.auspice_detail_th}
+ - คำจำกัดความ: {item.description}
+ - วัฏจักรส่งเสริม: {item.name_th} สร้าง {item.next_element}
+
+{% endfor %}
+
+{% endif %}
+""",
+
+    'customer_report': """\
+[header]### รายงานหินมงคลสำหรับ: {name}
+วัน/เดือน/ปีเกิด: {date_th} (ค.ศ. {date_en})
+[key_detail]{summary}
+**สีมงคล:** {lucky_colors}
+**สีอัปมงคล:** {unlucky_colors}
+[subheader]**หินที่แนะนำ:** {match_count} รายการ
+{% if not match_count %}
+ไม่พบหินที่ตรงกับเงื่อนไขทั้งหมด
+{% endif %}
+""",
+}
+
+# =======================================================
+# COMPILER
+# =======================================================
+# Node ที่ Compile แล้ว (Tuple เพื่อให้ Render เร็ว):
+#   ('text', tag, ข้อความ)                   บรรทัดที่ไม่มีตัวแปร
+#   ('line', tag, parts)                     parts = str หรือ tuple ของ path ตัวแปร
+#   ('for', ชื่อตัวแปร, path, body)
+#   ('if', กลับค่า, path, body, else_body)
+
+def _compile_line(line: str) -> tuple:
+    tag = ''
+    match = _TAG_PREFIX.match(line)
+    if match:
+        tag = match.group(1)
+        line = line[match.end():]
+
+    parts = []
+    literal = []
+    pos = 0
+    for m in _PLACEHOLDER.finditer(line):
+        literal.append(line[pos:m.start()])
+        token = m.group(0)
+        if token in ('{{', '}}'):
+            literal.append(token[0])
+        else:
+            if literal:
+                parts.append(''.join(literal))
+                literal = []
+            parts.append(tuple(m.group(1).split('.')))
+        pos = m.end()
+    literal.append(line[pos:])
+    text = ''.join(literal)
+    if text:
+        parts.append(text)
+
+    if all(isinstance(p, str) for p in parts):
+        return ('text', tag, ''.join(parts))
+    return ('line', tag, tuple(parts))
+
+def compile_template(source: str, name: str = '<template>') -> tuple:
+    """แปลงข้อความ Template เป็น Tuple ของ Node (ทำครั้งเดียว แล้วใช้ซ้ำทุกการ Render)"""
+    if source.endswith('\n'):
+        source = source[:-1]
+
+    root: List[tuple] = []
+    stack: List[Tuple[str, list, int, list]] = [] # (ชนิด Block, Node, บรรทัดเริ่ม, List ที่ต้องเก็บต่อหลังปิด Block)
+    current = root
+
+    for line_no, line in enumerate(source.split('\n'), 1):
+        if _COMMENT.match(line):
+            continue
+        directive = _DIRECTIVE.match(line)
+        if not directive:
+            current.append(_compile_line(line))
+            continue
+
+        stmt = directive.group(1)
+        for_match = _FOR.match(stmt)
+        if_match = _IF.match(stmt)
+        if for_match:
+            node = ['for', for_match.group(1), tuple(for_match.group(2).split('.')), []]
+            current.append(node)
+            stack.append(('for', node, line_no, current))
+            current = node[3]
+        elif if_match:
+            node = ['if', bool(if_match.group(1)), tuple(if_match.group(2).split('.')), [], []]
+            current.append(node)
+            stack.append(('if', node, line_no, current))
+            current = node[3]
+        elif stmt == 'else':
+            if not stack or stack[-1][0] != 'if':
+                raise TemplateError(f"{name} บรรทัด {line_no}: พบ else โดยไม่มี if")
+            current = stack[-1][1][4]
+        elif stmt in ('endfor', 'endif'):
+            if not stack or stack[-1][0] != stmt[3:]:
+                raise TemplateError(f"{name} บรรทัด {line_no}: {stmt} ไม่ตรงกับ Block ที่เปิดอยู่")
+            current = stack.pop()[3]
+        else:
+            raise TemplateError(f"{name} บรรทัด {line_no}: ไม่รู้จักคำสั่ง '{stmt}'")
+
+    if stack:
+        raise TemplateError(f"{name}: Block '{stack[-1][0]}' ที่บรรทัด {stack[-1][2]} ไม่ได้ปิด")
+    return _freeze(root)
+
+def _freeze(nodes: list) -> tuple:
+    frozen = []
+    for node in nodes:
+        if node[0] == 'for':
+            frozen.append(('for', node[1], node[2], _freeze(node[3])))
+        elif node[0] == 'if':
+            frozen.append(('if', node[1], node[2], _freeze(node[3]), _freeze(node[4])))
+        else:
+            frozen.append(node)
+    return tuple(frozen)
+
+# =======================================================
+# RENDERER
+# =======================================================
+
+def _resolve(context: Dict[str, Any], path: tuple) -> Any:
+    value = context.get(path[0], MISSING)
+    for key in path[1:]:
+        if isinstance(value, (dict, Mapping)):
+            value = value.get(key, MISSING)
+        else:
+            value = getattr(value, key, MISSING)
+    return value
+
+def _render_nodes(nodes: tuple, context: Dict[str, Any], out: List[Segment]):
+    for node in nodes:
+        kind = node[0]
+        if kind == 'text':
+            out.append((node[2], node[1]))
+        elif kind == 'line':
+            out.append((''.join(p if p.__class__ is str else str(_resolve(context, p)) for p in node[2]), node[1]))
+        elif kind == 'for':
+            items = _resolve(context, node[2])
+            if items and items is not MISSING:
+                scope = dict(context)
+                for item in items:
+                    scope[node[1]] = item
+                    _render_nodes(node[3], scope, out)
+        else:
+            value = _resolve(context, node[2])
+            truthy = bool(value) and value is not MISSING
+            _render_nodes(node[3] if truthy != node[1] else node[4], context, out)
+
+class Template:
+    """Template ที่ Compile แล้ว: render() เป็นการเติมค่าลงในชิ้นส่วนที่เตรียมไว้เท่านั้น"""
+    __slots__ = ('name', 'nodes')
+
+    def __init__(self, source: str, name: str = '<template>'):
+        self.name = name
+        self.nodes = compile_template(source, name)
+
+    def render_lines(self, context: Dict[str, Any]) -> List[Segment]:
+        """คืน List ของบรรทัด (ข้อความ, tag)"""
+        out: List[Segment] = []
+        _render_nodes(self.nodes, context, out)
+        return out
+
+    def render(self, context: Dict[str, Any]) -> List[Segment]:
+        """คืน Segments พร้อม ('\\n', '') คั่นระหว่างบรรทัด (รูปแบบเดียวกับ join_line_segments)"""
+        segments: List[Segment] = []
+        for line in self.render_lines(context):
+            if segments:
+                segments.append(('\n', ''))
+            segments.append(line)
+        return segments
+
+# =======================================================
+# CACHE / LOADER
+# =======================================================
+# (folder, name) -> (mtime ของไฟล์ปรับแต่ง หรือ None, Template)
+_cache: Dict[Tuple[str, str], Tuple[Optional[float], Template]] = {}
+_cache_lock = threading.Lock()
+
+def template_path(name: str, folder: str = TEMPLATE_FOLDER) -> str:
+    return os.path.join(folder, f"{name}{TEMPLATE_EXT}")
+
+def get_template(name: str, folder: str = TEMPLATE_FOLDER) -> Template:
+    """
+    คืน Template ที่ Compile แล้วจาก Cache
+    ใช้ไฟล์ปรับแต่งใน folder ถ้ามี (Compile ใหม่เมื่อไฟล์ถูกแก้ไข) มิฉะนั้นใช้ค่าเริ่มต้น
+    """
+    path = template_path(name, folder)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    cache_key = (os.path.abspath(folder), name)
+    cached = _cache.get(cache_key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _cache_lock:
+        if mtime is not None:
+            with open(path, 'r', encoding='utf-8') as f:
+                template = Template(f.read(), path)
+        elif name in DEFAULT_TEMPLATES:
+            template = Template(DEFAULT_TEMPLATES[name], name)
+        else:
+            raise TemplateError(f"ไม่พบ Template: {name}")
+        _cache[cache_key] = (mtime, template)
+    return template
+
+def render_template(name: str, context: Dict[str, Any]) -> List[Segment]:
+    return get_template(name).render(context)
+
+def clear_template_cache():
+    with _cache_lock:
+        _cache.clear()
+
+def export_default_templates(folder: str = TEMPLATE_FOLDER, overwrite: bool = False) -> List[str]:
+    """เขียน Template เริ่มต้นลงโฟลเดอร์ เพื่อเป็นจุดเริ่มต้นในการปรับแต่ง"""
+    os.makedirs(folder, exist_ok=True)
+    written = []
+    for name, source in DEFAULT_TEMPLATES.items():
+        path = template_path(name, folder)
+        if overwrite or not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(source)
+            written.append(path)
+    return written
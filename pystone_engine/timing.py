@@ -0,0 +1,209 @@
+import io
+import os
+import json
+import time
+import atexit
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator, Optional
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# ขอบบนของแต่ละช่อง Histogram (มิลลิวินาที, อนุกรม 1-2-5) ช่องสุดท้ายคือ "มากกว่า 60 วินาที"
+BUCKET_BOUNDS_MS = [m * 10 ** e for e in range(-2, 5) for m in (1, 2, 5)] + [60_000]
+
+# cProfile การทำงานช้า 1 ครั้ง: PYSTONE_PROFILE=<ชื่อ operation> เช่น filter.date
+# เก็บเฉพาะครั้งแรกที่ใช้เวลาอย่างน้อย PYSTONE_PROFILE_MS (ค่าเริ่มต้น 0 = ครั้งแรกที่เรียก)
+# ไฟล์ .prof เขียนลง PYSTONE_PROFILE_DIR (ค่าเริ่มต้น: โฟลเดอร์ปัจจุบัน) เปิดด้วย pstats / snakeviz ได้
+PROFILE_ENV = 'PYSTONE_PROFILE'
+PROFILE_MS_ENV = 'PYSTONE_PROFILE_MS'
+PROFILE_DIR_ENV = 'PYSTONE_PROFILE_DIR'
+PROFILE_TOP_LINES = 30 # จำนวนฟังก์ชันในสรุปข้อความของ Profile
+
+# Trace Event (Chrome / Perfetto): PYSTONE_TRACE=<ไฟล์ .json> บันทึกทุก Span ตั้งแต่เริ่มโปรแกรม และเขียนไฟล์ตอนปิด
+# เปิดดูที่ chrome://tracing หรือ https://ui.perfetto.dev
+TRACE_ENV = 'PYSTONE_TRACE'
+TRACE_MAX_EVENTS = 500_000 # เกินจากนี้ไม่บันทึกเพิ่ม (จำกัดหน่วยความจำของ Session ที่เปิดทิ้งไว้นาน)
+
+# =======================================================
+# HISTOGRAM
+# =======================================================
+
+class Histogram:
+    """เวลาของ operation หนึ่ง: จำนวนครั้ง, รวม, ต่ำสุด/สูงสุด และจำนวนครั้งในแต่ละช่องเวลา"""
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.min_s = float('inf')
+        self.max_s = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total_s += seconds
+        self.min_s = min(self.min_s, seconds)
+        self.max_s = max(self.max_s, seconds)
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+
+    def percentile_ms(self, fraction: float) -> float:
+        """ค่าประมาณ Percentile (ขอบบนของช่องที่ครอบคลุม ไม่เกินค่าสูงสุดที่วัดได้)"""
+        if not self.count:
+            return 0.0
+        rank, seen = fraction * self.count, 0
+        for i, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                bound = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else float('inf')
+                return min(bound, self.max_s * 1000)
+        return self.max_s * 1000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total_ms': self.total_s * 1000,
+            'mean_ms': self.total_s * 1000 / self.count if self.count else 0.0,
+            'min_ms': self.min_s * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile_ms(0.5),
+            'p95_ms': self.percentile_ms(0.95),
+            'max_ms': self.max_s * 1000,
+            'buckets': list(self.buckets),
+        }
+
+# =======================================================
+# REGISTRY (ใช้ร่วมกันทั้ง Process, ปลอดภัยกับ Worker Thread)
+# =======================================================
+
+_histograms: Dict[str, Histogram] = {}
+_lock = threading.Lock()
+
+_profile_target = os.environ.get(PROFILE_ENV, '').strip() or None
+_profile_min_s = float(os.environ.get(PROFILE_MS_ENV, '0') or 0) / 1000
+_profiling = False
+_last_profile: Optional[Dict[str, Any]] = None
+
+_trace_events: Optional[List[Dict[str, Any]]] = None # None = ไม่ได้ Trace
+_trace_origin = time.perf_counter()
+_trace_threads: Dict[int, str] = {}
+
+def record_timing(name: str, seconds: float):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+def timing_snapshot() -> Dict[str, Dict[str, Any]]:
+    """สรุปเวลาของทุก operation (เรียงตามชื่อ)"""
+    with _lock:
+        return {name: _histograms[name].summary() for name in sorted(_histograms)}
+
+def last_profile() -> Optional[Dict[str, Any]]:
+    """Profile ที่เก็บได้ {'name', 'ms', 'path' (.prof หรือ None ถ้าเขียนไม่ได้), 'text'} หรือ None"""
+    return _last_profile
+
+def reset_timings():
+    with _lock:
+        _histograms.clear()
+
+def _save_profile(name: str, profiler: Any, seconds: float):
+    global _last_profile, _profile_target
+    import pstats
+    path = os.path.join(os.environ.get(PROFILE_DIR_ENV, '.'),
+                        f"pystone_{name.replace('.', '_')}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_TOP_LINES)
+    try:
+        profiler.dump_stats(path)
+    except OSError:
+        path = None
+    _last_profile = {'name': name, 'ms': seconds * 1000, 'path': path, 'text': stream.getvalue()}
+    _profile_target = None # เก็บครั้งเดียว
+
+# =======================================================
+# TRACE EVENTS (Chrome Trace Event Format)
+# =======================================================
+
+def start_trace():
+    """เริ่มเก็บ Span ของทุก timed() (ล้าง Span เดิม)"""
+    global _trace_events
+    with _lock:
+        _trace_events = []
+        _trace_threads.clear()
+
+def is_tracing() -> bool:
+    return _trace_events is not None
+
+def _add_trace_event(name: str, start: float, end: float, args: Dict[str, Any]):
+    thread = threading.current_thread()
+    tid = thread.native_id or thread.ident
+    event = {'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+             'ts': (start - _trace_origin) * 1e6, 'dur': (end - start) * 1e6}
+    if args:
+        event['args'] = args
+    with _lock:
+        if _trace_events is not None and len(_trace_events) < TRACE_MAX_EVENTS:
+            _trace_events.append(event)
+            _trace_threads.setdefault(tid, thread.name)
+
+def trace_events() -> List[Dict[str, Any]]:
+    """Span ที่เก็บไว้ พร้อม Metadata ชื่อ Thread (รูปแบบ traceEvents)"""
+    with _lock:
+        events = list(_trace_events or [])
+        threads = dict(_trace_threads)
+    pid = os.getpid()
+    metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+                for tid, thread_name in threads.items()]
+    return metadata + events
+
+def write_trace(path: str) -> int:
+    """เขียน Span ที่เก็บไว้เป็นไฟล์ JSON ของ Chrome/Perfetto :return: จำนวน Span"""
+    events = trace_events()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    return sum(1 for e in events if e['ph'] == 'X')
+
+def stop_trace(path: Optional[str] = None) -> int:
+    """หยุดเก็บ Span (เขียนลง path ก่อนถ้าระบุ) :return: จำนวน Span ที่เขียน"""
+    global _trace_events
+    count = write_trace(path) if path else 0
+    with _lock:
+        _trace_events = None
+    return count
+
+# =======================================================
+# TIMER
+# =======================================================
+
+@contextmanager
+def timed(name: str, **args: Any) -> Iterator[None]:
+    """
+    จับเวลา operation แล้วเก็บลง Histogram ของชื่อนั้น (นับเฉพาะครั้งที่ทำงานสำเร็จ)
+    ใช้ได้ทั้ง `with timed('render.table'):` และ `@timed('load')`
+    ระหว่าง Trace จะบันทึกเป็น Span (รวมครั้งที่ Error) โดย args แสดงเป็นรายละเอียดของ Span
+    """
+    global _profiling
+    profiler = None
+    if name == _profile_target and not _profiling:
+        import cProfile
+        _profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+        if _trace_events is not None:
+            _add_trace_event(name, start, end, args)
+    record_timing(name, end - start)
+    if profiler is not None and end - start >= _profile_min_s:
+        _save_profile(name, profiler, end - start)
+
+if os.environ.get(TRACE_ENV):
+    start_trace()
+    atexit.register(lambda: stop_trace(os.environ[TRACE_ENV]))
@@ -0,0 +1,140 @@
+from collections import Counter
+from typing import Dict, List, Any, Optional, Set, Iterable
+
+from pystone_engine.index import RELATION_FIELDS, StoneIndex, stone_relation_ids
+from pystone_engine.timing import timed
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# ฟิลด์ที่หินทุกรายการต้องมี
+REQUIRED_STONE_FIELDS = ('id', 'english_name', 'thai_name')
+
+# ฟิลด์ข้อความของหิน (ต้องเป็น str หรือ None)
+TEXT_STONE_FIELDS = ('english_name', 'thai_name', 'other_names', 'description')
+
+Issue = Dict[str, Any] # {'key', 'id', 'field', 'message'}
+
+def _issue(key: str, record_id: Any, field: Optional[str], message: str) -> Issue:
+    return {'key': key, 'id': record_id, 'field': field, 'message': message}
+
+def _is_id(value: Any) -> bool:
+    return value.__class__ is int # bool ไม่นับเป็น ID
+
+# =======================================================
+# ID REGISTRY (ID ที่มีอยู่ของแต่ละตาราง Lookup)
+# =======================================================
+
+def id_registry(all_data: Dict[str, Any]) -> Dict[str, Set[int]]:
+    """lookup key -> set ของ ID ที่มีอยู่ (เฉพาะตารางที่ฟิลด์ความสัมพันธ์ของหินอ้างถึง)"""
+    return {key: {item.get('id') for item in all_data.get(key, []) if isinstance(item, dict)}
+            for key in set(RELATION_FIELDS.values())}
+
+def _duplicate_issues(key: str, ids: Iterable[Any]) -> List[Issue]:
+    return [_issue(key, record_id, 'id', f"ID ซ้ำกัน {count} รายการ")
+            for record_id, count in Counter(ids).items() if count > 1]
+
+# =======================================================
+# PER-RECORD VALIDATION (ใช้ตอนบันทึก)
+# =======================================================
+
+def stone_schema_issues(stone: Dict[str, Any]) -> List[Issue]:
+    """ฟิลด์ที่ขาด, ชนิดข้อมูล และรูปแบบข้อความ ID ของหิน 1 รายการ (ไม่ตรวจว่า ID มีอยู่จริง)"""
+    stone_id = stone.get('id')
+    issues = [_issue('stones', stone_id, field, "ไม่มีฟิลด์นี้")
+              for field in REQUIRED_STONE_FIELDS if field not in stone]
+    if 'id' in stone and not _is_id(stone_id):
+        issues.append(_issue('stones', stone_id, 'id', f"ID ต้องเป็นจำนวนเต็ม ({stone_id!r})"))
+    for field in TEXT_STONE_FIELDS:
+        value = stone.get(field)
+        if value is not None and not isinstance(value, str):
+            issues.append(_issue('stones', stone_id, field, f"ต้องเป็นข้อความ ({type(value).__name__})"))
+    relation_ids = getattr(stone, 'relation_ids', None)
+    for field in RELATION_FIELDS:
+        if relation_ids is not None and relation_ids(field).__class__ is bytes:
+            continue # StoneRecord เก็บเป็น bytes ได้เฉพาะข้อความ ID ที่ถูกรูปแบบ
+        value = stone.get(field)
+        if value is None or value == '':
+            continue
+        if value.__class__ is not str or not ''.join(value.split()).isdigit():
+            issues.append(_issue('stones', stone_id, field, f"ต้องเป็น ID คั่นด้วยช่องว่าง เช่น \"1 3 5\" ({value!r})"))
+    return issues
+
+def stone_reference_issues(stone: Dict[str, Any], registry: Dict[str, Set[int]]) -> List[Issue]:
+    """ID ในฟิลด์ความสัมพันธ์ของหินที่ไม่มีในตาราง Lookup"""
+    issues = []
+    for field, lookup_key in RELATION_FIELDS.items():
+        missing = set(stone_relation_ids(stone, field)) - registry.get(lookup_key, set())
+        if missing:
+            issues.append(_issue('stones', stone.get('id'), field,
+                                 f"อ้างถึง {lookup_key} ID ที่ไม่มีอยู่: {' '.join(map(str, sorted(missing)))}"))
+    return issues
+
+def validate_stone(stone: Dict[str, Any], registry: Dict[str, Set[int]]) -> List[Issue]:
+    """ตรวจหิน 1 รายการก่อนบันทึก (registry จาก id_registry)"""
+    return stone_schema_issues(stone) + stone_reference_issues(stone, registry)
+
+def validate_lookup_item(key: str, item: Dict[str, Any]) -> List[Issue]:
+    """ตรวจรายการ Lookup 1 รายการก่อนบันทึก"""
+    if not isinstance(item, dict):
+        return [_issue(key, None, None, f"ต้องเป็น Object ({type(item).__name__})")]
+    if not _is_id(item.get('id')):
+        return [_issue(key, item.get('id'), 'id', f"ID ต้องเป็นจำนวนเต็ม ({item.get('id')!r})")]
+    return []
+
+# =======================================================
+# CATALOG VALIDATION (ใช้ตอนโหลด)
+# =======================================================
+
+@timed('validate')
+def validate_catalog(all_data: Dict[str, Any], index: Optional[StoneIndex] = None,
+                     full: bool = False) -> List[Issue]:
+    """
+    ตรวจความถูกต้องของข้อมูลทั้งชุดด้วย Set Operation:
+    - ID ของ Lookup และหินต้องเป็นจำนวนเต็มและไม่ซ้ำ (ไล่หาตัวซ้ำเฉพาะเมื่อจำนวน ID ไม่เท่ากับจำนวนรายการ)
+    - ID ที่หินอ้างถึง (ชุด ID ใน Posting ของ StoneIndex) ต้องมีในตาราง Lookup
+      (หารายการหินที่อ้างผิดจาก Posting ของ ID ที่ไม่มีอยู่เท่านั้น)
+
+    :param index: StoneIndex ของ all_data['stones'] (None = สร้างใหม่)
+    :param full: ตรวจฟิลด์/ชนิดข้อมูลของหินทุกรายการด้วย (stone_schema_issues) ช้ากว่า ใช้สำหรับรายงาน
+    :return: List ของ {'key', 'id', 'field', 'message'} เรียงตามตาราง (ว่าง = ถูกต้อง)
+    """
+    issues = []
+    for key, items in all_data.items():
+        if key == 'stones':
+            continue
+        for item in items:
+            issues.extend(validate_lookup_item(key, item))
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        if len(set(ids)) != len(ids):
+            issues.extend(_duplicate_issues(key, ids))
+
+    stones = all_data.get('stones', [])
+    if index is None:
+        index = StoneIndex(stones)
+    if len(index.all_ids) != len(stones):
+        issues.extend(_duplicate_issues('stones', (stone.get('id') for stone in stones)))
+
+    if full:
+        for stone in stones:
+            issues.extend(stone_schema_issues(stone))
+    else:
+        issues.extend(_issue('stones', stone_id, 'id', f"ID ต้องเป็นจำนวนเต็ม ({stone_id!r})")
+                      for stone_id in index.all_ids if not _is_id(stone_id))
+
+    registry = id_registry(all_data)
+    for field, lookup_key in RELATION_FIELDS.items():
+        postings = index.postings[field]
+        for rel_id in sorted(postings.keys() - registry[lookup_key]):
+            issues.extend(_issue('stones', stone_id, field, f"อ้างถึง {lookup_key} ID ที่ไม่มีอยู่: {rel_id}")
+                          for stone_id in sorted(postings[rel_id], key=str))
+    return issues
+
+def format_issues(issues: List[Issue], limit: Optional[int] = None) -> str:
+    """ข้อความรายงานปัญหา บรรทัดละ 1 รายการ (limit = แสดงไม่เกินกี่บรรทัด)"""
+    shown = issues if limit is None else issues[:limit]
+    lines = [f"{i['key']} ID {i['id']}" + (f" [{i['field']}]" if i['field'] else '') + f": {i['message']}"
+             for i in shown]
+    if len(issues) > len(shown):
+        lines.append(f"... และอีก {len(issues) - len(shown)} รายการ")
+    return '\n'.join(lines)
@@ -0,0 +1,110 @@
+import os
+from typing import Dict, List, Any, Tuple, Optional
+
+from pystone_engine.data import DATA_FOLDER, DATA_FILES, DataLoadError, _read_data_file
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+FileStamp = Optional[Tuple[int, int, int]] # (inode, mtime_ns, size) แบบ data.file_stamp หรือ None ถ้าไม่มีไฟล์
+
+# =======================================================
+# DATA WATCHER (Poll mtime ของไฟล์ใน data/)
+# =======================================================
+
+class DataWatcher:
+    """
+    ตรวจหาไฟล์ข้อมูลที่ถูกแก้ไขจากภายนอก (โปรแกรมอื่น/เพื่อนร่วมงาน) ด้วยการเทียบ mtime และขนาดไฟล์
+    แล้วอ่านใหม่เฉพาะไฟล์ที่เปลี่ยน (ใช้การ Poll แทน inotify เพื่อให้ทำงานได้ทุกระบบปฏิบัติการ)
+
+    หลังโปรแกรมบันทึกไฟล์เอง ให้เรียก mark_current(filename) เพื่อไม่ให้นับเป็นการเปลี่ยนจากภายนอก
+    """
+    def __init__(self, base_path: str = DATA_FOLDER):
+        self.base_path = base_path
+        self._stamps: Dict[str, FileStamp] = {filename: self._stamp(filename) for filename in DATA_FILES}
+
+    def _stamp(self, filename: str) -> FileStamp:
+        try:
+            st = os.stat(os.path.join(self.base_path, filename))
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def is_current(self, filename: str, stamp: FileStamp) -> bool:
+        """stamp (เช่น base_stamp จาก merge_save_records) ตรงกับสถานะล่าสุดที่โปรแกรมรู้จัก = ไม่มีการแก้จากภายนอกตั้งแต่นั้น"""
+        return stamp is not None and stamp == self._stamps.get(filename)
+
+    def mark_current(self, *filenames: str):
+        """บันทึกสถานะปัจจุบันของไฟล์ (หลังโปรแกรมเขียนไฟล์นั้นเอง)"""
+        for filename in filenames:
+            self._stamps[filename] = self._stamp(filename)
+
+    def changed_files(self) -> List[str]:
+        """คืนรายชื่อไฟล์ที่เปลี่ยนตั้งแต่การตรวจครั้งก่อน (ไม่รวมไฟล์ที่ถูกลบ)"""
+        changed = []
+        for filename in DATA_FILES:
+            stamp = self._stamp(filename)
+            if stamp != self._stamps.get(filename):
+                self._stamps[filename] = stamp
+                if stamp is not None:
+                    changed.append(filename)
+        return changed
+
+    def reload_changed(self) -> Tuple[Dict[str, list], List[DataLoadError]]:
+        """
+        อ่านใหม่เฉพาะไฟล์ที่เปลี่ยน
+        :return: ({key ใน ALL_DATA: ข้อมูลใหม่}, [Error ของไฟล์ที่อ่านไม่ได้ (ใช้ข้อมูลเดิมต่อ)])
+        """
+        loaded, errors = {}, []
+        for filename in self.changed_files():
+            try:
+                loaded.update(_read_data_file(filename, DATA_FILES[filename], os.path.join(self.base_path, filename)))
+            except DataLoadError as e:
+                errors.append(e) # เช่นไฟล์ถูกเขียนไม่ครบ: อ่านใหม่เมื่อไฟล์เปลี่ยนอีกครั้ง
+        return loaded, errors
+
+# =======================================================
+# INCREMENTAL CHANGES
+# =======================================================
+
+def diff_stones(old_stones: List[Dict[str, Any]],
+                new_stones: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    เทียบรายการหินเดิมกับรายการใหม่ตาม id
+    :return: (หินเดิมที่ถูกลบหรือแก้ไข, หินใหม่ที่ถูกเพิ่มหรือแก้ไข) สำหรับ StoneIndex.update
+    """
+    old_by_id = {s.get('id'): s for s in old_stones}
+    new_by_id = {s.get('id'): s for s in new_stones}
+    removed = [s for stone_id, s in old_by_id.items()
+               if stone_id not in new_by_id or s != new_by_id[stone_id]]
+    added = [s for stone_id, s in new_by_id.items()
+             if stone_id not in old_by_id or s != old_by_id[stone_id]]
+    return removed, added
+
+def patch_stones(old_stones: List[Dict[str, Any]], saved: Dict[int, Optional[Dict[str, Any]]]
+                 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    ใช้เฉพาะหินที่โปรแกรมบันทึกเอง แทนการเทียบหินทั้งหมดด้วย diff_stones
+    :param saved: {stone id: หินบนดิสก์หลังบันทึก หรือ None = ไม่มีแล้ว} (หินใหม่ต่อท้ายตามลำดับของ saved)
+    :return: (รายการหินใหม่, หินเดิมที่ถูกลบหรือแก้ไข, หินใหม่ที่ถูกเพิ่มหรือแก้ไข) แบบ diff_stones
+    """
+    pending = dict(saved)
+    new_stones, removed, added = [], [], []
+    for stone in old_stones:
+        stone_id = stone.get('id')
+        if stone_id not in pending:
+            new_stones.append(stone)
+            continue
+        new = pending.pop(stone_id)
+        if new is not None and new == stone:
+            new_stones.append(stone) # ไม่เปลี่ยน: คง Object เดิมที่อยู่ใน Index
+            continue
+        removed.append(stone)
+        if new is not None:
+            new_stones.append(new)
+            added.append(new)
+    for new in pending.values():
+        if new is not None:
+            new_stones.append(new)
+            added.append(new)
+    return new_stones, removed, added
@@ -0,0 +1,300 @@
+import os
+import re
+import csv
+import json
+import zipfile
+import threading
+from array import array
+from typing import Dict, List, Any, Iterable, Iterator, Callable, Optional
+
+from pystone_engine.index import stone_relation_ids
+from pystone_engine.columns import ColumnStore
+from pystone_engine.timing import timed
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+# คอลัมน์หมายเหตุสีอัปมงคล: ไม่ได้อยู่ในหิน แต่มาจากผลการค้นหา (unlucky_notes)
+UNLUCKY_NOTE_FIELD = 'unlucky_note'
+
+# คอลัมน์ที่ส่งออก: (หัวคอลัมน์, ฟิลด์ในหิน, lookup key, display key)
+# lookup key = None หมายถึงใช้ค่าในหินตรง ๆ
+EXPORT_COLUMNS = [
+    ('id', 'id', None, None),
+    ('thai_name', 'thai_name', None, None),
+    ('english_name', 'english_name', None, None),
+    ('other_names', 'other_names', None, None),
+    ('groups', 'group_ids', 'groups', 'name'),
+    ('colors', 'color_ids', 'colors', 'name'),
+    ('good_days', 'good_days', 'days', 'name'),
+    ('good_months', 'good_months', 'months', 'name'),
+    ('zodiac_animals', 'good_zodiac_animals', 'animals', 'thai_name'),
+    ('zodiac_signs', 'good_zodiac_signs', 'signs', 'name'),
+    ('chakra', 'chakra_ids', 'chakra', 'name_th'),
+    ('element', 'element_ids', 'element', 'name_th'),
+    ('numerology', 'numerology_ids', 'numerology', 'number_value'),
+    ('unlucky_note', UNLUCKY_NOTE_FIELD, None, None),
+    ('description', 'description', None, None),
+]
+
+EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.xlsx': 'xlsx'}
+
+# อักขระที่ XML ไม่อนุญาต (ตัดออกก่อนเขียน XLSX)
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# =======================================================
+# ROW RESOLUTION
+# =======================================================
+
+def build_lookup_maps(all_data: Dict[str, Any]) -> Dict[str, Dict[int, str]]:
+    """สร้าง Map id -> ชื่อ ของทุก Lookup ครั้งเดียว (แทนการวนหาใน List ทุกแถว)"""
+    maps = {}
+    for _, _, lookup_key, display_key in EXPORT_COLUMNS:
+        if lookup_key and lookup_key not in maps:
+            maps[lookup_key] = {item['id']: str(item.get(display_key, '-')) for item in all_data.get(lookup_key, [])}
+    return maps
+
+def _ids_key(rel_ids: Iterable[int]) -> Any:
+    """Key ของชุด ID สำหรับ label_cache: bytes ของ StoneRecord ใช้ได้ตรง ๆ, array ของ StoneRow ใช้ (typecode, bytes)"""
+    if rel_ids.__class__ is bytes:
+        return rel_ids
+    if rel_ids.__class__ is array:
+        return (rel_ids.typecode, rel_ids.tobytes())
+    return tuple(rel_ids)
+
+def resolve_stone_row(stone: Dict[str, Any], lookup_maps: Dict[str, Dict[int, str]],
+                      unlucky_notes: Optional[Dict[int, str]] = None,
+                      label_cache: Optional[Dict[tuple, str]] = None) -> Dict[str, Any]:
+    """
+    แปลงหินหนึ่งรายการเป็นแถวสำหรับส่งออก โดยแปลง ID ความสัมพันธ์เป็นชื่อ
+    :param unlucky_notes: {stone id: หมายเหตุสีอัปมงคล} ของการค้นหาที่ส่งออก (จาก unlucky_notes)
+    :param label_cache: {(lookup key, ID ความสัมพันธ์): ชื่อที่ต่อแล้ว} ใช้ร่วมกันทั้งไฟล์
+        (หินส่วนใหญ่มีชุด ID ซ้ำกัน จึงแปลงแต่ละชุดครั้งเดียว)
+    """
+    row = {}
+    for header, field, lookup_key, _ in EXPORT_COLUMNS:
+        if lookup_key:
+            rel_ids = stone_relation_ids(stone, field)
+            cache_key = (lookup_key, _ids_key(rel_ids))
+            value = label_cache.get(cache_key) if label_cache is not None else None
+            if value is None:
+                names = lookup_maps[lookup_key]
+                value = ', '.join(names.get(rel_id, '-') for rel_id in rel_ids)
+                if label_cache is not None:
+                    label_cache[cache_key] = value
+        elif field == UNLUCKY_NOTE_FIELD:
+            value = (unlucky_notes or {}).get(stone.get('id'), '')
+        else:
+            value = stone.get(field, '')
+        row[header] = value
+    return row
+
+def iter_export_rows(stones: Iterable[Dict[str, Any]], all_data: Dict[str, Any],
+                     unlucky_notes: Optional[Dict[int, str]] = None) -> Iterator[Dict[str, Any]]:
+    """แถวสำหรับส่งออกทีละแถว (stones เป็น dict / StoneRecord หรือ StoneRow จาก Catalog.columns ก็ได้)"""
+    lookup_maps = build_lookup_maps(all_data)
+    label_cache: Dict[tuple, str] = {}
+    for stone in stones:
+        yield resolve_stone_row(stone, lookup_maps, unlucky_notes, label_cache)
+
+def iter_column_rows(store: ColumnStore, positions: Iterable[int], all_data: Dict[str, Any],
+                     unlucky_notes: Optional[Dict[int, str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    แถวสำหรับส่งออกของหินในแถว positions ของ ColumnStore (เช่น Catalog.columns) ผลเดียวกับ iter_export_rows
+    อ่านจาก array ของแต่ละคอลัมน์โดยตรง และแปลงชุด ID ความสัมพันธ์ที่ซ้ำกันเป็นชื่อครั้งเดียว
+    """
+    lookup_maps = build_lookup_maps(all_data)
+    notes = unlucky_notes or {}
+    columns = [(header, field, lookup_maps[lookup_key] if lookup_key else None, {})
+               for header, field, lookup_key, _ in EXPORT_COLUMNS]
+    fields = ['id'] + [field for _, field, _, _ in columns if field != UNLUCKY_NOTE_FIELD]
+    for stone_id, *values in store.iter_values(positions, fields):
+        values = iter(values)
+        row = {}
+        for header, field, names, labels in columns:
+            if field == UNLUCKY_NOTE_FIELD:
+                row[header] = notes.get(stone_id, '')
+                continue
+            value = next(values)
+            if names is not None: # array ของ ID: แปลงแต่ละชุดเป็นชื่อครั้งเดียว
+                key = value.tobytes()
+                label = labels.get(key)
+                if label is None:
+                    label = labels[key] = ', '.join(names.get(rel_id, '-') for rel_id in value)
+                value = label
+            row[header] = value
+        yield row
+
+# =======================================================
+# WRITERS (เขียนแบบ Streaming ทีละแถว)
+# =======================================================
+
+def write_csv(rows: Iterable[Dict[str, Any]], f):
+    writer = csv.DictWriter(f, fieldnames=[c[0] for c in EXPORT_COLUMNS])
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+def write_jsonl(rows: Iterable[Dict[str, Any]], f):
+    for row in rows:
+        f.write(json.dumps(row, ensure_ascii=False))
+        f.write('\n')
+
+def _column_letter(index: int) -> str:
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _xml_escape(value: Any) -> str:
+    text = _XML_ILLEGAL.sub('', str(value))
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+def _xlsx_row(row_number: int, values: List[Any]) -> str:
+    cells = []
+    for col, value in enumerate(values):
+        ref = f"{_column_letter(col)}{row_number}"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{_xml_escape(value)}</t></is></c>')
+    return f'<row r="{row_number}">{"".join(cells)}</row>'
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="stones" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def write_xlsx(rows: Iterable[Dict[str, Any]], file_path: str):
+    """เขียน XLSX ขั้นต่ำด้วย zipfile + XML (Inline String) โดยเขียน Sheet แบบ Streaming"""
+    headers = [c[0] for c in EXPORT_COLUMNS]
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            ).encode('utf-8'))
+            sheet.write(_xlsx_row(1, headers).encode('utf-8'))
+            for row_number, row in enumerate(rows, 2):
+                sheet.write(_xlsx_row(row_number, [row[h] for h in headers]).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+
+@timed('export')
+def export_rows(rows: Iterable[Dict[str, Any]], file_path: str, fmt: str):
+    """เขียนแถวลงไฟล์ตามรูปแบบ ('csv', 'jsonl', 'xlsx')"""
+    if fmt == 'csv':
+        # utf-8-sig เพื่อให้ Excel แสดงภาษาไทยถูกต้อง
+        with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+            write_csv(rows, f)
+    elif fmt == 'jsonl':
+        with open(file_path, 'w', encoding='utf-8') as f:
+            write_jsonl(rows, f)
+    elif fmt == 'xlsx':
+        write_xlsx(rows, file_path)
+    else:
+        raise ValueError(f"ไม่รองรับรูปแบบไฟล์: {fmt}")
+
+def format_from_path(file_path: str) -> str:
+    return EXPORT_FORMATS.get(os.path.splitext(file_path)[1].lower(), 'csv')
+
+# =======================================================
+# BACKGROUND JOB
+# =======================================================
+
+class ExportCancelled(Exception):
+    """ถูกยกเลิกระหว่างส่งออก"""
+
+class BulkExportJob(threading.Thread):
+    """
+    ส่งออกผลการค้นหาบน Worker Thread พร้อมรายงานความคืบหน้าและยกเลิกได้
+    เขียนลงไฟล์ชั่วคราวก่อน แล้วจึงแทนที่ไฟล์ปลายทางเมื่อสำเร็จ (ยกเลิกแล้วไม่เหลือไฟล์ครึ่ง ๆ)
+
+    GUI อ่าน done_count / total / finished / error / cancelled จาก Main Thread (ห้ามเรียก Tk จาก Thread นี้)
+    """
+    def __init__(self, stones: List[Dict[str, Any]], all_data: Dict[str, Any], file_path: str,
+                 fmt: Optional[str] = None, on_progress: Optional[Callable[[int, int], None]] = None,
+                 unlucky_notes: Optional[Dict[int, str]] = None, columns: Optional[ColumnStore] = None):
+        """
+        :param columns: ColumnStore ที่มีหินเหล่านี้ (เช่น Catalog.columns) อ่านค่าจากคอลัมน์ด้วย iter_column_rows
+            (ColumnStore ไม่ถูกแก้หลังสร้าง จึงเป็น Snapshot ที่ปลอดภัยสำหรับ Worker Thread)
+        """
+        super().__init__(daemon=True)
+        self.stones = list(stones) # Snapshot: ผลการค้นหาอาจเปลี่ยนระหว่างส่งออก
+        self.all_data = all_data
+        self.unlucky_notes = unlucky_notes
+        self.columns = columns
+        self.positions = None
+        if columns is not None:
+            positions = [columns.position(s.get('id')) for s in self.stones]
+            if None not in positions: # หินที่ไม่อยู่ใน ColumnStore: ส่งออกจากหินโดยตรง
+                self.positions = positions
+        self.file_path = file_path
+        self.fmt = fmt or format_from_path(file_path)
+        self.on_progress = on_progress
+
+        self.total = len(self.stones)
+        self.done_count = 0
+        self.finished = False
+        self.cancelled = False
+        self.error = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _tracked_rows(self) -> Iterator[Dict[str, Any]]:
+        if self.positions is not None:
+            rows = iter_column_rows(self.columns, self.positions, self.all_data, self.unlucky_notes)
+        else:
+            rows = iter_export_rows(self.stones, self.all_data, self.unlucky_notes)
+        for row in rows:
+            if self._cancel_event.is_set():
+                raise ExportCancelled()
+            yield row
+            self.done_count += 1
+            if self.on_progress:
+                self.on_progress(self.done_count, self.total)
+
+    def run(self):
+        temp_path = f"{self.file_path}.part"
+        try:
+            export_rows(self._tracked_rows(), temp_path, self.fmt)
+            os.replace(temp_path, self.file_path)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.finished = True
@@ -6,7 +6,36 @@ import math
 from typing import Dict, List, Any, Union
 import json
 import re 
-import datetime 
+import threading
+from pystone_engine.data import (
+    DataLoadError, LockTimeout, STONES_FILE, empty_data,
+    generate_new_id, split_ids, format_lookup_list,
+)
+from pystone_engine.auspice import calculate_auspice_ids, get_lucky_color_ids
+from pystone_engine.index import StoneIndex, PARAM_TO_STONE_KEY
+from pystone_engine.search import (
+    date_search_params, add_lucky_color_param, unlucky_notes,
+)
+from pystone_engine.watch import DataWatcher, diff_stones, patch_stones
+from pystone_engine.store import (
+    EDITED_BY_OTHERS, record_change, merge_save_records, merge_save_stones, referencing_stones, cascade_lookup_change,
+)
+from pystone_engine.records import compact_stones
+from pystone_engine.catalog import Catalog
+from pystone_engine.loader import COMPACT_RECORDS, get_catalog
+from pystone_engine.validate import id_registry, validate_lookup_item
+from pystone_engine.memory import memory_report, format_memory_report, top_allocations
+from pystone_engine.timing import (
+    timed, timing_snapshot, reset_timings, last_profile, start_trace, stop_trace, is_tracing,
+)
+from pystone_engine.formatting import (
+    Segment, segments_to_text, format_date_summary, format_condition_summary,
+    get_next_element_name, format_stone_detail, format_lookup_detail,
+)
+from pystone_pdf import export_segments_to_pdf
+from pystone_export import BulkExportJob
+from pystone_engine.template import TemplateError
+from pystone_watchdog import StallWatchdog, STALL_THRESHOLD_MS
 
 # ----------------------------------------------------------------------
 # 1. UTILITY FUNCTIONS (Defined FIRST for correct scope)
@@ -14,240 +43,62 @@ import datetime
 DATA_FOLDER = 'data'
 if not os.path.isdir(DATA_FOLDER): os.makedirs(DATA_FOLDER) # FIX: แก้ไข osmakedirs เป็น os.makedirs
 
-# --- Data Loading (ROBUSTLY CHECKING JSON ERRORS) ---
-def load_all_data():
-    """โหลดไฟล์ JSON ทั้งหมดเข้าสู่หน่วยความจำ พร้อมตรวจสอบ JSON Error อย่างละเอียด"""
-    data = {}
-    files = ['stones_main_data.json', 'lookup_groups.json', 'lookup_days.json', 
-             'lookup_months.json', 'lookup_colors.json', 'lookup_zodiacs.json',
-             'lookup_element.json', 'lookup_chakra.json', 'lookup_numerology.json']
-    
-    for f in files:
-        # Determine the dictionary key
-        if f == 'lookup_element.json':
-            key = 'element' # FIX: ใช้คีย์ 'element' (ไม่มี s)
-        elif 'lookup' in f:
-            key = f.split('_')[1].split('.')[0]
-        else:
-            key = 'stones'
-            
-        path = os.path.join(DATA_FOLDER, f)
-        
-        if 'zodiacs' in f:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as file:
-                        zdata = json.load(file)
-                        data['animals'] = zdata.get('animals', [])
-                        data['signs'] = zdata.get('signs', [])
-                except json.JSONDecodeError as e:
-                    messagebox.showerror("JSON Error", f"❌ ไฟล์ {f} (Zodiacs) มีรูปแบบ JSON ไม่ถูกต้อง: {e}")
-                    return None
-                except Exception as e:
-                    messagebox.showerror("Load Error", f"❌ เกิดข้อผิดพลาดในการโหลดไฟล์ {f}: {e}")
-                    return None
-        
-        elif os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as file:
-                    data[key] = json.load(file)
-            except json.JSONDecodeError as e:
-                messagebox.showerror("JSON Error", f"❌ ไฟล์ {f} มีรูปแบบ JSON ไม่ถูกต้อง: {e}")
-                return None
-            except Exception as e:
-                messagebox.showerror("Load Error", f"❌ เกิดข้อผิดพลาดในการโหลดไฟล์ {f}: {e}")
-                return None
-        
-        elif f == 'stones_main_data.json':
-            messagebox.showinfo("Data Load", "⚠️ ไม่พบไฟล์ stones_main_data.json")
+# --- Pagination Settings ---
+DEFAULT_ROWS_PER_PAGE = 20
+PAGE_SIZE_AUTO = 'พอดีหน้าจอ' # ปรับจำนวนแถวตามความสูงของตาราง
+PAGE_SIZE_OPTIONS = [PAGE_SIZE_AUTO, '10', '20', '50', '100']
 
-    # ตรวจสอบว่าหินหลักโหลดหรือไม่
-    if not data.get('stones'):
-        messagebox.showinfo("Data Load", "Cannot run without stones_main_data.json.")
-        return None
-    return data
+# --- Hot Reload: ตรวจไฟล์ใน data/ ที่ถูกแก้ไขจากภายนอกทุก ๆ กี่มิลลิวินาที ---
+DATA_POLL_MS = 2000
 
-# --- JSON File Handler ---
-def save_stones_to_json(stones_data: List[Dict[str, Any]]):
-    """บันทึกข้อมูลหินทั้งหมดกลับไปยังไฟล์ JSON หลัก"""
-    file_path = os.path.join(DATA_FOLDER, 'stones_main_data.json')
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(stones_data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        messagebox.showerror("Save Error", f"ไม่สามารถบันทึกไฟล์ {file_path} ได้: {e}")
-        return False
-
-def generate_new_id(stones: List[Dict[str, Any]]) -> int:
-    """สร้าง ID ใหม่โดยการหา ID ที่มีค่าสูงสุดแล้วบวก 1"""
-    if not stones:
-        return 1
-    max_id = max(stone.get('id', 0) for stone in stones)
-    return max_id + 1
-
-# --- Helper Functions ---
-def split_ids(id_string: str) -> List[int]:
-    if not id_string: return []
-    try: return [int(s.strip()) for s in id_string.split() if s.strip().isdigit()]
-    except: return []
-    
-def lookup_name(lookup_array: List[Dict[str, Any]], id_val: Union[int, str], display_key: str, default: str = '-') -> str:
-    if not lookup_array or (not id_val and id_val != 0): return default
-    
-    target_id = None
-    if isinstance(id_val, str) and id_val.isdigit():
-        target_id = int(id_val)
-    elif isinstance(id_val, int):
-         target_id = id_val
-    
-    if target_id is None:
-        return default
+# --- Fast Start: ตรวจว่า Thread โหลดข้อมูลเสร็จหรือยังทุก ๆ กี่มิลลิวินาที ---
+LOADING_POLL_MS = 50
 
-    for item in lookup_array:
-        if item.get('id') == target_id:
-            if display_key == 'number_value':
-                 return str(item.get('number_value', default))
-            return str(item.get(display_key, default))
-    return default
+# --- ลบ Lookup: จำนวนชื่อหินที่อ้างถึงที่แสดงในหน้ายืนยัน ---
+CASCADE_PREVIEW_LIMIT = 10
 
-def format_lookup_list(ids_str, lookup_data, display_key):
-    ids = split_ids(ids_str)
-    names = [lookup_name(lookup_data, id, display_key) for id in ids]
-    return ', '.join(names) if names else '-'
+# --- ชื่อฟิลด์หินที่แสดงเมื่อข้อมูลขัดแย้ง ---
+STONE_FIELD_LABELS = {
+    'thai_name': 'ชื่อไทย', 'english_name': 'ชื่ออังกฤษ', 'other_names': 'ชื่ออื่น ๆ', 'description': 'คำอธิบาย',
+    'group_ids': 'กลุ่มมงคล', 'color_ids': 'สี', 'good_days': 'วันมงคล', 'good_months': 'เดือนมงคล',
+    'good_zodiac_animals': 'นักษัตร', 'good_zodiac_signs': 'ราศี', 'chakra_ids': 'จักระ',
+    'element_ids': 'ธาตุ', 'numerology_ids': 'เลขมงคล',
+}
 
+# --- Memory: COMPACT_RECORDS (pystone_engine.loader) เก็บหินเป็น StoneRecord แทน dict (PYSTONE_COMPACT=0 เพื่อใช้ dict เดิม) ---
 
-# --- Auspice Calculation Functions ---
-def convert_date_th_to_en(date_th: str) -> Union[datetime.date, None]:
-    if not re.match(r'^\d{1,2}/\d{1,2}/\d{4}$', date_th): return None
+# --- Data Loading (ROBUSTLY CHECKING JSON ERRORS) ---
+def load_all_data() -> Union[Catalog, None]:
+    """Catalog ที่ใช้ร่วมกันทั้ง Process (get_catalog) แล้วแจ้ง Error ด้วย messagebox (คืน None หากใช้งานไม่ได้)"""
+    if not os.path.exists(os.path.join(DATA_FOLDER, STONES_FILE)):
+        messagebox.showinfo("Data Load", f"⚠️ ไม่พบไฟล์ {STONES_FILE}")
     try:
-        day, month, year_th = map(int, date_th.split('/'))
-        year_en = year_th - 543
-        return datetime.date(year_en, month, day)
-    except ValueError:
+        catalog = get_catalog(DATA_FOLDER)
+    except DataLoadError as e:
+        messagebox.showerror("JSON Error" if isinstance(e.__cause__, json.JSONDecodeError) else "Load Error", str(e))
         return None
 
-def get_day_id_from_date(date_en: datetime.date) -> int:
-    python_day_of_week = date_en.weekday() 
-    
-    day_map = { 0: 2, 1: 3, 3: 6, 4: 7, 5: 8, 6: 1 }
-
-    if python_day_of_week == 2: return 4 
-    
-    return day_map.get(python_day_of_week, 0)
-
-def get_animal_id_from_date(date_en: datetime.date, all_data: Dict[str, Any]) -> int:
-    year = date_en.year
-    month = date_en.month
-    day = date_en.day
-    
-    is_before_songkran = (month < 4) or (month == 4 and day < 13)
-    if is_before_songkran: year -= 1
-        
-    animal_id = ((year + 8) % 12) + 1
-    return animal_id
-
-def get_sign_id_from_date(date_en: datetime.date, all_data: Dict[str, Any]) -> int:
-    month = date_en.month
-    day = date_en.day
-    zodiac_signs = all_data.get('signs', [])
-    
-    for sign in zodiac_signs:
-        start_m, start_d = sign['start_month'], sign['start_day']
-        end_m, end_d = sign['end_month'], sign['end_day']
-        sign_id = sign['id']
-        
-        if start_m > end_m: 
-            is_start_month = (month == start_m and day >= start_d)
-            is_end_month = (month == end_m and day <= end_d)
-            if is_start_month or is_end_month:
-                return sign_id
-        else:
-            is_start_month = (month == start_m and day >= start_d)
-            is_end_month = (month == end_m and day <= end_d)
-            is_mid_month = (month > start_m and month < end_m)
-            
-            if is_start_month or is_end_month or is_mid_month:
-                 return sign_id
-            
-    return 0
-
-def calculate_auspice_ids(date_th: str, all_data: Dict[str, Any]) -> Dict[str, Union[int, str]]:
-    date_en = convert_date_th_to_en(date_th)
-    if not date_en: return {'error': "รูปแบบวันที่ไม่ถูกต้อง (DD/MM/YYYY พ.ศ.)"}
-        
-    day_id = get_day_id_from_date(date_en)
-    month_id = date_en.month
-    animal_id = get_animal_id_from_date(date_en, all_data)
-    sign_id = get_sign_id_from_date(date_en, all_data)
-    
-    return {
-        'date_en': date_en.strftime('%Y-%m-%d'),
-        'day_id': day_id,
-        'month_id': month_id,
-        'animal_id': animal_id,
-        'sign_id': sign_id
-    }
-
-def get_lucky_color_ids(day_id: int, all_data: Dict[str, Any]) -> List[str]:
-    """
-    ดึง ID สีมงคลของวันนั้นๆ
-    """
-    if day_id == 0: return []
-
-    day_data = next((d for d in all_data.get('days', []) if d['id'] == day_id), None)
-    if not day_data or not day_data.get('lucky_color'): return []
-        
-    lucky_color_names_str = day_data['lucky_color']
-    lucky_color_names = [name.strip() for name in lucky_color_names_str.split(',') if name.strip()]
-    
-    lucky_color_ids = set()
-    for name in lucky_color_names:
-        color_item = next((c for c in all_data.get('colors', []) if c['name'] == name), None)
-        if color_item:
-            # เก็บเป็น str ID เพื่อให้เข้ากันกับ stone_ids ใน apply_auspice_filter
-            lucky_color_ids.add(str(color_item['id'])) 
-            
-    return list(lucky_color_ids)
-
-def check_unlucky_color(stone_color_ids: str, day_id: int, all_data: Dict[str, Any]) -> Dict[str, Union[bool, str]]:
-    if day_id == 0: return {'is_unlucky': False, 'unlucky_colors_found': ''}
-
-    day_data = next((d for d in all_data.get('days', []) if d['id'] == day_id), None)
-    if not day_data or not day_data.get('unlucky_color'): return {'is_unlucky': False, 'unlucky_colors_found': ''}
-        
-    unlucky_color_names_str = day_data['unlucky_color']
-    unlucky_color_names = [name.strip() for name in unlucky_color_names_str.split(',') if name.strip()]
-    
-    unlucky_color_ids = set()
-    for name in unlucky_color_names:
-        color_item = next((c for c in all_data.get('colors', []) if c['name'] == name), None)
-        if color_item:
-            unlucky_color_ids.add(color_item['id'])
-            
-    if not unlucky_color_ids: return {'is_unlucky': False, 'unlucky_colors_found': ''}
-
-    stone_ids_list = [str(id) for id in split_ids(stone_color_ids)]
-
-    unlucky_colors_found = []
-    
-    for stone_id in stone_ids_list:
-        if int(stone_id) in unlucky_color_ids:
-            unlucky_colors_found.append(next((c['name'] for c in all_data['colors'] if c['id'] == int(stone_id)), f"ID:{stone_id}"))
+    # ตรวจสอบว่าหินหลักโหลดหรือไม่
+    if not catalog.stones:
+        messagebox.showinfo("Data Load", "Cannot run without stones_main_data.json.")
+        return None
+    return catalog
 
-    return {
-        'is_unlucky': len(unlucky_colors_found) > 0,
-        'unlucky_colors_found': ', '.join(unlucky_colors_found)
-    }
+def conflict_text(conflicts: List[Dict[str, Any]]) -> str:
+    """รายการที่ไม่ได้บันทึก (conflicts จาก merge_save_records) บรรทัดละรายการ สำหรับแสดงในกล่องข้อความ"""
+    return "\n".join(f"ID {c['id']}: {c['reason']}" + (f" ({', '.join(c['fields'])})" if c['fields'] else "")
+                     for c in conflicts)
 
 # --- New Helper Function for Export ---
 
-def export_to_file(content: str, filename_base: str, file_type: str):
+def export_to_file(content: Union[str, List[Segment]], filename_base: str, file_type: str):
     """
     Export content to a Text (.txt) or PDF (.pdf) file.
-    Note: For PDF, it uses a very basic text-to-PDF conversion method
-    that doesn't require external libraries (just simple placeholder).
+    content เป็นข้อความล้วนหรือ Segment Stream (ข้อความ, tag) จาก format_stone_detail/_format_detail_view
+    PDF ถูกเขียนโดย pystone_pdf (ฝังฟอนต์ไทยแบบ Subset, ไม่ต้องใช้ Library ภายนอก)
     """
+    segments = [(content, '')] if isinstance(content, str) else content
+    
     if file_type == 'text':
         file_extension = '.txt'
         filetypes = [("Text files", "*.txt")]
@@ -268,15 +119,10 @@ def export_to_file(content: str, filename_base: str, file_type: str):
     if file_path:
         try:
             if file_type == 'text':
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                with timed('export.text'), open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(segments_to_text(segments))
             elif file_type == 'pdf':
-                # Simple PDF Placeholder: Create a dummy PDF file path and save content as text
-                # NOTE: For real PDF generation, you need libraries like reportlab or fpdf.
-                # Here, we save as a text file and name it .pdf for simplicity.
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(f"--- PDF Simulation (Content Saved as Text) ---\n\n")
-                    f.write(content)
+                export_segments_to_pdf(segments, file_path, title=filename_base)
 
             messagebox.showinfo("Export Success", f"บันทึกไฟล์ {os.path.basename(file_path)} เรียบร้อยแล้ว")
         except Exception as e:
@@ -290,7 +136,11 @@ def export_to_file(content: str, filename_base: str, file_type: str):
 class MultiSelectModal(tk.Toplevel):
     """
     Modal สำหรับเลือก ID หลายรายการจาก Listbox (สำหรับความสัมพันธ์ Many-to-Many)
+    รองรับ Lookup ขนาดใหญ่: ค้นหาแบบ Substring ผ่าน Index, ใส่แถวทีละชุดระหว่าง Idle
+    และเก็บรายการที่เลือกไว้แม้เปลี่ยนคำค้น
     """
+    BATCH_SIZE = 200 # จำนวนแถวที่ใส่ลง Listbox ต่อหนึ่ง Idle Callback
+    
     def __init__(self, parent, title, data_list, display_key, initial_ids: str):
         super().__init__(parent)
         self.title(title)
@@ -299,24 +149,42 @@ class MultiSelectModal(tk.Toplevel):
         self.selected_ids = set(split_ids(initial_ids))
         self.result_ids = None # Output
         
-        self.geometry("400x400")
+        # id -> ตำแหน่งใน data_list (แทนการเรียก data_list.index() ทีละรายการ)
+        self.index_by_id = {item['id']: i for i, item in enumerate(self.data_list)}
+        self.labels = [f"ID {item['id']}: {item.get(self.display_key, '-')}" for item in self.data_list]
+        self._build_search_index()
+        
+        self.visible = list(range(len(self.data_list))) # ตำแหน่งใน data_list ของแต่ละแถวที่แสดง
+        self.selected_rows = set() # แถวใน Listbox ที่เลือกอยู่ (เทียบกับ curselection() เพื่อหาแถวที่เปลี่ยน)
+        self.inserted_count = 0
+        self._insert_after_id = None
+        
+        self.geometry("400x450")
         self.transient(parent)
         self.grab_set()
 
+        # Filter Entry
+        filter_frame = ttk.Frame(self)
+        filter_frame.pack(fill='x', padx=10, pady=(10, 0))
+        ttk.Label(filter_frame, text="ค้นหา:").pack(side='left')
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var)
+        filter_entry.pack(side='left', fill='x', expand=True, padx=5)
+        self.filter_var.trace_add('write', lambda *args: self.apply_filter())
+        
+        self.count_label = ttk.Label(self, text="")
+        self.count_label.pack(anchor='w', padx=10)
+
         self.listbox_frame = ttk.Frame(self)
-        self.listbox_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        self.listbox_frame.pack(fill='both', expand=True, padx=10, pady=5)
         
-        self.listbox = tk.Listbox(self.listbox_frame, selectmode=tk.MULTIPLE, height=15)
+        # exportselection=False: พิมพ์ในช่องค้นหาแล้วรายการที่เลือกไม่หาย
+        self.listbox = tk.Listbox(self.listbox_frame, selectmode=tk.MULTIPLE, height=15, exportselection=False)
         self.listbox.pack(side="left", fill="both", expand=True)
-
-        for item in self.data_list:
-            display_name = str(item.get(self.display_key, '-'))
-            self.listbox.insert(tk.END, f"ID {item['id']}: {display_name}")
-            
-            # Pre-select items
-            if item['id'] in self.selected_ids:
-                idx = self.data_list.index(item)
-                self.listbox.selection_set(idx)
+        scrollbar = ttk.Scrollbar(self.listbox_frame, orient='vertical', command=self.listbox.yview)
+        scrollbar.pack(side='right', fill='y')
+        self.listbox.configure(yscrollcommand=scrollbar.set)
+        self.listbox.bind('<<ListboxSelect>>', self.on_select)
 
         # Buttons
         btn_frame = ttk.Frame(self)
@@ -324,14 +192,89 @@ class MultiSelectModal(tk.Toplevel):
         ttk.Button(btn_frame, text="ตกลง", command=self.on_ok).pack(side='left', padx=10)
         ttk.Button(btn_frame, text="ยกเลิก", command=self.destroy).pack(side='left', padx=10)
         
+        self.render_rows()
+        filter_entry.focus_set()
+        
         self.wait_window(self)
 
+    def _build_search_index(self):
+        """สร้าง Index ตัวอักษรเดี่ยวและคู่ตัวอักษร (n-gram) -> ตำแหน่งรายการ สำหรับค้นหาแบบ Substring"""
+        self.gram_index = {}
+        self.lower_labels = [label.lower() for label in self.labels]
+        for i, label in enumerate(self.lower_labels):
+            for n in (1, 2):
+                for pos in range(len(label) - n + 1):
+                    self.gram_index.setdefault(label[pos:pos + n], set()).add(i)
+
+    def search(self, query: str) -> List[int]:
+        """คืนตำแหน่งรายการที่มี query เป็น Substring (เรียงตามลำดับเดิม)"""
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self.data_list)))
+        if len(query) == 1:
+            return sorted(self.gram_index.get(query, ()))
+        
+        # Intersect ชุดของคู่ตัวอักษรทั้งหมดใน query แล้วยืนยันด้วยการเทียบ Substring จริง
+        candidates = None
+        for pos in range(len(query) - 1):
+            postings = self.gram_index.get(query[pos:pos + 2])
+            if not postings:
+                return []
+            candidates = set(postings) if candidates is None else candidates & postings
+            if not candidates:
+                return []
+        return sorted(i for i in candidates if query in self.lower_labels[i])
+
+    def apply_filter(self):
+        """กรองรายการตามคำค้นและแสดงผลใหม่"""
+        self.visible = self.search(self.filter_var.get())
+        self.render_rows()
+
+    def render_rows(self):
+        """ล้าง Listbox แล้วเริ่มใส่แถวที่แสดงทีละชุด"""
+        if self._insert_after_id is not None:
+            self.after_cancel(self._insert_after_id)
+            self._insert_after_id = None
+        self.listbox.delete(0, tk.END)
+        self.selected_rows = set()
+        self.inserted_count = 0
+        self._insert_batch()
+
+    def _insert_batch(self):
+        """ใส่แถวชุดถัดไปลง Listbox และเลือกรายการที่เคยเลือกไว้"""
+        self._insert_after_id = None
+        start = self.inserted_count
+        batch = self.visible[start:start + self.BATCH_SIZE]
+        if batch:
+            self.listbox.insert(tk.END, *[self.labels[i] for i in batch])
+            for row, i in enumerate(batch, start):
+                if self.data_list[i]['id'] in self.selected_ids:
+                    self.listbox.selection_set(row)
+                    self.selected_rows.add(row)
+            self.inserted_count += len(batch)
+        
+        if self.inserted_count < len(self.visible):
+            self._insert_after_id = self.after_idle(self._insert_batch)
+        self.update_count_label()
+
+    def on_select(self, event=None):
+        """บันทึกการเลือก/ยกเลิกลงใน selected_ids เฉพาะแถวที่เปลี่ยน (ไม่วนทุกแถวที่แสดง)"""
+        current = set(self.listbox.curselection())
+        for row in current - self.selected_rows:
+            self.selected_ids.add(self.data_list[self.visible[row]]['id'])
+        for row in self.selected_rows - current:
+            self.selected_ids.discard(self.data_list[self.visible[row]]['id'])
+        self.selected_rows = current
+        self.update_count_label()
+
+    def update_count_label(self):
+        selected_count = sum(1 for item_id in self.selected_ids if item_id in self.index_by_id)
+        self.count_label.config(text=f"แสดง {len(self.visible)} จาก {len(self.data_list)} รายการ | เลือกแล้ว {selected_count} รายการ")
+
     def on_ok(self):
-        selected_indices = self.listbox.curselection()
-        new_ids = []
-        for index in selected_indices:
-            item = self.data_list[index]
-            new_ids.append(str(item['id']))
+        # เรียงผลลัพธ์ตามลำดับใน data_list เหมือนเดิม (ตัด ID ที่ไม่มีใน Lookup ออก)
+        selected_indices = sorted(self.index_by_id[item_id] for item_id in self.selected_ids if item_id in self.index_by_id)
+        new_ids = [str(self.data_list[index]['id']) for index in selected_indices]
         
         self.result_ids = ' '.join(new_ids)
         self.destroy()
@@ -386,22 +329,15 @@ class AddColorModal(tk.Toplevel):
             "hex_code": hex_code
         }
         
-        colors_data.append(new_color)
+        # Save color lookup file (เพิ่มเฉพาะรายการใหม่ หาก ID ชนกับสีที่ผู้อื่นเพิ่มจะได้ ID ใหม่)
+        result = self.parent_app.save_records('colors', [record_change(None, new_color)])
+        if result is None:
+             return
+        new_id = result['renumbered'].get(new_id, new_id)
+        messagebox.showinfo("สำเร็จ", f"เพิ่มสี '{name_th}' (ID: {new_id}) แล้ว")
         
-        # Save color lookup file
-        file_path = os.path.join(DATA_FOLDER, 'lookup_colors.json')
-        try:
-             with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(colors_data, f, ensure_ascii=False, indent=2)
-             messagebox.showinfo("สำเร็จ", f"เพิ่มสี '{name_th}' (ID: {new_id}) แล้ว")
-             
-             # FIX: ต้องโหลดข้อมูลหลักใหม่เพื่อให้ lookup_colors ใน PyStoneApp อัปเดต
-             self.parent_app.ALL_DATA = load_all_data() 
-             
-             self.new_color_id = new_id
-             self.destroy()
-        except Exception as e:
-             messagebox.showerror("Save Error", f"ไม่สามารถบันทึกไฟล์ Lookup สีได้: {e}")
+        self.new_color_id = new_id
+        self.destroy()
 
 
 class StoneCrudModal(tk.Toplevel):
@@ -533,15 +469,7 @@ class StoneCrudModal(tk.Toplevel):
             self.id_entry.insert(0, self.stone.get('id', 'N/A'))
             self.id_entry.config(state='readonly')
 
-            self.thai_name_entry.insert(0, self.stone.get('thai_name', ''))
-            self.english_name_entry.insert(0, self.stone.get('english_name', ''))
-            self.other_names_entry.insert(0, self.stone.get('other_names', ''))
-            self.description_text.insert('1.0', self.stone.get('description', ''))
-            
-            # Load Relation IDs (Replace space with comma for editing clarity)
-            for key, entry in self.relation_widgets.items():
-                ids_str = self.stone.get(key, '').replace(' ', ', ')
-                entry.insert(0, ids_str)
+            self.fill_form(self.stone)
         elif self.mode == 'add':
              # ตั้งค่า ID สำหรับโหมดเพิ่ม
              new_id = generate_new_id(self.parent.all_stones)
@@ -550,6 +478,33 @@ class StoneCrudModal(tk.Toplevel):
              self.id_entry.config(state='readonly')
 
 
+    def fill_form(self, stone: Dict[str, Any]):
+        """ใส่ค่าฟิลด์ของหินลงฟอร์ม (แทนค่าเดิมในฟอร์ม)"""
+        for entry, field in ((self.thai_name_entry, 'thai_name'), (self.english_name_entry, 'english_name'),
+                             (self.other_names_entry, 'other_names')):
+            entry.delete(0, tk.END)
+            entry.insert(0, stone.get(field, ''))
+        self.description_text.delete('1.0', tk.END)
+        self.description_text.insert('1.0', stone.get('description', ''))
+
+        # Load Relation IDs (Replace space with comma for editing clarity)
+        for key, entry in self.relation_widgets.items():
+            entry.delete(0, tk.END)
+            entry.insert(0, stone.get(key, '').replace(' ', ', '))
+
+    def form_values(self) -> Dict[str, str]:
+        """ค่าฟิลด์หินในฟอร์ม (ความสัมพันธ์แปลง Comma/Space เป็น Space แบบที่บันทึกใน JSON)"""
+        values = {
+            'thai_name': self.thai_name_entry.get().strip(),
+            'english_name': self.english_name_entry.get().strip(),
+            'other_names': self.other_names_entry.get().strip(),
+            'description': self.description_text.get('1.0', tk.END).strip(),
+        }
+        for key, entry in self.relation_widgets.items():
+            # แทนที่ Comma ด้วย Space และกรอง Space ที่เกินมา
+            values[key] = ' '.join(entry.get().strip().replace(',', ' ').split())
+        return values
+
     def open_select_modal(self, key: str, map_key: str, display_key: str):
         """เปิด Modal เลือกรายการหลายรายการ"""
         current_ids = self.relation_widgets[key].get()
@@ -570,64 +525,79 @@ class StoneCrudModal(tk.Toplevel):
         """เปิด Modal เพิ่มสีใหม่"""
         modal = AddColorModal(self)
         
-        # หากมีการเพิ่มสีใหม่ ให้โหลดข้อมูลหลักใหม่ทั้งหมด
+        # หากมีการเพิ่มสีใหม่ (AddColorModal อัปเดต Lookup สีของหน้าหลักแล้ว)
         if modal.new_color_id > 0:
-            self.parent.ALL_DATA = load_all_data() # โหลดข้อมูลหลักใหม่
-            
             messagebox.showinfo("Info", "ข้อมูลสีถูกอัปเดตแล้ว โปรดทราบว่าการแก้ไขรายการที่กำลังทำอยู่ต้องกรอก ID สีใหม่ด้วยตนเอง")
 
 
     def save_stone(self):
         """จัดการการบันทึกข้อมูล (เพิ่ม/แก้ไข)"""
         
-        stone_id = self.id_entry.get()
-        thai_name = self.thai_name_entry.get().strip()
-        english_name = self.english_name_entry.get().strip()
-        description = self.description_text.get('1.0', tk.END).strip()
+        stone_id = int(self.id_entry.get())
+        values = self.form_values()
+        thai_name = values['thai_name']
         
-        if not thai_name or not english_name:
+        if not thai_name or not values['english_name']:
             messagebox.showerror("Error", "กรุณาระบุชื่อไทยและชื่ออังกฤษ")
             return
 
-        # 2. จัดการข้อมูลความสัมพันธ์ (แปลง Comma/Space เป็น Space สำหรับบันทึก)
-        relation_data = {}
-        for key, entry in self.relation_widgets.items():
-            raw_ids = entry.get().strip()
-            # แทนที่ Comma ด้วย Space และกรอง Space ที่เกินมา
-            normalized_ids = ' '.join(raw_ids.replace(',', ' ').split())
-            relation_data[key] = normalized_ids
-            
-        # 3. สร้าง Object หินใหม่
-        new_stone = {
-            'id': int(stone_id),
-            'thai_name': thai_name,
-            'english_name': english_name,
-            'other_names': self.other_names_entry.get().strip(),
-            'description': description,
-            **relation_data
-        }
+        # สร้าง Object หินใหม่ (โหมดแก้ไข: คงฟิลด์อื่นของหินเดิม เช่น revision)
+        original = self.stone if self.mode == 'edit' else None
+        if original is not None and all(original.get(field, '') == value for field, value in values.items()):
+            self.destroy() # ไม่มีฟิลด์ที่เปลี่ยน
+            return
+        new_stone = {**(original or {}), 'id': stone_id, **values}
+        message = f"อัปเดตข้อมูลหิน {thai_name} สำเร็จ" if self.mode == 'edit' else f"เพิ่มหิน {thai_name} สำเร็จ"
+
+        # บันทึกเฉพาะหินนี้ลง JSON (Merge ระดับฟิลด์กับการแก้ไขจากโปรแกรมอื่น) แล้วอัปเดตหน้าจอหลักจากผลบนดิสก์
+        result = self.parent.save_records('stones', [record_change(original, new_stone)],
+                                          report_conflicts=original is None)
+        if result is None:
+            messagebox.showerror("บันทึกไม่สำเร็จ", "การบันทึกไฟล์ JSON ล้มเหลว")
+            return
+        if result['conflicts']:
+            if original is not None:
+                self.resolve_conflict(original, values, result['conflicts'][0])
+            return
 
-        # 4. อัปเดต List หลัก (self.parent.all_stones)
-        if self.mode == 'edit':
-            for i, stone in enumerate(self.parent.all_stones):
-                if stone.get('id') == new_stone['id']:
-                    self.parent.all_stones[i] = new_stone
-                    break
-            message = f"อัปเดตข้อมูลหิน {thai_name} สำเร็จ"
-        else: # Add Mode
-            self.parent.all_stones.append(new_stone)
-            message = f"เพิ่มหิน {thai_name} สำเร็จ"
-
-        # 5. บันทึกกลับไปที่ JSON
-        if save_stones_to_json(self.parent.all_stones):
-            messagebox.showinfo("บันทึกสำเร็จ", message)
-            
-            # 6. อัปเดตหน้าจอหลัก
-            self.parent.filtered_stones = self.parent.all_stones.copy()
-            self.parent.render_stone_table() 
+        messagebox.showinfo("บันทึกสำเร็จ", message)
+        self.parent.show_all_stones()
+        self.destroy()
+
+    def resolve_conflict(self, original: Dict[str, Any], values: Dict[str, str], conflict: Dict[str, Any]):
+        """
+        หินถูกแก้โดยผู้อื่นหลังเปิดฟอร์ม: ย้ายฐานของฟอร์มไปเป็นหินล่าสุดบนดิสก์ โดยคงเฉพาะฟิลด์ที่ผู้ใช้แก้
+        (ฟิลด์อื่นใช้ค่าของผู้อื่น) และให้ผู้ใช้เลือกค่าของฟิลด์ที่ขัดแย้ง แล้วบันทึกอีกครั้ง
+        การบันทึกครั้งใหม่จึงเขียนทับเฉพาะฟิลด์ที่ผู้ใช้แก้ ไม่ใช่ทั้งฟอร์ม
+        """
+        latest = self.parent.catalog.stone(conflict['id'])
+        if latest is None:
+            messagebox.showwarning("ข้อมูลขัดแย้ง", "หินนี้ถูกลบโดยผู้ใช้อื่นแล้ว กดบันทึกอีกครั้งเพื่อเพิ่มเป็นหินใหม่")
+            self.stone, self.mode = None, 'add'
+            return
+        if conflict['reason'] != EDITED_BY_OTHERS:
+            # เช่นไม่ผ่านการตรวจข้อมูล: คงฟอร์มไว้ให้ผู้ใช้แก้แล้วบันทึกใหม่
+            messagebox.showwarning("บันทึกไม่สำเร็จ", conflict_text([conflict]))
+            return
+
+        mine = {field: value for field, value in values.items() if value != original.get(field, '')}
+        clashing = [field for field in conflict['fields'] if field in mine]
+        lines = [f"{STONE_FIELD_LABELS.get(field, field)}: ของผู้อื่น \"{latest.get(field, '')}\" / ของคุณ \"{mine[field]}\""
+                 for field in clashing]
+        keep_mine = messagebox.askyesno(
+            "ข้อมูลขัดแย้ง",
+            "หินนี้ถูกแก้ไขโดยผู้ใช้อื่นหลังจากเปิดฟอร์ม ฟิลด์ต่อไปนี้ถูกแก้ทั้งสองฝ่าย:\n" + "\n".join(lines)
+            + "\n\nใช้ค่าของคุณสำหรับฟิลด์เหล่านี้หรือไม่? (ไม่ = ใช้ค่าของผู้อื่น)\n"
+            + "ฟิลด์อื่นที่คุณแก้จะถูกบันทึกด้วย ส่วนฟิลด์ที่คุณไม่ได้แก้ใช้ค่าของผู้อื่น")
+        if not keep_mine:
+            mine = {field: value for field, value in mine.items() if field not in clashing}
+        self.stone = latest
+        self.fill_form({**latest, **mine})
+        if not mine:
+            messagebox.showinfo("ข้อมูลขัดแย้ง", "ใช้ข้อมูลของผู้ใช้อื่นแล้ว (ไม่มีฟิลด์อื่นที่ต้องบันทึก)")
             self.destroy()
-        else:
-             messagebox.showerror("บันทึกไม่สำเร็จ", "การบันทึกไฟล์ JSON ล้มเหลว")
+            return
+        self.save_stone()
 
 
 class LookupCrudModal(tk.Toplevel):
@@ -778,61 +748,83 @@ class LookupCrudModal(tk.Toplevel):
         # เพื่อป้องกันข้อมูลอื่น ๆ หายไปเมื่อทำการ Update
         new_data = {**self.item, **new_data} 
         
-        # 1. อัปเดต List หลัก (self.parent_app.ALL_DATA)
-        current_list = self.parent_app.ALL_DATA[self.key]
-        
-        if self.mode == 'edit':
-            for i, item in enumerate(current_list):
-                if item.get('id') == new_data['id']:
-                    current_list[i] = new_data
-                    break
-            message = f"อัปเดตข้อมูล {self.display_name} ID:{new_data['id']} สำเร็จ"
-        else:
-            current_list.append(new_data)
-            message = f"เพิ่มข้อมูล {self.display_name} ID:{new_data['id']} สำเร็จ"
-            
-        # 2. บันทึกกลับไปที่ JSON
-        if self._save_lookup_to_json(current_list):
-            messagebox.showinfo("บันทึกสำเร็จ", message)
-            self.parent_app.ALL_DATA = load_all_data() # โหลดข้อมูลหลักใหม่เพื่ออัปเดต Pop-up
-            self.destroy()
-        else:
+        # 1. บันทึกเฉพาะรายการนี้ลง JSON (Merge กับการแก้ไขจากโปรแกรมอื่น)
+        original = self.item if self.mode == 'edit' else None
+        result = self.parent_app.save_records(self.key, [record_change(original, new_data)])
+        if result is None:
              messagebox.showerror("บันทึกไม่สำเร็จ", "การบันทึกไฟล์ JSON ล้มเหลว")
+             return
+        if result['conflicts']:
+            # คงฟอร์มไว้: ใช้ข้อมูลล่าสุดบนดิสก์เป็นฐาน กดบันทึกอีกครั้งเพื่อใช้ค่าในฟอร์มแทน
+            latest = next((item for item in self.parent_app.ALL_DATA[self.key] if item.get('id') == new_data['id']), None)
+            self.item = latest or {}
+            self.mode = 'edit' if latest else 'add'
+            return
 
-    def delete_item(self):
-         if messagebox.askyesno("ยืนยันการลบ", f"คุณต้องการลบ {self.display_name} ID: {self.item['id']} ใช่หรือไม่?"):
-            current_list = self.parent_app.ALL_DATA[self.key]
-            
-            # ลบออกจาก List
-            new_list = [item for item in current_list if item.get('id') != self.item['id']]
-
-            # บันทึกกลับไปที่ JSON
-            if self._save_lookup_to_json(new_list):
-                messagebox.showinfo("ลบข้อมูล", f"ลบ {self.display_name} ID: {self.item['id']} เรียบร้อยแล้ว")
-                self.parent_app.ALL_DATA = load_all_data() # โหลดข้อมูลหลักใหม่
-                self.destroy()
-            else:
-                 messagebox.showerror("ลบไม่สำเร็จ", "การบันทึกไฟล์ JSON ล้มเหลว")
-
+        item_id = result['renumbered'].get(new_data['id'], new_data['id'])
+        action = "อัปเดต" if self.mode == 'edit' else "เพิ่ม"
+        messagebox.showinfo("บันทึกสำเร็จ", f"{action}ข้อมูล {self.display_name} ID:{item_id} สำเร็จ")
+        self.destroy()
 
-    def _save_lookup_to_json(self, data_list: List[Dict[str, Any]]):
-        """Helper function สำหรับบันทึกข้อมูล Lookup กลับไปยังไฟล์ JSON"""
-        file_path = os.path.join(DATA_FOLDER, f'lookup_{self.key}.json')
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data_list, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            messagebox.showerror("Save Error", f"ไม่สามารถบันทึกไฟล์ {file_path} ได้: {e}")
-            return False
+    def delete_item(self):
+         # หินที่อ้างถึงรายการนี้ (จาก Reverse Index ของ StoneIndex) จะถูกเอา ID นี้ออกก่อนลบ
+         app = self.parent_app
+         affected = referencing_stones(app.catalog, self.key, self.item['id'])
+         message = f"คุณต้องการลบ {self.display_name} ID: {self.item['id']} ใช่หรือไม่?"
+         if affected:
+             names = [s.get('thai_name') or s.get('english_name') or f"ID {s.get('id')}" for s in affected[:CASCADE_PREVIEW_LIMIT]]
+             more = f" และอีก {len(affected) - len(names)} รายการ" if len(affected) > len(names) else ""
+             message += f"\n\nหิน {len(affected)} รายการอ้างถึงรายการนี้ และจะถูกเอา ID นี้ออก:\n{', '.join(names)}{more}"
+         if messagebox.askyesno("ยืนยันการลบ", message):
+           # แก้หินที่อ้างถึงทั้งหมดก่อนในการบันทึกครั้งเดียว (all-or-nothing): หากหินใดขัดแย้ง
+           # หรือบันทึกไม่ได้ ถือว่า Cascade ล้มเหลวและไม่ลบรายการ Lookup เพื่อไม่ให้เหลือหินที่อ้างถึง ID ที่ไม่มีอยู่
+           changes = cascade_lookup_change(app.catalog, self.key, self.item['id'])
+           if changes:
+               stone_result = app.save_records('stones', changes, all_or_nothing=True, report_conflicts=False)
+               if stone_result is None:
+                   messagebox.showerror("ลบไม่สำเร็จ", f"บันทึกหินที่อ้างถึงไม่สำเร็จ จึงยังไม่ได้ลบ {self.display_name}")
+                   return
+               if stone_result['conflicts']:
+                   messagebox.showerror("ลบไม่สำเร็จ",
+                                        f"แก้หินที่อ้างถึงไม่สำเร็จ จึงยังไม่ได้ลบ {self.display_name} (ไม่ได้แก้หินรายการใด):\n"
+                                        + conflict_text(stone_result['conflicts'])
+                                        + "\n\nหน้าจอแสดงข้อมูลล่าสุดแล้ว กรุณาลองลบอีกครั้ง")
+                   self.destroy()
+                   return
+           # ลบเฉพาะรายการนี้ออกจาก JSON (ไม่ลบหากผู้อื่นแก้ไขรายการนี้หลังจากที่เราโหลด)
+           result = app.save_records(self.key, [record_change(self.item, None)])
+           # ลบไม่สำเร็จหลัง Cascade: หินไม่อ้างถึงรายการนี้แล้ว แต่ไม่มี ID ค้างที่ชี้ไปยังรายการที่ไม่มีอยู่
+           fixed = f" (แก้ไขหิน {stone_result['applied']} รายการ)" if changes else ""
+           if result is None:
+                messagebox.showerror("ลบไม่สำเร็จ", f"การบันทึกไฟล์ JSON ล้มเหลว{fixed}"
+                                     + (f" หินไม่อ้างถึง {self.display_name} นี้แล้ว แต่ยังไม่ได้ลบรายการ" if changes else ""))
+                return
+           if not result['conflicts']:
+               messagebox.showinfo("ลบข้อมูล", f"ลบ {self.display_name} ID: {self.item['id']} เรียบร้อยแล้ว{fixed}")
+           self.destroy()
 
 
 class PyStoneApp(tk.Tk):
     # ------------------------------------------------------------------
     # 3. MAIN APPLICATION CLASS
     # ------------------------------------------------------------------
-    def __init__(self, all_data):
-        self.ALL_DATA = all_data
+    def __init__(self, all_data: Union[Catalog, Dict[str, Any], None] = None, rows_per_page: Union[int, str] = DEFAULT_ROWS_PER_PAGE):
+        """
+        all_data = None: Fast Start - แสดงหน้าต่างหลักทันที แล้วโหลดข้อมูลและสร้าง Index บน Background Thread
+        (ช่องค้นหาใช้ได้เมื่อโหลดเสร็จ) ส่ง Catalog (เช่นจาก load_all_data()) หรือ Dict ข้อมูล
+        มาเพื่อสร้างหน้าต่างพร้อมข้อมูลทันทีแบบเดิม
+
+        การแก้ไขหิน/Lookup ทั้งหมดผ่าน self.catalog (apply_stones / apply_lookup)
+        เพื่อให้ Index, ลำดับ id และ version ของแคตตาล็อกที่ใช้ร่วมกันถูกต้องเสมอ
+        """
+        self.data_loaded = all_data is not None
+        if isinstance(all_data, Catalog):
+            self.catalog = all_data
+        else:
+            self.catalog = Catalog(all_data if self.data_loaded else empty_data())
+            if self.data_loaded and COMPACT_RECORDS:
+                self.catalog.data['stones'] = compact_stones(self.catalog.stones)
+        self.ALL_DATA = self.catalog.data
         
         super().__init__()
         self.title("PyStone: ระบบจัดการและค้นหาหินมงคล")
@@ -868,15 +860,45 @@ class PyStoneApp(tk.Tk):
 
         self.all_stones = self.ALL_DATA['stones']
         self.filtered_stones = self.all_stones.copy()
+        # หมายเหตุสีอัปมงคลของการค้นหาปัจจุบัน: stone id -> หมายเหตุ (ไม่เก็บในหินของแคตตาล็อก)
+        self.unlucky_notes: Dict[int, str] = {}
         
-        # Pagination Control
-        self.rows_per_page = 20
+        # Pagination Control (rows_per_page = PAGE_SIZE_AUTO เพื่อปรับตามความสูงหน้าต่าง)
+        self.auto_page_size = rows_per_page == PAGE_SIZE_AUTO
+        self.rows_per_page = DEFAULT_ROWS_PER_PAGE if self.auto_page_size else int(rows_per_page)
         self.current_page = 1
-        
-        # UI Setup
+        self._auto_fit_after_id = None
+        
+        # Row Cache: stone id -> ค่าคอลัมน์ที่จัดรูปแบบแล้ว (ไม่รวมลำดับ/Tag) ของแคตตาล็อกเวอร์ชัน _row_cache_key
+        # (รายละเอียดหินใช้ Cache ของ self.catalog.detail โดยตรง)
+        self.row_cache = {}
+        self._row_cache_key = None
+        self._row_prefetch_after_id = None
+        self._prewarm_after_id = None
+        
+        # Hot Reload: โหมดของการค้นหาล่าสุดที่แสดงอยู่ (None = แสดงหินทั้งหมด) ใช้ค้นหาซ้ำเมื่อข้อมูลเปลี่ยน
+        self.last_search_mode = None
+        self.data_watcher = DataWatcher(DATA_FOLDER)
+        self._data_poll_after_id = None
+        
+        # UI Setup (สร้างเฉพาะ Frame ค้นหาตามชื่อ โหมดอื่นสร้างเมื่อเปิดใช้ครั้งแรก)
+        self.data_widgets = [] # Widget ที่ใช้ได้เมื่อโหลดข้อมูลเสร็จแล้วเท่านั้น
         self.create_widgets()
-        self.render_stone_table() 
+        self.bind('<Control-Shift-D>', lambda e: self.show_diagnostics_window()) # หน้าต่าง Diagnostics (ซ่อน)
+        if self.data_loaded:
+            self.rebuild_stone_index(self.catalog.index)
+            self.render_stone_table()
+            self._data_poll_after_id = self.after(DATA_POLL_MS, self.poll_data_files)
+        else:
+            self.start_background_load()
+        
+        # Stall Watchdog: บันทึกช่วงที่หน้าจอค้าง พร้อม Handler และ Stack ลง pystone_stalls.log
+        self.stall_watchdog = None
+        if STALL_THRESHOLD_MS > 0:
+            self.stall_watchdog = StallWatchdog(self)
+            self.stall_watchdog.start()
 
+    @timed('startup.widgets')
     def create_widgets(self):
         """สร้าง Layout หลักของแอปพลิเคชัน"""
         
@@ -918,14 +940,11 @@ class PyStoneApp(tk.Tk):
             
             btn = ttk.Button(tab_frame, text=text, command=command)
             btn.pack(side='left', padx=3)
+            self.data_widgets.append(btn)
             
-            # สร้าง Frame เฉพาะสำหรับโหมดค้นหาเท่านั้น
-            if mode not in ('Chakra', 'Element', 'Numerology'):
-                self.search_modes[mode] = self.create_search_mode_frame(mode)
-            
-        # 2.3 Display the initial Frame
-        if 'name' in self.search_modes:
-            self.search_modes['name'].pack(fill='x')
+        # 2.3 Display the initial Frame (Frame ของโหมดอื่นสร้างใน get_search_mode_frame เมื่อเปิดใช้ครั้งแรก)
+        self.get_search_mode_frame('name').pack(fill='x')
+        self.data_widgets.extend(self.search_modes['name'].winfo_children())
         
         # --- 2.5 Summary Area for Search (ย้ายมาอยู่ใต้ปุ่มเพิ่มข้อมูล) ---
         self.summary_control_frame = ttk.Frame(main_frame)
@@ -936,6 +955,11 @@ class PyStoneApp(tk.Tk):
         self.report_label = ttk.Label(self.summary_control_frame, text="พบหิน:**0**รายการ", style='Header.TLabel')
         self.report_label.pack(side='left', padx=3)
         
+        # ปุ่มส่งออกผลการค้นหาทั้งหมด (CSV/JSONL/XLSX)
+        export_button = ttk.Button(self.summary_control_frame, text="⬇ Export ผลค้นหา", command=self.export_search_results)
+        export_button.pack(side='left', padx=3)
+        self.data_widgets.append(export_button)
+        
         # 3. Pagination Controls (Top Right)
         self.top_pagination_frame = ttk.Frame(self.summary_control_frame)
         self.top_pagination_frame.pack(side='right', padx=8)
@@ -979,6 +1003,9 @@ class PyStoneApp(tk.Tk):
         
         # --- 6. Event Bindings for Actions Column ---
         self.tree.bind('<ButtonRelease-1>', self.handle_action_click)
+        
+        # ปรับจำนวนแถวต่อหน้าเมื่อขนาดตารางเปลี่ยน (เฉพาะโหมดพอดีหน้าจอ)
+        self.tree.bind('<Configure>', lambda e: self.schedule_auto_fit())
 
 
     def set_search_widgets_state(self, state: str):
@@ -1039,13 +1066,31 @@ class PyStoneApp(tk.Tk):
 
         # FIX: ปุ่ม +เพิ่มข้อมูล ถูกย้ายไปอยู่หน้าปุ่ม 'ก่อนหน้า'
         if is_top:
-            ttk.Button(parent_frame, 
+            add_button = ttk.Button(parent_frame, 
                        text="+ เพิ่มข้อมูล", 
                        command=lambda: self.open_crud_modal('add', None),
-                       style='AddButton.TButton').pack(side='right', padx=8)
+                       style='AddButton.TButton')
+            add_button.pack(side='right', padx=8)
+            self.data_widgets.append(add_button)
+        else:
+            # ตัวเลือกจำนวนแถวต่อหน้า (ด้านล่าง)
+            self.page_size_select = ttk.Combobox(parent_frame, values=PAGE_SIZE_OPTIONS, width=10, state='readonly')
+            self.page_size_select.set(PAGE_SIZE_AUTO if self.auto_page_size else str(self.rows_per_page))
+            self.page_size_select.pack(side='left', padx=5)
+            self.page_size_select.bind("<<ComboboxSelected>>", lambda e: self.set_page_size(self.page_size_select.get()))
+            ttk.Label(parent_frame, text="แถวต่อหน้า").pack(side='left')
 
         
 
+    def get_search_mode_frame(self, mode: str) -> ttk.Frame:
+        """Frame ของโหมดค้นหา (สร้างครั้งแรกที่ใช้ พร้อม Combobox จาก Lookup และจำนวนหินของตัวเลือก)"""
+        frame = self.search_modes.get(mode)
+        if frame is None:
+            frame = self.search_modes[mode] = self.create_search_mode_frame(mode)
+            if mode == 'condition' and hasattr(self, 'stone_index'):
+                self._rebuild_facet_candidates()
+        return frame
+
     def create_search_mode_frame(self, mode: str) -> ttk.Frame:
         """สร้าง Frame สำหรับ Search Mode ต่างๆ"""
         
@@ -1062,6 +1107,7 @@ class PyStoneApp(tk.Tk):
             ttk.Label(frame, text="กลุ่มมงคล:").pack(side='left', padx=5, pady=5)
             # สร้าง Map แยกไว้สำหรับ Lookup ใน filter_data
             self.group_select_map = {g['name']: g['id'] for g in self.ALL_DATA['groups']}
+            self.group_select_items = [(g['name'], g['id']) for g in self.ALL_DATA['groups']]
             self.group_select = ttk.Combobox(frame, values=['--ทั้งหมด--'] + [g['name'] for g in self.ALL_DATA['groups']], width=30)
             self.group_select.set('--ทั้งหมด--')
             self.group_select.pack(side='left', padx=5, pady=5)
@@ -1112,10 +1158,14 @@ class PyStoneApp(tk.Tk):
         # เก็บ map และ Combobox object ไว้ใน instance variable
         setattr(self, f'{attr_name}_map', mapping) # self.day_id_map (Map)
         setattr(self, f'{attr_name}_cb', cb)       # self.day_id_cb (Combobox object)
+        setattr(self, f'{attr_name}_items', [(item[display_key], item['id']) for item in data_list]) # สำหรับ Facet Count
         
         # FIX: ผูก Event เพื่ออัปเดต Cond Summary เมื่อมีการเปลี่ยนค่าใน Dropdown วัน (ไม่เรียก filter_data)
+        # และอัปเดตจำนวนหินข้างตัวเลือกของทุก Dropdown
         if attr_name == 'day_id':
-             cb.bind("<<ComboboxSelected>>", lambda e: self.update_cond_summary_label())
+             cb.bind("<<ComboboxSelected>>", lambda e: [self.update_cond_summary_label(), self.update_facet_counts()])
+        else:
+             cb.bind("<<ComboboxSelected>>", lambda e: self.update_facet_counts())
 
 
         return cb
@@ -1127,12 +1177,14 @@ class PyStoneApp(tk.Tk):
         # 1. เปิดการใช้งานและเคลียร์ข้อมูลเก่า (FIXED)
         self.set_search_widgets_state('normal')
         self.clear_search_inputs()
+        self.update_facet_counts()
         self.top_summary_label.config(text="ผลการค้นหา", foreground='blue')
 
-        # 2. แสดง Frame ใหม่
+        # 2. แสดง Frame ใหม่ (สร้างเมื่อเปิดโหมดนี้ครั้งแรก)
+        new_frame = self.get_search_mode_frame(mode)
         for frame in self.search_modes.values():
             frame.pack_forget()
-        self.search_modes[mode].pack(fill='x')
+        new_frame.pack(fill='x')
         self.current_mode.set(mode)
         
         # 3. หากสลับไปโหมด condition ให้อัปเดตสรุปสีทันที (เพื่อแสดงค่าเริ่มต้น)
@@ -1140,23 +1192,15 @@ class PyStoneApp(tk.Tk):
             self.update_cond_summary_label()
         
     
-    def filter_data(self, mode: str):
-        """ฟังก์ชันหลักในการกรองข้อมูลตามโหมดที่เลือก"""
+    def filter_data(self, mode: str, keep_page: bool = False):
+        """ฟังก์ชันหลักในการกรองข้อมูลตามโหมดที่เลือก (keep_page: คงหน้าปัจจุบันไว้ เช่นตอนข้อมูลถูกโหลดใหม่)"""
         
         self.filtered_stones = self.all_stones.copy()
         current_day_id = 0 
         search_params = {}
         
         try:
-            if mode == 'name':
-                search_term = self.name_search_entry.get().strip().lower()
-                if search_term:
-                    self.filtered_stones = [s for s in self.filtered_stones if search_term in s['thai_name'].lower() or search_term in s['english_name'].lower() or search_term in s['other_names'].lower()]
-                
-                if not search_term:
-                    self.filtered_stones = self.all_stones.copy()
-            
-            elif mode == 'group':
+            if mode == 'group':
                 group_name = self.group_select.get()
                 group_id = self.group_select_map.get(group_name, 0)
                 if group_id:
@@ -1176,12 +1220,7 @@ class PyStoneApp(tk.Tk):
                     messagebox.showerror("Error", auspice_result['error'])
                     return
 
-                search_params = {
-                    'day_id': str(auspice_result['day_id']),
-                    'month_id': str(auspice_result['month_id']),
-                    'animal_id': str(auspice_result['animal_id']),
-                    'sign_id': str(auspice_result['sign_id']),
-                }
+                search_params = date_search_params(auspice_result)
                 current_day_id = auspice_result['day_id']
                 # self.update_date_summary(auspice_result) # จะเรียกหลังการกรอง
             
@@ -1206,26 +1245,20 @@ class PyStoneApp(tk.Tk):
                     messagebox.showwarning("Warning", "กรุณาเลือกเงื่อนไขอย่างน้อยหนึ่งข้อ")
                     return
             
-            # 1. เพิ่มเงื่อนไขสีมงคลก่อนส่งไปกรอง
-            if current_day_id:
-                lucky_color_ids = get_lucky_color_ids(current_day_id, self.ALL_DATA)
-                if lucky_color_ids:
-                    search_params['lucky_color_ids'] = lucky_color_ids
+            # จับเวลาเฉพาะการกรอง (ไม่รวมการรอ Dialog และการวาดตาราง) แยกตามโหมด
+            with timed(f'filter.{mode}'):
+                if mode == 'name':
+                    self.filtered_stones = self.catalog.search_name(self.name_search_entry.get())
 
-            
-            # 2. Apply AND Search for ID parameters
-            if search_params:
-                self.filtered_stones = self.apply_auspice_filter(self.filtered_stones, search_params)
-
-            # 3. Check for Unlucky Color (เฉพาะถ้ามีการระบุ Day ID)
-            unlucky_count = 0
-            if current_day_id:
-                self.check_unlucky_colors_for_results(current_day_id)
-                unlucky_count = sum(1 for stone in self.filtered_stones if stone.get('is_unlucky'))
-            else:
-                for stone in self.filtered_stones:
-                    stone['is_unlucky'] = False
-                    stone['unlucky_note'] = ""
+                # 1. เพิ่มเงื่อนไขสีมงคลก่อนส่งไปกรอง
+                add_lucky_color_param(search_params, current_day_id, self.ALL_DATA)
+
+                # 2. Apply AND Search for ID parameters (ผ่านแคตตาล็อก: ColumnStore หรือ StoneIndex ดู Catalog.search)
+                if search_params:
+                    self.filtered_stones = self.catalog.search(search_params)
+
+                # 3. Check for Unlucky Color (เฉพาะถ้ามีการระบุ Day ID)
+                unlucky_count = self.check_unlucky_colors_for_results(current_day_id)
 
             # 4. อัปเดต Summary Bar ด้วย Unlucky Count
             if mode == 'date':
@@ -1238,135 +1271,29 @@ class PyStoneApp(tk.Tk):
 
             # 5. FIX: ปิดการใช้งานช่องค้นหาเมื่อการค้นหาเสร็จสมบูรณ์
             self.set_search_widgets_state('disabled')
+            self.last_search_mode = mode
 
 
-            self.current_page = 1
+            self.current_page = self._clamp_page(self.current_page) if keep_page else 1
             self.render_stone_table()
 
         except Exception as e:
             messagebox.showerror("Error", f"เกิดข้อผิดพลาดในการค้นหา: {e}")
-            self.filtered_stones = self.all_stones.copy()
-            self.current_page = 1
-            self.render_stone_table()
+            self.show_all_stones()
 
 
-    def apply_auspice_filter(self, stones: List[Dict[str, Union[str, List[str]]]], params: Dict[str, Union[str, List[str]]]) -> List[Dict[str, Any]]:
+    def check_unlucky_colors_for_results(self, day_id: int) -> int:
         """
-        ใช้ AND logic เพื่อกรองหินตาม ID ต่างๆ (Day, Month, Animal, Sign, Group, และ Lucky Color)
+        หมายเหตุสีอัปมงคลของรายการหินที่ถูกกรองแล้ว เก็บใน self.unlucky_notes ของการค้นหานี้
+        (ไม่เขียน Flag ลงในหินของแคตตาล็อกที่ใช้ร่วมกัน) คืนจำนวนหินที่มีสีอัปมงคล
         """
-        
-        filtered = []
-        # Mapping parameter key to stone data key
-        param_to_stone_key = {
-            'group_id': 'group_ids',
-            'day_id': 'good_days',
-            'month_id': 'good_months',
-            'animal_id': 'good_zodiac_animals',
-            'sign_id': 'good_zodiac_signs'
-        }
-        
-        required_lucky_ids = set(params.get('lucky_color_ids', []))
-
-        for stone in stones:
-            is_match = True
-            
-            # 1. CHECK LUCKY COLOR CONDITION (OR Logic - ต้องมีสีมงคลอย่างน้อย 1 สี)
-            if required_lucky_ids:
-                stone_color_ids = set([str(id) for id in split_ids(stone.get('color_ids', ''))])
-                
-                # ถ้าไม่มีสีมงคลใดๆ เลยในหินนี้ -> NOT A MATCH
-                if not (required_lucky_ids.intersection(stone_color_ids)):
-                    is_match = False
-            
-            if not is_match:
-                continue
-
-            # 2. CHECK GENERAL AND CONDITIONS (วัน, เดือน, นักษัตร, ราศี)
-            for param_key, param_val in params.items():
-                if param_key == 'lucky_color_ids': 
-                    continue # ข้ามสีมงคล เพราะถูกตรวจสอบแล้ว
-                
-                stone_key = param_to_stone_key.get(param_key)
-                
-                if not stone_key or not param_val or param_val == '0': continue
-                
-                # Check IDs against stone's relation IDs
-                stone_ids = [str(id) for id in split_ids(stone.get(stone_key, ''))]
-                
-                # Special handling for Wednesday (Day ID 4:กลางวัน, 5:กลางคืน)
-                if param_key == 'day_id' and param_val == '4': 
-                    # ถ้าค้นด้วย ID 4 (พุธกลางวัน) ต้องรวมหินที่เหมาะกับ ID 4 หรือ ID 5
-                    if '4' not in stone_ids and '5' not in stone_ids:
-                        is_match = False
-                        break
-                elif param_val not in stone_ids:
-                    is_match = False
-                    break
-            
-            if is_match:
-                filtered.append(stone)
-                
-        return filtered
-
-
-    def check_unlucky_colors_for_results(self, day_id: int):
-        """เพิ่ม Flag สีอัปมงคลให้กับรายการหินที่ถูกกรองแล้ว"""
-        
-        for stone in self.filtered_stones:
-            stone['is_unlucky'] = False
-            stone['unlucky_note'] = ""
-            
-            # ตรวจสอบสีอัปมงคล
-            result = check_unlucky_color(stone['color_ids'], day_id, self.ALL_DATA)
-            
-            if result['is_unlucky']:
-                stone['is_unlucky'] = True
-                stone['unlucky_note'] = f"❌ มีสีอัปมงคล: {result['unlucky_colors_found']}"
+        self.unlucky_notes = unlucky_notes(self.filtered_stones, day_id, self.ALL_DATA)
+        return len(self.unlucky_notes)
             
 
     def update_date_summary(self, auspice_result: Dict[str, Union[int, str]], unlucky_count: int = 0):
         """อัปเดต Label แสดงผลสรุป วดป.เกิด (ย้ายไป self.top_summary_label)"""
-        
-        d_id = auspice_result['day_id']
-        m_id = auspice_result['month_id']
-        a_id = auspice_result['animal_id']
-        s_id = auspice_result['sign_id']
-        
-        day_name = lookup_name(self.ALL_DATA['days'], d_id, 'name')
-        
-        # ตรรกะการแสดงผลสำหรับวันพุธ (กลางวัน/กลางคืน)
-        day_info_html = ""
-        if d_id == 4:
-            day_info_day = next((d for d in self.ALL_DATA['days'] if d['id'] == 4), None)
-            day_info_night = next((d for d in self.ALL_DATA['days'] if d['id'] == 5), None)
-            
-            if day_info_day and day_info_night:
-                day_info_html = (
-                    f"📅 วันพุธ | "
-                    f"กลางวัน: มงคล:{day_info_day['lucky_color']} | อัปมงคล:{day_info_day['unlucky_color']} "
-                    f"กลางคืน: มงคล:{day_info_night['lucky_color']} | อัปมงคล:{day_info_night['unlucky_color']}"
-                )
-        else:
-            day_info = next((d for d in self.ALL_DATA['days'] if d['id'] == d_id), None)
-            if day_info:
-                 day_info_html = (
-                    f"📅 วัน{day_info['name']} | "
-                    f"มงคล: {day_info['lucky_color']} | อัปมงคล: {day_info['unlucky_color']}"
-                )
-
-        month_name = lookup_name(self.ALL_DATA['months'], m_id, 'name')
-        animal_name = lookup_name(self.ALL_DATA['animals'], a_id, 'thai_name')
-        sign_name = lookup_name(self.ALL_DATA['signs'], s_id, 'name')
-
-        # FIX: รวม Unlucky Count ในวงเล็บ
-        unlucky_note = f" (❌ {unlucky_count} มีหินสีอัปมงคล)" if unlucky_count > 0 else ""
-
-        summary = (
-            f"{day_info_html} | "
-            f"📆 เดือน{month_name} | ปีนักษัตร: {animal_name} | ราศี: {sign_name}"
-            f"{unlucky_note}"
-        )
-        
+        summary = format_date_summary(auspice_result, self.ALL_DATA, unlucky_count)
         self.top_summary_label.config(text=summary, foreground='blue', justify='left')
 
 
@@ -1380,38 +1307,290 @@ class PyStoneApp(tk.Tk):
             self.top_summary_label.config(text="*เลือกวันเพื่อดูข้อมูลสี", foreground='darkgreen')
             return
 
-        # ตรรกะการแสดงผลสำหรับวันพุธ (กลางวัน/กลางคืน)
-        day_info_html = ""
-        if day_id == 4 or day_id == 5:
-            day_info_day = next((d for d in self.ALL_DATA['days'] if d['id'] == 4), None)
-            day_info_night = next((d for d in self.ALL_DATA['days'] if d['id'] == 5), None)
-            
-            if day_info_day and day_info_night:
-                day_info_html = (
-                    f"📅 วันพุธ | "
-                    f"กลางวัน: มงคล:{day_info_day['lucky_color']} | อัปมงคล:{day_info_day['unlucky_color']} "
-                    f"กลางคืน: มงคล:{day_info_night['lucky_color']} | อัปมงคล:{day_info_night['unlucky_color']}"
-                )
-        else:
-            day_info = next((d for d in self.ALL_DATA['days'] if d['id'] == day_id), None)
-            if day_info:
-                 day_info_html = (
-                    f"📅 วัน{day_info['name']} | "
-                    f"มงคล: {day_info['lucky_color']} | อัปมงคล: {day_info['unlucky_color']}"
-                )
+        summary = format_condition_summary(day_id, self.ALL_DATA, unlucky_count)
+        self.top_summary_label.config(text=summary, foreground='darkgreen', justify='left')
         
-        # FIX: รวม Unlucky Count ในวงเล็บ
-        unlucky_note = f" (❌ {unlucky_count} มีหินสีอัปมงคล)" if unlucky_count > 0 else ""
+    
+    # ... (filter_data, check_unlucky_colors_for_results เหมือนเดิม) ...
+
+    # =======================================================
+    # 3.5 FACET COUNTS (จำนวนหินข้างตัวเลือกค้นหา)
+    # =======================================================
+
+    @timed('index.build')
+    def rebuild_stone_index(self, stone_index: Union[StoneIndex, None] = None):
+        """ใช้ Index ของแคตตาล็อก (stone_index ที่สร้างจาก self.all_stones แล้ว) หรือสร้างใหม่ทั้งหมดเมื่อไม่ระบุ"""
+        self.stone_index = stone_index or StoneIndex(self.all_stones)
+        self._rebuild_facet_candidates()
+        self.update_facet_counts()
+
+    def update_stone_index(self, removed: List[Dict[str, Any]], added: List[Dict[str, Any]]):
+        """
+        ใช้ self.all_stones ชุดใหม่กับแคตตาล็อก: ปรับ Index เฉพาะหินที่ถูกลบ/เพิ่ม/แก้ไข
+        และเพิ่ม version ของแคตตาล็อก (Cache แถว/รายละเอียดของเวอร์ชันเดิมถูกทิ้ง)
+        (เรียกหลัง CRUD หรือไฟล์หินถูกแก้จากภายนอก)
+        """
+        self.catalog.apply_stones(self.all_stones, removed, added)
+        self._rebuild_facet_candidates()
+        self.update_facet_counts()
+
+    def _rebuild_facet_candidates(self):
+        """
+        ชุด stone id ของแต่ละวัน (รวมสีมงคลของวันนั้นแบบ filter_data) ไม่ขึ้นกับการเลือกปัจจุบัน จึงคำนวณครั้งเดียวต่อการเปลี่ยนข้อมูล
+        (เดือน/นักษัตร/ราศี นับจากแคตตาล็อกด้วย Catalog.facet_counts)
+        """
+        items = getattr(self, 'day_id_items', [])
+        self._facet_candidates = {'day_id': {item_id: self._facet_option_ids('day_id', item_id) for _, item_id in items}}
+
+    def _facet_option_ids(self, attr_name: str, option_id: int) -> set:
+        """ชุด stone id ที่ได้จากการเลือกตัวเลือกเดียว (ตรรกะเดียวกับ filter_data)"""
+        ids = self.stone_index.ids_for_param(attr_name, option_id)
         
-        self.top_summary_label.config(text=f"{day_info_html}{unlucky_note}", foreground='darkgreen', justify='left')
+        # เลือกวันแล้ว filter_data จะบังคับสีมงคลของวันนั้นด้วย
+        if attr_name == 'day_id':
+            lucky_color_ids = get_lucky_color_ids(option_id, self.ALL_DATA)
+            if lucky_color_ids:
+                ids = ids & self.stone_index.ids_for_any('color_ids', (int(c) for c in lucky_color_ids))
+        return ids
+
+    def update_facet_counts(self):
+        """อัปเดตจำนวนหินที่จะพบหากเลือกแต่ละตัวเลือก ใน Combobox กลุ่ม/วัน/เดือน/นักษัตร/ราศี"""
+        if not hasattr(self, 'stone_index'):
+            return
         
-    
-    # ... (filter_data, apply_auspice_filter, check_unlucky_colors_for_results เหมือนเดิม) ...
+        # 1. โหมดกลุ่มมงคล (เงื่อนไขเดียว)
+        if hasattr(self, 'group_select'):
+            counts = self.catalog.facet_counts('group_ids')
+            self._apply_facet_labels(self.group_select, 'group_select_map', self.group_select_items, counts)
+        
+        # 2. โหมดมีเงื่อนไข (AND) - นับจากผลของเงื่อนไขอื่นที่เลือกอยู่
+        selected = {}
+        for attr_name in ('day_id', 'month_id', 'animal_id', 'sign_id'):
+            cb = getattr(self, f'{attr_name}_cb', None)
+            if cb is not None:
+                selected[attr_name] = getattr(self, f'{attr_name}_map', {}).get(cb.get(), 0)
+        
+        for attr_name in selected:
+            # เงื่อนไขอื่นที่เลือกอยู่ รวมสีมงคลของวันที่เลือก (แบบ filter_data)
+            params = {other_attr: str(other_id) for other_attr, other_id in selected.items() if other_attr != attr_name and other_id}
+            add_lucky_color_param(params, selected['day_id'] if 'day_id' in params else 0, self.ALL_DATA)
+            if attr_name == 'day_id':
+                base_ids = self.stone_index.match_ids(params) if params else self.stone_index.all_ids
+                counts = self.stone_index.facet_counts(base_ids, self._facet_candidates.get('day_id', {}))
+            else:
+                counts = self.catalog.facet_counts(PARAM_TO_STONE_KEY[attr_name], params)
+            self._apply_facet_labels(getattr(self, f'{attr_name}_cb'), f'{attr_name}_map', getattr(self, f'{attr_name}_items'), counts)
+
+    def _apply_facet_labels(self, cb: ttk.Combobox, map_attr: str, items: List[tuple], counts: Dict[int, int]):
+        """ใส่จำนวนหินท้ายชื่อตัวเลือก เช่น 'จันทร์ (12)' โดยยังคงค่าที่เลือกไว้"""
+        mapping = getattr(self, map_attr, {})
+        current_id = mapping.get(cb.get(), 0)
+        
+        # เก็บทั้งชื่อเดิมและชื่อที่มีจำนวน เพื่อให้ filter_data หา ID ได้ทั้งสองแบบ
+        new_mapping = {'--ทั้งหมด--': 0}
+        values = ['--ทั้งหมด--']
+        current_label = None
+        for name, item_id in items:
+            label = f"{name} ({counts.get(item_id, 0)})"
+            new_mapping[name] = item_id
+            new_mapping[label] = item_id
+            values.append(label)
+            if item_id == current_id:
+                current_label = label
+        
+        setattr(self, map_attr, new_mapping)
+        cb.config(values=values)
+        if current_label:
+            cb.set(current_label)
+
+
+    # =======================================================
+    # 3.55 FAST START (โหลดข้อมูลและสร้าง Index บน Background Thread)
+    # =======================================================
+
+    def start_background_load(self):
+        """ปิดการใช้งาน Widget ที่ต้องใช้ข้อมูล แสดงความคืบหน้า แล้วเริ่ม Thread โหลดข้อมูล"""
+        for widget in self.data_widgets:
+            widget.config(state='disabled')
+        self.report_label.config(text="กำลังโหลดข้อมูล...")
+        self.loading_bar = ttk.Progressbar(self.summary_control_frame, mode='indeterminate', length=160)
+        self.loading_bar.pack(side='left', padx=8)
+        self.loading_bar.start(15)
+        
+        result = {}
+        def load():
+            # ห้ามเรียก Tk ใน Thread นี้: ส่งผลกลับผ่าน result ให้ Main Thread อ่าน
+            try:
+                # get_catalog ทำ compact_stones และสร้าง StoneIndex ให้แล้ว (จับเวลาเป็น load.compact / load.index)
+                result['catalog'] = get_catalog(DATA_FOLDER)
+            except DataLoadError as e:
+                result['error'] = e
+            finally:
+                result['done'] = True
+        
+        # เริ่ม Thread หลังหน้าต่างถูกวาดครั้งแรก (json.loads ถือ GIL ตลอดการ Parse แต่ละไฟล์)
+        thread = threading.Thread(target=load, name='pystone-data-load', daemon=True)
+        self.after_idle(thread.start)
+        self.after(LOADING_POLL_MS, self._poll_background_load, result)
+
+    def _poll_background_load(self, result: Dict[str, Any]):
+        if 'done' not in result:
+            self.after(LOADING_POLL_MS, self._poll_background_load, result)
+            return
+        self.loading_bar.destroy()
+        
+        error = result.get('error')
+        if error is not None:
+            messagebox.showerror("JSON Error" if isinstance(error.__cause__, json.JSONDecodeError) else "Load Error", str(error))
+            self.destroy()
+            return
+        if not result['catalog'].stones:
+            messagebox.showinfo("Data Load", "Cannot run without stones_main_data.json.")
+            self.destroy()
+            return
+        
+        self.catalog = result['catalog']
+        self.ALL_DATA = self.catalog.data
+        self.all_stones = self.catalog.stones
+        self.filtered_stones = self.all_stones.copy()
+        self.rebuild_stone_index(self.catalog.index)
+        for widget in self.data_widgets:
+            widget.config(state='normal')
+        self.data_loaded = True
+        self.render_stone_table()
+        self._data_poll_after_id = self.after(DATA_POLL_MS, self.poll_data_files)
+
+    # =======================================================
+    # 3.6 HOT RELOAD (ไฟล์ใน data/ ถูกแก้ไขจากภายนอก)
+    # =======================================================
+
+    def poll_data_files(self):
+        """ตรวจไฟล์ข้อมูลที่เปลี่ยน แล้วอ่านใหม่และอัปเดตเฉพาะส่วนที่เกี่ยวข้อง"""
+        loaded, errors = self.data_watcher.reload_changed()
+        if loaded:
+            self.apply_data_changes(loaded)
+        for e in errors:
+            messagebox.showwarning("Data Reload", f"{e}\n(ใช้ข้อมูลเดิมต่อจนกว่าไฟล์จะถูกแก้ไขอีกครั้ง)")
+        self._data_poll_after_id = self.after(DATA_POLL_MS, self.poll_data_files)
+
+    def save_records(self, key: str, changes: List[Dict[str, Any]], all_or_nothing: bool = False,
+                     report_conflicts: bool = True) -> Union[Dict[str, Any], None]:
+        """
+        บันทึกเฉพาะรายการที่แก้ไขของ stones หรือ Lookup (ล็อกไฟล์ + ตรวจ revision + Merge กับโปรแกรมอื่น)
+        แล้วอัปเดตหน้าจอจากข้อมูลล่าสุดบนดิสก์ และแจ้งรายการที่ขัดแย้งหรือไม่ผ่านการตรวจ (ไม่ได้บันทึก)
+
+        :param all_or_nothing: มี Conflict แม้รายการเดียว = ไม่บันทึกรายการใดเลย (ดู merge_save_records)
+        :param report_conflicts: False = ผู้เรียกแจ้ง Conflict เอง
+
+        :return: ผลของ merge_save_records หรือ None หากบันทึกไม่ได้
+        """
+        filename = STONES_FILE if key == 'stones' else f'lookup_{key}.json'
+        try:
+            if key == 'stones':
+                result = merge_save_stones(changes, DATA_FOLDER, id_registry(self.ALL_DATA), all_or_nothing)
+            else:
+                result = merge_save_records(filename, changes, DATA_FOLDER,
+                                            validator=lambda item: validate_lookup_item(key, item),
+                                            all_or_nothing=all_or_nothing)
+        except (LockTimeout, DataLoadError, OSError) as e:
+            messagebox.showerror("Save Error", f"ไม่สามารถบันทึกไฟล์ {os.path.join(DATA_FOLDER, filename)} ได้: {e}")
+            return None
+
+        if key == 'stones' and self.data_watcher.is_current(filename, result['base_stamp']):
+            # ไฟล์ที่ Merge ไม่มีการแก้จากภายนอก: ใช้เฉพาะหินที่บันทึก
+            self.data_watcher.mark_current(filename)
+            self.apply_saved_stones(changes, result)
+        else:
+            self.data_saved(filename, {key: result['records']})
+        if result['conflicts'] and report_conflicts:
+            messagebox.showwarning("ข้อมูลขัดแย้ง",
+                                   "รายการต่อไปนี้ไม่ได้บันทึก:\n" + conflict_text(result['conflicts']) +
+                                   "\n\nหน้าจอแสดงข้อมูลล่าสุดแล้ว หากต้องการใช้ค่าของคุณให้บันทึกอีกครั้ง")
+        return result
+
+    def apply_saved_stones(self, changes: List[Dict[str, Any]], result: Dict[str, Any]):
+        """
+        ใช้เฉพาะหินที่บันทึก (id ใน changes และ id ใหม่ใน renumbered) จาก result['records']
+        แทน compact_stones + diff_stones ทั้งแคตตาล็อก แล้วแสดงผลการค้นหาเดิมอีกครั้ง
+        """
+        saved = dict.fromkeys([change['id'] for change in changes] + list(result['renumbered'].values()))
+        for record in result['records']:
+            if record.get('id') in saved:
+                saved[record['id']] = compact_stones([record])[0] if COMPACT_RECORDS else record
+        self.all_stones, removed, added = patch_stones(self.all_stones, saved)
+        self.update_stone_index(removed, added)
+        self.refresh_results()
+
+    def data_saved(self, filename: str, changes: Union[Dict[str, list], None] = None):
+        """โปรแกรมบันทึกไฟล์เอง: ไม่ให้ Watcher นับเป็นการแก้จากภายนอก และอัปเดต Lookup ที่เปลี่ยน (ถ้ามี)"""
+        self.data_watcher.mark_current(filename)
+        if changes:
+            self.apply_data_changes(changes)
+
+    def apply_data_changes(self, loaded: Dict[str, list]):
+        """
+        ใช้ข้อมูลใหม่ของบาง key ใน ALL_DATA
+        - stones: ปรับ Index/Cache เฉพาะหินที่เปลี่ยน
+        - Lookup: ล้าง Cache ที่แสดงชื่อจาก Lookup และอัปเดตตัวเลือกค้นหา
+        แล้วแสดงผลการค้นหาเดิมอีกครั้งโดยคงโหมด เงื่อนไข และหน้าปัจจุบันไว้
+        """
+        if 'stones' in loaded:
+            new_stones = compact_stones(loaded['stones']) if COMPACT_RECORDS else loaded['stones']
+            removed, added = diff_stones(self.all_stones, new_stones)
+            self.all_stones = new_stones
+            self.update_stone_index(removed, added)
+
+        lookup_keys = [key for key in loaded if key != 'stones']
+        for key in lookup_keys:
+            self.catalog.apply_lookup(key, loaded[key])
+        if lookup_keys:
+            self.refresh_search_options()
+        
+        self.refresh_results()
+
+    def refresh_search_options(self):
+        """อัปเดตรายการตัวเลือกใน Combobox จาก Lookup ปัจจุบัน (คงค่าที่เลือกไว้ตาม ID)"""
+        if hasattr(self, 'group_select_items'):
+            self.group_select_items = [(g['name'], g['id']) for g in self.ALL_DATA['groups']]
+        for attr_name, key, display_key in (('day_id', 'days', 'name'), ('month_id', 'months', 'name'),
+                                            ('animal_id', 'animals', 'thai_name'), ('sign_id', 'signs', 'name')):
+            if hasattr(self, f'{attr_name}_items'):
+                setattr(self, f'{attr_name}_items', [(item[display_key], item['id']) for item in self.ALL_DATA[key]])
+        self._rebuild_facet_candidates()
+        self.update_facet_counts()
+
+    def refresh_results(self):
+        """แสดงผลลัพธ์ใหม่ตามการค้นหาล่าสุด (ค้นหาซ้ำด้วยเงื่อนไขเดิม หรือคงรายการหินเดิมตาม ID)"""
+        if self.last_search_mode and self.last_search_mode == self.current_mode.get():
+            self.filter_data(self.last_search_mode, keep_page=True)
+            return
+        if self.last_search_mode is None:
+            self.filtered_stones = self.all_stones.copy()
+            self.unlucky_notes = {}
+        else:
+            # เปลี่ยนโหมดไปแล้ว (ช่องค้นหาถูกเคลียร์): คงหินที่แสดงอยู่โดยใช้ข้อมูลใหม่
+            shown_ids = {s['id'] for s in self.filtered_stones}
+            self.filtered_stones = [s for s in self.all_stones if s['id'] in shown_ids]
+        self.current_page = self._clamp_page(self.current_page)
+        self.render_stone_table()
+
+    def show_all_stones(self):
+        """แสดงหินทั้งหมดตั้งแต่หน้าแรก (หลัง CRUD หรือการค้นหาผิดพลาด)"""
+        self.filtered_stones = self.all_stones.copy()
+        self.unlucky_notes = {}
+        self.last_search_mode = None
+        self.current_page = 1
+        self.render_stone_table()
+
+    def _clamp_page(self, page: int) -> int:
+        total_pages = max(1, math.ceil(len(self.filtered_stones) / self.rows_per_page))
+        return min(max(page, 1), total_pages)
 
     # =======================================================
     # 4. TABLE RENDER AND PAGINATION
     # =======================================================
 
+    @timed('render.table')
     def render_stone_table(self):
         """ล้างตารางและแสดงข้อมูลหินสำหรับหน้าปัจจุบัน (ปรับปรุงคอลัมน์)"""
         
@@ -1432,39 +1611,131 @@ class PyStoneApp(tk.Tk):
         for i, stone in enumerate(page_stones):
             idx = start_index + i + 1
             
-            # --- Data Lookup ---
-            
-            # FIX: ต้องเรียกใช้ format_lookup_list ที่ถูกย้ายไปด้านนอกแล้ว
-            color_names = format_lookup_list(stone.get('color_ids', ''), self.ALL_DATA['colors'], 'name')
-            day_names = format_lookup_list(stone.get('good_days', ''), self.ALL_DATA['days'], 'name')
-            
-            # NEW COLUMNS DATA
-            chakra_names = format_lookup_list(stone.get('chakra_ids', ''), self.ALL_DATA.get('chakra', []), 'name_th')
-            # **** FIX: ใช้คีย์ 'element' (ไม่มี s) ****
-            element_names = format_lookup_list(stone.get('element_ids', ''), self.ALL_DATA.get('element', []), 'name_th')
-            numerology_values = format_lookup_list(stone.get('numerology_ids', ''), self.ALL_DATA.get('numerology', []), 'number_value')
-            
-            # จัดรูปแบบชื่อหิน
-            name_display = f"{stone['thai_name']} ({stone['english_name']})"
-            if stone.get('other_names'):
-                name_display += f" | {stone['other_names'][:30]}..." if len(stone['other_names']) > 30 else f" | {stone['other_names']}"
-            
-            # Column Numerology + Unlucky Note
-            numerology_display = numerology_values
-            
-            # Col 8: Actions - FIX: แสดงเป็นปุ่มเดียวตามที่ขอ
-            actions_display = "[ จัดการ ]"
+            # --- Data Lookup (ใช้ Cache ที่เตรียมไว้ล่วงหน้าหากมี) ---
+            row_values = self.get_stone_row(stone)
             
             # --- Row Data and Tagging ---
-            tag = 'unlucky' if stone.get('is_unlucky') else ('odd' if idx % 2 != 0 else 'normal')
+            tag = 'unlucky' if stone['id'] in self.unlucky_notes else ('odd' if idx % 2 != 0 else 'normal')
             
             self.tree.insert('', 'end', 
-                             values=(idx, name_display, color_names, day_names, 
-                                     chakra_names, element_names, numerology_display, actions_display), 
+                             values=(idx, *row_values), 
                              tags=(tag,),
                              iid=stone['id']) 
             
         self.update_pagination_controls(total_pages, total_rows)
+        self.schedule_detail_prewarm(page_stones)
+        self.schedule_row_prefetch()
+
+
+    def format_stone_row(self, stone: Dict[str, Any]) -> tuple:
+        """จัดรูปแบบค่าคอลัมน์ของหินหนึ่งแถว (ไม่รวมลำดับและ Tag ซึ่งขึ้นกับหน้า/ผลค้นหา)"""
+        
+        # FIX: ต้องเรียกใช้ format_lookup_list ที่ถูกย้ายไปด้านนอกแล้ว
+        color_names = format_lookup_list(stone.get('color_ids', ''), self.ALL_DATA['colors'], 'name')
+        day_names = format_lookup_list(stone.get('good_days', ''), self.ALL_DATA['days'], 'name')
+        
+        # NEW COLUMNS DATA
+        chakra_names = format_lookup_list(stone.get('chakra_ids', ''), self.ALL_DATA.get('chakra', []), 'name_th')
+        # **** FIX: ใช้คีย์ 'element' (ไม่มี s) ****
+        element_names = format_lookup_list(stone.get('element_ids', ''), self.ALL_DATA.get('element', []), 'name_th')
+        numerology_values = format_lookup_list(stone.get('numerology_ids', ''), self.ALL_DATA.get('numerology', []), 'number_value')
+        
+        # จัดรูปแบบชื่อหิน
+        name_display = f"{stone['thai_name']} ({stone['english_name']})"
+        if stone.get('other_names'):
+            name_display += f" | {stone['other_names'][:30]}..." if len(stone['other_names']) > 30 else f" | {stone['other_names']}"
+        
+        # Col 8: Actions - FIX: แสดงเป็นปุ่มเดียวตามที่ขอ
+        actions_display = "[ จัดการ ]"
+        
+        return (name_display, color_names, day_names, chakra_names, element_names, numerology_values, actions_display)
+
+
+    def get_stone_row(self, stone: Dict[str, Any]) -> tuple:
+        """คืนค่าคอลัมน์ของหินจาก Row Cache (จัดรูปแบบใหม่เฉพาะเมื่อยังไม่มี)"""
+        row_values = self._current_row_cache().get(stone['id'])
+        if row_values is None:
+            row_values = self.format_stone_row(stone)
+            self.row_cache[stone['id']] = row_values
+        return row_values
+
+    def _current_row_cache(self) -> Dict[int, tuple]:
+        """Row Cache ของแคตตาล็อกและ version ปัจจุบัน (ล้างเมื่อข้อมูลหรือ Lookup เปลี่ยน)"""
+        cache_key = (id(self.catalog), self.catalog.version)
+        if self._row_cache_key != cache_key:
+            self.row_cache.clear()
+            self._row_cache_key = cache_key
+        return self.row_cache
+
+
+    def schedule_row_prefetch(self):
+        """เตรียมแถวของหน้าถัดไปและหน้าก่อนหน้าไว้ใน Cache เมื่อ Event Loop ว่าง"""
+        if self._row_prefetch_after_id is not None:
+            self.after_cancel(self._row_prefetch_after_id)
+            self._row_prefetch_after_id = None
+        
+        pending = []
+        for page in (self.current_page + 1, self.current_page - 1):
+            if page < 1:
+                continue
+            start_index = (page - 1) * self.rows_per_page
+            pending.extend(self.filtered_stones[start_index:start_index + self.rows_per_page])
+        
+        row_cache = self._current_row_cache()
+        pending = [s for s in pending if s['id'] not in row_cache]
+        if pending:
+            self._row_prefetch_after_id = self.after_idle(self._prefetch_rows, pending)
+
+    def _prefetch_rows(self, pending: List[Dict[str, Any]]):
+        """จัดรูปแบบแถวทีละชุดเล็ก ๆ ต่อ Idle Callback เพื่อไม่ให้ UI ค้าง"""
+        self._row_prefetch_after_id = None
+        batch, rest = pending[:10], pending[10:]
+        for stone in batch:
+            self.get_stone_row(stone)
+        if rest:
+            self._row_prefetch_after_id = self.after_idle(self._prefetch_rows, rest)
+
+
+    def set_page_size(self, value: Union[int, str]):
+        """เปลี่ยนจำนวนแถวต่อหน้า โดยยังคงแสดงแถวแรกของหน้าปัจจุบันอยู่ในหน้าใหม่"""
+        self.auto_page_size = value == PAGE_SIZE_AUTO
+        if self.auto_page_size:
+            new_size = self._fit_rows_to_height()
+        else:
+            new_size = int(value)
+        self._apply_page_size(new_size)
+
+    def _apply_page_size(self, new_size: int):
+        new_size = max(1, new_size)
+        if new_size == self.rows_per_page:
+            return
+        first_row = (self.current_page - 1) * self.rows_per_page
+        self.rows_per_page = new_size
+        self.current_page = first_row // new_size + 1
+        if self.data_loaded: # ระหว่าง Fast Start ตารางจะถูกวาดเมื่อโหลดข้อมูลเสร็จ
+            self.render_stone_table()
+
+    def _fit_rows_to_height(self) -> int:
+        """คำนวณจำนวนแถวที่พอดีกับความสูงของตารางปัจจุบัน"""
+        tree_height = self.tree.winfo_height()
+        if tree_height <= 1: # ยังไม่ถูกวาดบนหน้าจอ
+            return self.rows_per_page
+        row_height = int(self.style.lookup('Treeview', 'rowheight') or 20)
+        heading_height = row_height + 5
+        return max(1, (tree_height - heading_height) // row_height)
+
+    def schedule_auto_fit(self):
+        """รอให้การปรับขนาดหน้าต่างนิ่งก่อน แล้วจึงคำนวณจำนวนแถวใหม่"""
+        if not self.auto_page_size:
+            return
+        if self._auto_fit_after_id is not None:
+            self.after_cancel(self._auto_fit_after_id)
+        self._auto_fit_after_id = self.after(150, self._auto_fit_page_size)
+
+    def _auto_fit_page_size(self):
+        self._auto_fit_after_id = None
+        if self.auto_page_size:
+            self._apply_page_size(self._fit_rows_to_height())
 
 
     def update_pagination_controls(self, total_pages: int, total_rows: int):
@@ -1544,6 +1815,56 @@ class PyStoneApp(tk.Tk):
 
         ttk.Button(popup, text="ยกเลิก", command=popup.destroy).pack(pady=5)
 
+    def export_search_results(self):
+        """ส่งออกผลการค้นหาปัจจุบันทั้งหมด (ไม่ใช่เฉพาะหน้านี้) เป็น CSV/JSONL/XLSX บน Worker Thread"""
+        if not self.filtered_stones:
+            messagebox.showwarning("Export", "ไม่มีผลการค้นหาให้ส่งออก")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension='.csv',
+            initialfile='pystone_results.csv',
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl"), ("Excel files", "*.xlsx")]
+        )
+        if not file_path:
+            return
+        
+        job = BulkExportJob(self.filtered_stones, self.ALL_DATA, file_path, unlucky_notes=self.unlucky_notes,
+                            columns=self.catalog.columns)
+        
+        # หน้าต่างความคืบหน้า (ไม่ grab_set เพื่อให้ใช้งานหน้าหลักต่อได้)
+        progress_window = tk.Toplevel(self)
+        progress_window.title("กำลังส่งออก...")
+        progress_window.transient(self)
+        progress_window.resizable(False, False)
+        progress_window.protocol("WM_DELETE_WINDOW", job.cancel)
+        
+        label = ttk.Label(progress_window, text=f"ส่งออกแล้ว 0/{job.total} รายการ")
+        label.pack(padx=15, pady=(15, 5))
+        bar = ttk.Progressbar(progress_window, length=320, maximum=max(job.total, 1))
+        bar.pack(padx=15, pady=5)
+        ttk.Button(progress_window, text="ยกเลิก", command=job.cancel).pack(pady=(5, 15))
+        
+        job.start()
+        self._poll_export_job(job, progress_window, bar, label)
+
+    def _poll_export_job(self, job: BulkExportJob, progress_window: tk.Toplevel, bar: ttk.Progressbar, label: ttk.Label):
+        """อ่านความคืบหน้าจาก Worker Thread บน Main Thread ทุก 100ms"""
+        bar['value'] = job.done_count
+        label.config(text=f"ส่งออกแล้ว {job.done_count}/{job.total} รายการ")
+        
+        if not job.finished:
+            self.after(100, self._poll_export_job, job, progress_window, bar, label)
+            return
+        
+        progress_window.destroy()
+        if job.error:
+            messagebox.showerror("Export Error", f"ไม่สามารถส่งออกได้: {job.error}")
+        elif job.cancelled:
+            messagebox.showinfo("Export", "ยกเลิกการส่งออกแล้ว")
+        else:
+            messagebox.showinfo("Export Success", f"ส่งออก {job.total} รายการไปยัง {os.path.basename(job.file_path)} เรียบร้อยแล้ว")
+
     def search_external(self, stone: Dict[str, Any], platform: str):
         """ค้นหารูปภาพภายนอกโดยเปิด Tab ใหม่ในเบราว์เซอร์ (เน้นสร้อยข้อมือ)"""
         # FIX: เน้นคำค้นหา
@@ -1556,6 +1877,124 @@ class PyStoneApp(tk.Tk):
         webbrowser.open_new_tab(url)
 
 
+    # =======================================================
+    # 5.5 DETAIL CACHE (จัดรูปแบบรายละเอียดล่วงหน้าระหว่าง Idle)
+    # =======================================================
+
+    def get_stone_detail(self, stone: Dict[str, Any]) -> List[Segment]:
+        """คืนรายละเอียดหิน (Segments) จาก Cache ของแคตตาล็อก (ตาม stone id และ catalog.version)"""
+        return self.catalog.detail(stone)
+
+    def schedule_detail_prewarm(self, page_stones: List[Dict[str, Any]]):
+        """ตั้งเวลาจัดรูปแบบรายละเอียดของหินในหน้าปัจจุบันล่วงหน้าเมื่อ Event Loop ว่าง"""
+        if self._prewarm_after_id is not None:
+            self.after_cancel(self._prewarm_after_id)
+            self._prewarm_after_id = None
+        
+        pending = [s for s in page_stones if not self.catalog.has_detail(s['id'])]
+        if pending:
+            self._prewarm_after_id = self.after_idle(self._prewarm_next_detail, pending)
+
+    def _prewarm_next_detail(self, pending: List[Dict[str, Any]]):
+        """จัดรูปแบบทีละหนึ่งรายการต่อ Idle Callback เพื่อไม่ให้ UI ค้าง"""
+        self._prewarm_after_id = None
+        if not pending:
+            return
+        try:
+            self.get_stone_detail(pending[0])
+        except TemplateError:
+            return # แจ้ง Error เมื่อผู้ใช้เปิดดูรายละเอียดจริง
+        if len(pending) > 1:
+            self._prewarm_after_id = self.after_idle(self._prewarm_next_detail, pending[1:])
+
+    # =======================================================
+    # 5.6 DIAGNOSTICS (เวลาการทำงานจริงบนเครื่องผู้ใช้: Ctrl+Shift+D)
+    # =======================================================
+
+    def show_diagnostics_window(self):
+        """แสดง Histogram เวลาของแต่ละ operation (pystone_engine.timing), Profile ที่เก็บได้ (ถ้ามี) และขนาดหน่วยความจำ"""
+        window = tk.Toplevel(self)
+        window.title("Diagnostics: เวลาการทำงาน")
+        window.geometry("820x560")
+        window.transient(self)
+
+        columns = ('operation', 'count', 'mean', 'p50', 'p95', 'max', 'total')
+        headings = ('Operation', 'ครั้ง', 'เฉลี่ย (ms)', 'p50 (ms)', 'p95 (ms)', 'สูงสุด (ms)', 'รวม (ms)')
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=12)
+        for col, heading in zip(columns, headings):
+            tree.heading(col, text=heading)
+            tree.column(col, width=180 if col == 'operation' else 95, anchor='w' if col == 'operation' else 'e')
+        tree.pack(fill='both', expand=True, padx=10, pady=(10, 5))
+
+        profile_text = tk.Text(window, wrap='none', height=12, font=('Courier', 9))
+        profile_text.pack(fill='both', expand=True, padx=10, pady=5)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            snapshot = timing_snapshot()
+            for name, stats in snapshot.items():
+                tree.insert('', 'end', values=(name, stats['count'], f"{stats['mean_ms']:.2f}", f"{stats['p50_ms']:.2f}",
+                                               f"{stats['p95_ms']:.2f}", f"{stats['max_ms']:.2f}", f"{stats['total_ms']:.1f}"))
+            profile = last_profile()
+            if profile:
+                text = f"Profile: {profile['name']} ({profile['ms']:.1f} ms) -> {profile['path'] or 'เขียนไฟล์ไม่ได้'}\n\n{profile['text']}"
+            else:
+                text = "ยังไม่มี Profile (ตั้ง PYSTONE_PROFILE=<operation> เช่น filter.date ก่อนเปิดโปรแกรม)"
+            profile_text.config(state='normal')
+            profile_text.delete('1.0', 'end')
+            profile_text.insert('1.0', text)
+            profile_text.config(state='disabled')
+
+        def show_memory():
+            # ขนาดข้อมูล, Index และ Cache ในหน่วยความจำ (แสดงแทนที่ช่อง Profile)
+            extra = {'row_cache': self.row_cache, 'detail_cache': self.catalog._detail_cache}
+            if self.data_loaded:
+                extra['stone_index'] = self.stone_index
+            if self.catalog._columns is not None:
+                extra['columns'] = self.catalog._columns
+            text = format_memory_report(memory_report(self.ALL_DATA, extra))
+            allocations = top_allocations()
+            if allocations:
+                text += "\n\ntracemalloc (บรรทัดที่จองหน่วยความจำมากที่สุด):\n" + "\n".join(allocations)
+            profile_text.config(state='normal')
+            profile_text.delete('1.0', 'end')
+            profile_text.insert('1.0', text)
+            profile_text.config(state='disabled')
+
+        def copy_json():
+            self.clipboard_clear()
+            self.clipboard_append(json.dumps(timing_snapshot(), ensure_ascii=False, indent=2))
+
+        def toggle_trace():
+            # Trace Event สำหรับ chrome://tracing / Perfetto: เริ่มเก็บ หรือหยุดแล้วบันทึกเป็นไฟล์
+            if not is_tracing():
+                start_trace()
+                trace_button.config(text="หยุด Trace และบันทึก...")
+                return
+            file_path = filedialog.asksaveasfilename(parent=window, defaultextension='.json',
+                                                     initialfile='pystone_trace.json', filetypes=[("Trace JSON", "*.json")])
+            if not file_path:
+                return
+            try:
+                count = stop_trace(file_path)
+            except OSError as e:
+                messagebox.showerror("Trace", f"ไม่สามารถบันทึกไฟล์ได้: {e}", parent=window)
+                return
+            trace_button.config(text="เริ่ม Trace")
+            messagebox.showinfo("Trace", f"บันทึก {count} Span ไปยัง {os.path.basename(file_path)} แล้ว", parent=window)
+
+        control_frame = ttk.Frame(window, padding="10 0 10 10")
+        control_frame.pack(fill='x')
+        ttk.Button(control_frame, text="รีเฟรช", command=refresh).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="ล้างค่า", command=lambda: [reset_timings(), refresh()]).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="คัดลอก (JSON)", command=copy_json).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="หน่วยความจำ", command=show_memory).pack(side='left', padx=5)
+        trace_button = ttk.Button(control_frame, text="หยุด Trace และบันทึก..." if is_tracing() else "เริ่ม Trace",
+                                  command=toggle_trace)
+        trace_button.pack(side='left', padx=5)
+        ttk.Button(control_frame, text="ปิด", command=window.destroy).pack(side='right', padx=5)
+        refresh()
+
     # =======================================================
     # 6. MODALS and CRUD PLACEHOLDERS 
     # =======================================================
@@ -1576,6 +2015,13 @@ class PyStoneApp(tk.Tk):
     def show_detail_popup(self, stone: Dict[str, Any]):
         """แสดงรายละเอียดหินแบบ Pop-up/Modal พร้อมปุ่ม Export"""
         
+        # Format Detail Text (ใช้ Cache หากเคยจัดรูปแบบไว้แล้ว)
+        try:
+            segments = self.get_stone_detail(stone)
+        except TemplateError as e:
+            messagebox.showerror("Template Error", f"Template รายงานไม่ถูกต้อง: {e}")
+            return
+
         detail_window = tk.Toplevel(self)
         detail_window.title(f"รายละเอียด: {stone['thai_name']}")
         detail_window.geometry("850x700") # ขยายกรอบให้ใหญ่ขึ้น
@@ -1597,10 +2043,7 @@ class PyStoneApp(tk.Tk):
         # 1. ตั้งค่า Tags สำหรับ Styling
         self._setup_text_tags(text_widget)
 
-        # Format Detail Text
-        raw_content = self.format_stone_detail(stone)
-        text_widget.insert('1.0', raw_content)
-        self._apply_text_formatting(text_widget)
+        self._insert_segments(text_widget, segments)
         
         text_widget.config(state='disabled')  # Read-only
 
@@ -1613,12 +2056,12 @@ class PyStoneApp(tk.Tk):
         # Export Buttons
         ttk.Button(control_frame, 
                    text="Export (.txt)", 
-                   command=lambda: export_to_file(raw_content, filename_base, 'text'),
+                   command=lambda: export_to_file(segments, filename_base, 'text'),
                    style='SearchButton.TButton').pack(side='left', padx=5)
         
         ttk.Button(control_frame, 
                    text="Export (.pdf)", 
-                   command=lambda: export_to_file(raw_content, filename_base, 'pdf'),
+                   command=lambda: export_to_file(segments, filename_base, 'pdf'),
                    style='SearchButton.TButton').pack(side='left', padx=5)
         
         ttk.Button(control_frame, text="ปิด", command=detail_window.destroy).pack(side='right', padx=5)
@@ -1626,115 +2069,23 @@ class PyStoneApp(tk.Tk):
 
 # ... (ในคลาส PyStoneApp) ...
 
-    def format_stone_detail(self, stone: Dict[str, Any]) -> str:
-        """
-        จัดรูปแบบข้อความสำหรับแสดงรายละเอียดหิน โดยมีส่วนขยาย Chakra/Element/Numerology
-        """
-        def format_lookup_list_local(ids_str, lookup_data, display_key):
-            ids = split_ids(ids_str)
-            names = [lookup_name(lookup_data, id, display_key) for id in ids]
-            return ', '.join(names) if names else '-'
-
-        lines = [
-            f"### รายละเอียดหิน: {stone['thai_name']} ({stone['english_name']})",
-            f"ชื่ออื่น ๆ: {stone.get('other_names', '-')}",
-            
-            "\n### 1. ข้อมูลทั่วไป (และมงคลพื้นฐาน)",
-            "----------------------------------------------",
-            f"คำอธิบายโดยย่อ: {stone.get('description', '-')[:200]}...",
-            
-            # **** FIX: นำข้อมูลมงคลพื้นฐานกลับมาครบถ้วน ****
-            f"**กลุ่มมงคล:** {format_lookup_list_local(stone.get('group_ids', ''), self.ALL_DATA['groups'], 'name')}",
-            f"**สีหลัก:** {format_lookup_list_local(stone.get('color_ids', ''), self.ALL_DATA['colors'], 'name')}",
-            f"**วันมงคล:** {format_lookup_list_local(stone.get('good_days', ''), self.ALL_DATA['days'], 'name')}",
-            f"**เดือนมงคล:** {format_lookup_list_local(stone.get('good_months', ''), self.ALL_DATA['months'], 'name')}",
-            f"**ปีนักษัตรมงคล:** {format_lookup_list_local(stone.get('good_zodiac_animals', ''), self.ALL_DATA['animals'], 'thai_name')}",
-            f"**ราศีมงคล:** {format_lookup_list_local(stone.get('good_zodiac_signs', ''), self.ALL_DATA['signs'], 'name')}",
-            
-        ]
-        
-        # ----------------------------------------------------
-        # NEW EXPANDED SECTIONS (CHAKRA, ELEMENT, NUMEROLOGY)
-        # ----------------------------------------------------
-        
-        # --- CHAKRA ---
-        chakra_ids = split_ids(stone.get('chakra_ids', ''))
-        if chakra_ids:
-            lines.append("\n### 2. ความเชื่อมโยงกับจักระ")
-            lines.append("----------------------------------------------")
-            chakra_lookup = self.ALL_DATA.get('chakra', [])
-            
-            for ch_id in chakra_ids:
-                item = next((c for c in chakra_lookup if c['id'] == ch_id), None)
-                if item:
-                    # FIX: ใช้ชื่อจักระที่ถูกต้องในการนำเสนอ
-                    name_th = item.get('name_th', 'N/A').split('ธาตุ: ')[0].strip() # แยกส่วน 'ธาตุ' ออก
-                    lines.append(f"--- จักระ: {name_th} ---")
-                    lines.append(f" - **ตำแหน่ง:** {item.get('location', '-')}")
-                    lines.append(f" - **ความหมายหลัก:** {item.get('auspice_detail_th', 'N/A')}")
-                    lines.append(f" - สี: {item.get('color', '-')}")
-                else:
-                    lines.append(f"--- จักระ ID {ch_id} (ไม่พบรายละเอียด) ---")
-
-        # --- ELEMENT ---
-        element_ids = split_ids(stone.get('element_ids', ''))
-        if element_ids:
-            lines.append("\n### 3. ความเชื่อมโยงกับธาตุ (五行)")
-            lines.append("----------------------------------------------")
-            element_lookup = self.ALL_DATA.get('element', []) # Use 'element' (no s)
-            
-            for el_id in element_ids:
-                item = next((e for e in element_lookup if e['id'] == el_id), None)
-                if item:
-                    name_th = item.get('name_th', 'N/A')
-                    lines.append(f"--- ธาตุ: {name_th} ---")
-                    lines.append(f" - **คำจำกัดความ:** {item.get('description', '-')}")
-                    lines.append(f" - **ความหมายมงคล:** {item.get('auspice_detail_th', 'N/A')}")
-                    lines.append(f" - วัฏจักรส่งเสริม: {name_th} สร้าง {self._get_next_element_name(name_th)}")
-                else:
-                    lines.append(f"--- ธาตุ ID {el_id} (ไม่พบรายละเอียด) ---")
-
-        # --- NUMEROLOGY ---
-        numerology_ids = split_ids(stone.get('numerology_ids', ''))
-        if numerology_ids:
-            lines.append("\n### 4. ความเชื่อมโยงกับเลขมงคล (เลขศาสตร์)")
-            lines.append("----------------------------------------------")
-            numerology_lookup = self.ALL_DATA.get('numerology', [])
-            
-            # Sort by number value
-            sorted_numbers = sorted(
-                [item for item in numerology_lookup if item.get('id') in numerology_ids],
-                key=lambda x: x.get('number_value', 99)
-            )
-            
-            for item in sorted_numbers:
-                number = item.get('number_value', 'N/A')
-                lines.append(f"--- เลข: {number} ---")
-                lines.append(f" - **ความหมาย:** {item.get('auspice_detail_th', 'N/A')}")
-
-
-        # --- FULL DESCRIPTION (at the end for reference) ---
-        lines.append("\n### 5. คำอธิบายฉบับเต็ม")
-        lines.append("----------------------------------------------")
-        lines.append(f"{stone.get('description', '-')}")
-        
-        return '\n'.join(lines)
+    def format_stone_detail(self, stone: Dict[str, Any]) -> List[Segment]:
+        """จัดรูปแบบรายละเอียดหินเป็น Segments (ดู pystone_engine.formatting)"""
+        return format_stone_detail(stone, self.ALL_DATA)
 
     def delete_stone(self, stone: Dict[str, Any]):
         """ยืนยันการลบข้อมูลหิน (Placeholder)"""
         if messagebox.askyesno("ยืนยันการลบ", f"คุณต้องการลบหิน '{stone['thai_name']}' ใช่หรือไม่?"):
-            # 1. ลบจาก List หลัก
-            self.all_stones.remove(stone)
-            
-            # 2. บันทึกกลับไปที่ JSON
-            if save_stones_to_json(self.all_stones):
-                messagebox.showinfo("ลบข้อมูล", f"ลบหิน {stone['thai_name']} เรียบร้อยแล้ว")
-                
-                # 3. อัปเดตหน้าจอหลัก
-                self.filtered_stones = self.all_stones.copy()
-                self.render_stone_table() 
-            else:
+            # 1. ลบเฉพาะหินนี้ออกจาก JSON (ไม่ลบหากผู้อื่นแก้ไขหินนี้หลังจากที่เราโหลด)
+            result = self.save_records('stones', [record_change(stone, None)])
+            if result is None:
                  messagebox.showerror("ลบไม่สำเร็จ", "การบันทึกไฟล์ JSON ล้มเหลวหลังการลบ")
+                 return
+            if not result['conflicts']:
+                messagebox.showinfo("ลบข้อมูล", f"ลบหิน {stone['thai_name']} เรียบร้อยแล้ว")
+            
+            # 2. อัปเดตหน้าจอหลัก
+            self.show_all_stones()
 
     def open_lookup_crud_modal(self, key: str):
         """
@@ -1823,6 +2174,13 @@ class PyStoneApp(tk.Tk):
         แสดง Pop-up รายละเอียดเชิงประวัติศาสตร์และความมงคลแบบอ่านอย่างเดียว
         พร้อมปุ่ม "จัดการข้อมูล" (CRUD Admin)
         """
+        lookup_data = self.ALL_DATA.get(key, [])
+        try:
+            segments = self._format_detail_view(key, lookup_data) # ดึงเนื้อหาพร้อม Tag
+        except TemplateError as e:
+            messagebox.showerror("Template Error", f"Template รายงานไม่ถูกต้อง: {e}")
+            return
+
         detail_window = tk.Toplevel(self)
         lookup_name_map = {
             'chakra': 'จักระ', 
@@ -1851,12 +2209,9 @@ class PyStoneApp(tk.Tk):
         # 1. ตั้งค่า Tags สำหรับ Styling
         self._setup_text_tags(text_widget)
         
-        lookup_data = self.ALL_DATA.get(key, [])
-        raw_content = self._format_detail_view(key, lookup_data) # ดึงเนื้อหาที่มี Marker
 
-        # 2. ใส่เนื้อหาและประยุกต์ใช้ Tags
-        text_widget.insert('1.0', raw_content)
-        self._apply_text_formatting(text_widget) # ไฮไลต์ตาม Marker ที่กำหนด
+        # 2. ใส่เนื้อหาพร้อม Tags ในครั้งเดียว
+        self._insert_segments(text_widget, segments)
         
         text_widget.config(state='disabled')
         
@@ -1869,12 +2224,12 @@ class PyStoneApp(tk.Tk):
         # Export Buttons
         ttk.Button(control_frame, 
                    text="Export (.txt)", 
-                   command=lambda: export_to_file(raw_content, filename_base, 'text'),
+                   command=lambda: export_to_file(segments, filename_base, 'text'),
                    style='SearchButton.TButton').pack(side='left', padx=5)
         
         ttk.Button(control_frame, 
                    text="Export (.pdf)", 
-                   command=lambda: export_to_file(raw_content, filename_base, 'pdf'),
+                   command=lambda: export_to_file(segments, filename_base, 'pdf'),
                    style='SearchButton.TButton').pack(side='left', padx=5)
 
         # ปุ่ม Admin (เข้าสู่โหมด CRUD)
@@ -1905,152 +2260,34 @@ class PyStoneApp(tk.Tk):
         text_widget.tag_configure('bold', font=('Tahoma', 11, 'bold'))
 
 
-    def _apply_text_formatting(self, text_widget: tk.Text):
-        """ใช้การค้นหาข้อความ (Marker) เพื่อประยุกต์ใช้ Tags"""
-        
-        text_content = text_widget.get("1.0", tk.END)
-        
-        # 1. Apply Header (บรรทัดแรก)
-        text_widget.tag_add('header', "1.0", "1.end")
-
-        # 2. Apply SubHeaders (### 1. ประวัติ... / ### 2. รายละเอียด...)
-        start_index = "2.0" # เริ่มตั้งแต่บรรทัดที่ 2
-        while True:
-            # ค้นหาหัวข้อที่เริ่มต้นด้วย '###'
-            idx = text_widget.search("###", start_index, stopindex=tk.END)
-            if not idx: break
-            
-            line_end = text_widget.search('\n', idx, stopindex=tk.END)
-            if not line_end: line_end = tk.END
-            
-            text_widget.tag_add('subheader', idx, f"{line_end}-1c")
-            start_index = line_end # เริ่มค้นหาจากบรรทัดถัดไป
-
-        # 3. Apply Titles (--- ชื่อรายการ ---)
-        start_index = "1.0"
-        while True:
-            # ค้นหาหัวข้อที่เริ่มต้นด้วย '---'
-            idx = text_widget.search("---", start_index, stopindex=tk.END)
-            if not idx: break
-            
-            line_end = text_widget.search('\n', idx, stopindex=tk.END)
-            if not line_end: line_end = tk.END
-            
-            # ตรวจสอบว่าบรรทัดนั้นมีคำว่า "---" อยู่
-            if text_widget.get(idx, line_end).strip().startswith("---"):
-                text_widget.tag_add('title', idx, f"{line_end}-1c")
-            
-            start_index = line_end # เริ่มค้นหาจากบรรทัดถัดไป
-            
-        # 4. Apply Key Details (เช่น **1. ประวัติ:**)
-        start_index = "1.0"
-        while True:
-            # ค้นหาหัวข้อที่เริ่มต้นด้วย '**1. ประวัติ:**' หรือ '**2. รายละเอียด:**'
-            idx = text_widget.search("**1. ประวัติ", start_index, stopindex=tk.END)
-            if not idx: idx = text_widget.search("**2. รายละเอียด", start_index, stopindex=tk.END)
-            if not idx: break
-
-            line_end = text_widget.search('\n', idx, stopindex=tk.END)
-            if not line_end: line_end = tk.END
-            
-            # เน้นแค่ส่วนหัวข้อ
-            text_widget.tag_add('key_detail', idx, f"{line_end}-1c")
-            start_index = line_end
+    def _insert_segments(self, text_widget: tk.Text, segments: List[Segment]):
+        """ใส่ Segment Stream ลงใน Text Widget ด้วยการเรียก insert ครั้งเดียว (ข้อความ, tag สลับกัน)"""
+        args = []
+        for text, tag in segments:
+            args.append(text)
+            args.append((tag,) if tag else ())
+        if args:
+            text_widget.insert('1.0', *args)
 
 
     def _get_next_element_name(self, current_name: str) -> str:
-        """Helper function สำหรับแสดงวัฏจักรส่งเสริม (ใช้ชื่อธาตุในการคำนวณ)"""
-        
-        # ลำดับการส่งเสริม (相生 - Shēng) ตามหลักปรัชญาจีน: ไม้ -> ไฟ -> ดิน -> ทอง/โลหะ -> น้ำ -> ไม้
-        relationship = {
-            "ไม้": "ไฟ",
-            "ไฟ": "ดิน", 
-            "ดิน": "ทอง/โลหะ",
-            "ทอง/โลหะ": "น้ำ",
-            "น้ำ": "ไม้"
-        }
-        
-        # ค้นหาธาตุที่ถูกสร้างโดยธาตุปัจจุบัน
-        return relationship.get(current_name, 'N/A')
+        """Helper function สำหรับแสดงวัฏจักรส่งเสริม (ดู get_next_element_name)"""
+        return get_next_element_name(current_name)
 
     
-    def _format_detail_view(self, key: str, lookup_data: List[Dict[str, Any]]) -> str:
+    def _format_detail_view(self, key: str, lookup_data: List[Dict[str, Any]]) -> List[Segment]:
         """
-        Helper function สำหรับจัดรูปแบบข้อมูลทั้งหมด (ประวัติ + รายละเอียดมงคล) 
-        ตามโครงสร้างเฉพาะของแต่ละ Lookup (จักระ, ธาตุ, เลขมงคล)
+        Helper function สำหรับจัดรูปแบบข้อมูลทั้งหมด (ประวัติ + รายละเอียดมงคล) เป็น Segments
+        ตามโครงสร้างเฉพาะของแต่ละ Lookup (จักระ, ธาตุ, เลขมงคล) ดู format_lookup_detail
         """
-        detail = ""
-        
-        # --- 1. Header ---
-        header_map = {'chakra': '🧘‍♂️ 7 จักระ (Chakra)', 'element': '🌟 5 ธาตุ (Wǔxíng)', 'numerology': '🔢 เลขศาสตร์ (Numerology)'}
-        display_name = header_map.get(key, 'รายละเอียด')
-        detail += f"### {display_name}\n\n"
-        
-        if not lookup_data:
-             return detail + "❌ ไม่พบข้อมูลในไฟล์ JSON"
-
-        # --- 2. จัดรูปแบบเฉพาะสำหรับแต่ละ Key ---
-        
-        if key == 'numerology':
-            detail += "### 1. ประวัติและความเป็นมา\n"
-            detail += "เลขศาสตร์มีรากฐานจากหลายอารยธรรม (เช่น พีทาโกรัส) เชื่อว่าตัวเลขแต่ละตัวมี 'ความสั่นสะเทือนทางพลังงาน' ที่ส่งผลต่อชะตาชีวิตและบุคลิกภาพของมนุษย์\n\n"
-            detail += "### 2. รายละเอียดมงคลเลข 1-9\n"
-            detail += "----------------------------------------------\n"
-            
-            sorted_data = sorted([d for d in lookup_data if d.get('number_value') in range(1, 10)], key=lambda x: x.get('number_value', 0))
-            
-            for item in sorted_data:
-                number = item.get('number_value')
-                auspice_detail = item.get('auspice_detail_th', 'N/A')
-                
-                detail += f"--- [{number}] เลข {number} ---\n"
-                detail += f" - มงคล: {auspice_detail}\n\n"
-        
-        else: # สำหรับ Chakra และ Element (ที่มีรายละเอียดประวัติแยกรายตัว)
-            
-            # กรองและจัดเรียงข้อมูล
-            sorted_data = sorted(lookup_data, key=lambda x: x.get('id', 0))
-
-            for item in sorted_data:
-                id = item.get('id')
-                name_th = item.get('name_th', '-')
-                
-                history_th = item.get('history_th', 'N/A')
-                auspice_detail = item.get('auspice_detail_th', 'N/A')
-                
-                # --- หัวข้อหลัก ---
-                detail += f"----------------------------------------------\n"
-                detail += f"--- {name_th.upper()} (ID: {id}) ---\n"
-                
-                # --- ประวัติ (เฉพาะแต่ละรายการ) ---
-                detail += "**1. ประวัติและความเป็นมา:**\n"
-                detail += f"{history_th}\n\n"
-                
-                # --- รายละเอียดมงคล ---
-                detail += "**2. รายละเอียดเชิงมงคล:**\n"
-                detail += f" - ความเชื่อหลัก: {auspice_detail}\n"
-                
-                if key == 'chakra':
-                    # แสดงรายละเอียดเฉพาะจักระ
-                    detail += f" - ตำแหน่ง: {item.get('location', '-')}\n"
-                    detail += f" - ธาตุ: {item.get('name_th', '-').split('ธาตุ: ')[-1].strip() if 'ธาตุ:' in item.get('name_th', '') else item.get('name_th', '-')}\n"
-                    detail += f" - สัญลักษณ์/โลโก้: {item.get('logo', '-')}\n"
-                    
-                if key == 'element':
-                    # แสดงรายละเอียดเฉพาะธาตุ
-                    detail += f" - คำจำกัดความ: {item.get('description', '-')}\n" 
-                    detail += f" - วัฏจักรส่งเสริม: {name_th} สร้าง {self._get_next_element_name(name_th)}\n"
-                    
-                detail += "\n"
-            
-        return detail
+        return format_lookup_detail(key, lookup_data)
 
 # =======================================================
 # 7. MAIN EXECUTION
 # =======================================================
 
 if __name__ == "__main__":
-    all_data = load_all_data()
-    if all_data:
-        app = PyStoneApp(all_data)
-        app.mainloop()
\ No newline at end of file
+    # Fast Start: แสดงหน้าต่างก่อน แล้วโหลดข้อมูลบน Background Thread (ดู PyStoneApp.start_background_load)
+    with timed('startup'):
+        app = PyStoneApp()
+    app.mainloop()
\ No newline at end of file
@@ -0,0 +1,590 @@
+import os
+import glob
+import struct
+import zlib
+import hashlib
+import unicodedata
+from typing import Dict, List, Tuple, Iterable, Optional, Any
+
+from pystone_engine.timing import timed
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+DATA_FOLDER = 'data'
+
+# ตั้งค่าฟอนต์เองได้ด้วย Environment Variable หรือวางไฟล์ .ttf ไว้ที่ data/fonts/
+PDF_FONT_ENV = 'PYSTONE_PDF_FONT'
+PDF_FONT_CANDIDATES = [
+    os.path.join(DATA_FOLDER, 'fonts', '*.ttf'),
+    '/usr/share/fonts/truetype/tlwg/Garuda.ttf',
+    '/usr/share/fonts/truetype/tlwg/Loma.ttf',
+    '/usr/share/fonts/truetype/tlwg/Sawasdee.ttf',
+    '/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf',
+    '/usr/share/fonts/noto/NotoSansThai-Regular.ttf',
+    '/usr/share/fonts/google-noto/NotoSansThai-Regular.ttf',
+    'C:\\Windows\\Fonts\\tahoma.ttf',
+    'C:\\Windows\\Fonts\\LeelawUI.ttf',
+    'C:\\Windows\\Fonts\\leelawad.ttf',
+    '/Library/Fonts/Tahoma.ttf',
+    '/System/Library/Fonts/Supplemental/Tahoma.ttf',
+]
+
+# ขนาดหน้า A4 (หน่วย point) และขอบกระดาษ
+PAGE_WIDTH = 595.28
+PAGE_HEIGHT = 841.89
+PAGE_MARGIN = 50
+LINE_SPACING = 1.45
+
+# Style ของแต่ละ Tag (ให้ตรงกับ _setup_text_tags ใน GUI): (ขนาด, สี RGB, ตัวหนา, การจัดวาง)
+TAG_STYLES = {
+    '': (10.5, (0, 0, 0), False, 'left'),
+    'header': (16, (0x2E, 0x86, 0xC1), True, 'center'),
+    'subheader': (13, (0x8E, 0x44, 0xAD), True, 'left'),
+    'title': (11, (0xD3, 0x54, 0x00), True, 'left'),
+    'key_detail': (11, (0x28, 0xB4, 0x63), True, 'left'),
+    'bold': (10.5, (0, 0, 0), True, 'left'),
+}
+FOOTER_STYLE = (8, (0x80, 0x80, 0x80), False, 'center')
+
+# สระ/วรรณยุกต์ไทยที่วางซ้อนบนตัวอักษรก่อนหน้า (ห้ามแยกบรรทัด)
+THAI_MARKS = {chr(c) for c in [0x0E31, *range(0x0E34, 0x0E3B), *range(0x0E47, 0x0E4F)]}
+# สระหน้า (เ แ โ ใ ไ) ห้ามอยู่ท้ายบรรทัด
+THAI_LEADING_VOWELS = {chr(c) for c in range(0x0E40, 0x0E45)}
+JOINERS = {'\u200d', '\ufe0f', '\ufe0e'}
+
+Segment = Tuple[str, str]
+
+# =======================================================
+# HELPER FUNCTIONS
+# =======================================================
+
+def find_thai_font(font_path: Optional[str] = None) -> str:
+    """
+    หาไฟล์ฟอนต์ TrueType ภาษาไทยในเครื่อง (ลำดับ: พารามิเตอร์ -> PYSTONE_PDF_FONT -> data/fonts -> ฟอนต์ระบบ)
+    """
+    candidates = [font_path, os.environ.get(PDF_FONT_ENV)] + PDF_FONT_CANDIDATES
+    for pattern in candidates:
+        if not pattern:
+            continue
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if os.path.isfile(path):
+                return path
+    raise FileNotFoundError(
+        f"ไม่พบฟอนต์ภาษาไทย (.ttf) สำหรับสร้าง PDF: กรุณาวางไฟล์ฟอนต์ไว้ที่ "
+        f"'{os.path.join(DATA_FOLDER, 'fonts')}' หรือกำหนด Environment Variable {PDF_FONT_ENV}"
+    )
+
+def _checksum(data: bytes) -> int:
+    data += b'\0' * (-len(data) % 4)
+    return sum(struct.unpack(f'>{len(data) // 4}I', data)) & 0xFFFFFFFF
+
+def _pdf_text_string(text: str) -> str:
+    """แปลงข้อความเป็น PDF text string แบบ UTF-16BE (รองรับภาษาไทยใน Metadata)"""
+    return '<FEFF' + text.encode('utf-16-be').hex().upper() + '>'
+
+# =======================================================
+# TRUETYPE FONT (อ่านและ Subset)
+# =======================================================
+
+class TrueTypeFont:
+    """อ่านตารางที่จำเป็นจากไฟล์ TrueType (.ttf/.ttc) และสร้างฟอนต์ Subset เฉพาะ Glyph ที่ใช้"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.path = path
+
+        offset = 0
+        if self.data[:4] == b'ttcf': # Font Collection: ใช้ฟอนต์แรก
+            offset = struct.unpack('>I', self.data[12:16])[0]
+        num_tables = struct.unpack('>H', self.data[offset + 4:offset + 6])[0]
+        self.tables = {}
+        for i in range(num_tables):
+            rec = offset + 12 + 16 * i
+            tag, _, table_offset, length = struct.unpack('>4sIII', self.data[rec:rec + 16])
+            self.tables[tag.decode('latin-1')] = (table_offset, length)
+        if 'glyf' not in self.tables or 'loca' not in self.tables:
+            raise ValueError(f"ฟอนต์ {os.path.basename(path)} ไม่ใช่ TrueType outline (glyf) ที่รองรับ")
+
+        head = self.table('head')
+        self.units_per_em = struct.unpack('>H', head[18:20])[0]
+        self.bbox = struct.unpack('>hhhh', head[36:44])
+        loca_format = struct.unpack('>h', head[50:52])[0]
+
+        hhea = self.table('hhea')
+        self.ascent, self.descent = struct.unpack('>hh', hhea[4:8])
+        num_hmetrics = struct.unpack('>H', hhea[34:36])[0]
+        self.num_glyphs = struct.unpack('>H', self.table('maxp')[4:6])[0]
+
+        hmtx = self.table('hmtx')
+        self.advances = [struct.unpack('>H', hmtx[4 * i:4 * i + 2])[0] for i in range(num_hmetrics)]
+        self.advances += [self.advances[-1]] * (self.num_glyphs - num_hmetrics)
+
+        loca = self.table('loca')
+        count = self.num_glyphs + 1
+        if loca_format == 0:
+            self.loca = [2 * v for v in struct.unpack(f'>{count}H', loca[:2 * count])]
+        else:
+            self.loca = list(struct.unpack(f'>{count}I', loca[:4 * count]))
+
+        self.cmap = self._parse_cmap()
+        self.ps_name = self._parse_ps_name()
+
+    def table(self, tag: str) -> bytes:
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def _parse_cmap(self) -> Dict[int, int]:
+        """อ่าน cmap (format 12 หรือ 4) เป็น dict: codepoint -> glyph id"""
+        cmap = self.table('cmap')
+        num_subtables = struct.unpack('>H', cmap[2:4])[0]
+        subtables = {}
+        for i in range(num_subtables):
+            platform, encoding, offset = struct.unpack('>HHI', cmap[4 + 8 * i:12 + 8 * i])
+            fmt = struct.unpack('>H', cmap[offset:offset + 2])[0]
+            subtables[(platform, encoding, fmt)] = offset
+
+        for key in ((3, 10, 12), (0, 4, 12), (0, 6, 12)):
+            if key in subtables:
+                return self._parse_cmap_format12(cmap, subtables[key])
+        for key in ((3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4)):
+            if key in subtables:
+                return self._parse_cmap_format4(cmap, subtables[key])
+        raise ValueError(f"ฟอนต์ {os.path.basename(self.path)} ไม่มีตาราง Unicode cmap ที่รองรับ")
+
+    @staticmethod
+    def _parse_cmap_format4(cmap: bytes, sub: int) -> Dict[int, int]:
+        result = {}
+        seg_count = struct.unpack('>H', cmap[sub + 6:sub + 8])[0] // 2
+        end_base = sub + 14
+        start_base = end_base + 2 * seg_count + 2
+        delta_base = start_base + 2 * seg_count
+        range_base = delta_base + 2 * seg_count
+        for i in range(seg_count):
+            end, = struct.unpack('>H', cmap[end_base + 2 * i:end_base + 2 * i + 2])
+            start, = struct.unpack('>H', cmap[start_base + 2 * i:start_base + 2 * i + 2])
+            delta, = struct.unpack('>h', cmap[delta_base + 2 * i:delta_base + 2 * i + 2])
+            range_offset, = struct.unpack('>H', cmap[range_base + 2 * i:range_base + 2 * i + 2])
+            for code in range(start, end + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offset == 0:
+                    gid = (code + delta) & 0xFFFF
+                else:
+                    addr = range_base + 2 * i + range_offset + 2 * (code - start)
+                    gid, = struct.unpack('>H', cmap[addr:addr + 2])
+                    if gid:
+                        gid = (gid + delta) & 0xFFFF
+                if gid:
+                    result[code] = gid
+        return result
+
+    @staticmethod
+    def _parse_cmap_format12(cmap: bytes, sub: int) -> Dict[int, int]:
+        result = {}
+        num_groups = struct.unpack('>I', cmap[sub + 12:sub + 16])[0]
+        for i in range(num_groups):
+            base = sub + 16 + 12 * i
+            start, end, start_gid = struct.unpack('>III', cmap[base:base + 12])
+            for code in range(start, end + 1):
+                result[code] = start_gid + (code - start)
+        return result
+
+    def _parse_ps_name(self) -> str:
+        """อ่านชื่อ PostScript (nameID 6) สำหรับใช้เป็น BaseFont"""
+        name = 'ThaiFont'
+        if 'name' in self.tables:
+            table = self.table('name')
+            count, string_offset = struct.unpack('>HH', table[2:6])
+            for i in range(count):
+                platform, _, _, name_id, length, offset = struct.unpack('>HHHHHH', table[6 + 12 * i:18 + 12 * i])
+                if name_id != 6:
+                    continue
+                raw = table[string_offset + offset:string_offset + offset + length]
+                name = raw.decode('utf-16-be' if platform in (0, 3) else 'latin-1', errors='ignore')
+                break
+        cleaned = ''.join(c for c in name if c.isalnum() or c == '-')
+        return cleaned or 'ThaiFont'
+
+    def glyph_id(self, char: str) -> int:
+        return self.cmap.get(ord(char), 0)
+
+    def advance(self, gid: int) -> int:
+        return self.advances[gid] if gid < len(self.advances) else 0
+
+    def _glyph_data(self, gid: int) -> bytes:
+        start, end = self.loca[gid], self.loca[gid + 1]
+        offset, _ = self.tables['glyf']
+        return self.data[offset + start:offset + end]
+
+    def _components(self, gid: int) -> List[int]:
+        """คืน Glyph ย่อยของ Composite Glyph (เช่น สระ + วรรณยุกต์ที่ฟอนต์ประกอบขึ้น)"""
+        data = self._glyph_data(gid)
+        if len(data) < 10 or struct.unpack('>h', data[:2])[0] >= 0:
+            return []
+        components = []
+        pos = 10
+        while True:
+            flags, component = struct.unpack('>HH', data[pos:pos + 4])
+            components.append(component)
+            pos += 4
+            pos += 4 if flags & 0x0001 else 2  # ARG_1_AND_2_ARE_WORDS
+            if flags & 0x0008:                 # WE_HAVE_A_SCALE
+                pos += 2
+            elif flags & 0x0040:               # WE_HAVE_AN_X_AND_Y_SCALE
+                pos += 4
+            elif flags & 0x0080:               # WE_HAVE_A_TWO_BY_TWO
+                pos += 8
+            if not flags & 0x0020:             # MORE_COMPONENTS
+                break
+        return components
+
+    def subset(self, gids: Iterable[int]) -> bytes:
+        """
+        สร้างไฟล์ฟอนต์ที่มีเฉพาะ Glyph ที่ใช้ (คง Glyph ID เดิมเพื่อใช้ CIDToGIDMap /Identity)
+        Glyph ที่ไม่ได้ใช้จะมีความยาว 0 ใน glyf จึงแทบไม่เพิ่มขนาดไฟล์
+        """
+        keep = {0}
+        pending = list(gids)
+        while pending:
+            gid = pending.pop()
+            if gid in keep or gid >= self.num_glyphs:
+                continue
+            keep.add(gid)
+            pending.extend(self._components(gid))
+
+        glyf = bytearray()
+        loca = []
+        for gid in range(self.num_glyphs):
+            loca.append(len(glyf))
+            if gid in keep:
+                glyf += self._glyph_data(gid)
+                glyf += b'\0' * (-len(glyf) % 4)
+        loca.append(len(glyf))
+
+        head = bytearray(self.table('head'))
+        head[8:12] = b'\0\0\0\0'               # checkSumAdjustment (คำนวณใหม่ด้านล่าง)
+        head[50:52] = struct.pack('>h', 1)     # indexToLocFormat = long
+
+        tables = {
+            'head': bytes(head),
+            'hhea': self.table('hhea'),
+            'maxp': self.table('maxp'),
+            'hmtx': self.table('hmtx'),
+            'loca': struct.pack(f'>{len(loca)}I', *loca),
+            'glyf': bytes(glyf),
+        }
+        # คำสั่ง Hinting และตาราง cmap/OS/2 (ขนาดเล็ก แต่ PDF Viewer บางตัวต้องการ)
+        for tag in ('cvt ', 'fpgm', 'prep', 'cmap', 'OS/2'):
+            if tag in self.tables:
+                tables[tag] = self.table(tag)
+
+        num_tables = len(tables)
+        entry_selector = max(i for i in range(16) if 2 ** i <= num_tables)
+        search_range = 16 * 2 ** entry_selector
+        header = struct.pack('>IHHHH', 0x00010000, num_tables, search_range, entry_selector, num_tables * 16 - search_range)
+
+        directory = bytearray()
+        body = bytearray()
+        offset = 12 + 16 * num_tables
+        for tag in sorted(tables):
+            data = tables[tag]
+            directory += struct.pack('>4sIII', tag.encode('latin-1'), _checksum(data), offset + len(body), len(data))
+            body += data + b'\0' * (-len(data) % 4)
+
+        font = bytearray(header + directory + body)
+        head_offset = 12 + 16 * num_tables + sum(len(tables[t]) + (-len(tables[t]) % 4) for t in sorted(tables) if t < 'head')
+        struct.pack_into('>I', font, head_offset + 8, (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF)
+        return bytes(font)
+
+# =======================================================
+# STREAMING PDF WRITER
+# =======================================================
+
+class StreamingPdfWriter:
+    """
+    เขียน PDF แบบ Streaming: จัดหน้าและเขียนลงไฟล์ทีละหน้าทันทีที่หน้าเต็ม
+    (หน่วยความจำคงที่ไม่ขึ้นกับจำนวนหน้า) และฝังฟอนต์ไทยแบบ Subset ตอนปิดไฟล์
+    """
+
+    def __init__(self, file_path: str, font_path: Optional[str] = None, title: str = ''):
+        self.font = TrueTypeFont(find_thai_font(font_path))
+        self.title = title
+        self.file = open(file_path, 'wb')
+        self.offsets = {}
+        self.next_obj = 1
+
+        # จองหมายเลข Object ที่ทุกหน้าต้องอ้างถึง
+        self.catalog_obj = self._alloc()
+        self.pages_obj = self._alloc()
+        self.font_obj = self._alloc()
+        self.page_objs = []
+
+        self.glyph_unicode = {} # glyph id -> ข้อความ Unicode (สำหรับ ToUnicode/คัดลอกข้อความ)
+        self.width_cache = {}
+
+        self.max_width = PAGE_WIDTH - 2 * PAGE_MARGIN
+        self.page_ops = []
+        self.cursor_y = PAGE_HEIGHT - PAGE_MARGIN
+        self.paragraph = []
+
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    # --- Low-level Object Writing ---
+
+    def _alloc(self) -> int:
+        num = self.next_obj
+        self.next_obj += 1
+        return num
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+
+    def _write_obj(self, num: int, body: str):
+        self.offsets[num] = self.file.tell()
+        self._write(f"{num} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+
+    def _write_stream(self, num: int, data: bytes, extra: str = '', compress: bool = True):
+        if compress:
+            data = zlib.compress(data)
+            extra += ' /Filter /FlateDecode'
+        self.offsets[num] = self.file.tell()
+        self._write(f"{num} 0 obj\n<< /Length {len(data)}{extra} >>\nstream\n".encode('latin-1'))
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+
+    # --- Text Layout ---
+
+    def write_segments(self, segments: Iterable[Segment]):
+        """จัดวาง Segment Stream (ข้อความ, tag) ลงหน้า PDF โดยขึ้นบรรทัดใหม่ตาม newline"""
+        for text, tag in segments:
+            # ตัด Marker แบบข้อความล้วน ('### ', '**') เพราะ PDF ใช้ Style ของ Tag แทน
+            if tag in ('header', 'subheader') and text.startswith('### '):
+                text = text[4:]
+            text = text.replace('**', '')
+            parts = text.split('\n')
+            for i, part in enumerate(parts):
+                if i:
+                    self._flush_paragraph()
+                if part:
+                    self.paragraph.append((part, tag))
+        self._flush_paragraph()
+
+    def page_break(self):
+        """ขึ้นหน้าใหม่ (เช่น ระหว่างรายงานของลูกค้าแต่ละคน)"""
+        self._flush_paragraph()
+        if self.page_ops:
+            self._finish_page()
+
+    def _clusters(self, runs: List[Segment]) -> List[Tuple[str, str, float]]:
+        """แบ่งข้อความเป็นกลุ่มตัวอักษร (ตัวอักษรหลัก + สระ/วรรณยุกต์ที่ซ้อน) พร้อมความกว้าง"""
+        clusters = []
+        for text, tag in runs:
+            size = TAG_STYLES.get(tag, TAG_STYLES[''])[0]
+            for char in text:
+                if clusters and clusters[-1][1] == tag and (char in THAI_MARKS or char in JOINERS or unicodedata.combining(char)):
+                    prev_text, _, prev_width = clusters[-1]
+                    clusters[-1] = (prev_text + char, tag, prev_width + self._char_width(char, size))
+                else:
+                    clusters.append((char, tag, self._char_width(char, size)))
+        return clusters
+
+    def _char_width(self, char: str, size: float) -> float:
+        key = (char, size)
+        width = self.width_cache.get(key)
+        if width is None:
+            gid = self.font.glyph_id(char)
+            width = self.font.advance(gid) * size / self.font.units_per_em if gid else 0.0
+            self.width_cache[key] = width
+        return width
+
+    def _flush_paragraph(self):
+        """ตัดบรรทัดตามความกว้างหน้า (เลือกตัดที่ช่องว่างก่อน ไม่ตัดหลังสระหน้า) แล้ววาดทีละบรรทัด"""
+        runs, self.paragraph = self.paragraph, []
+        if not runs:
+            self._emit_line([], '')
+            return
+
+        line, width, last_space = [], 0.0, -1
+        for cluster in self._clusters(runs):
+            text, _, cluster_width = cluster
+            if line and width + cluster_width > self.max_width and not text.isspace():
+                if last_space >= 0:
+                    head, tail = line[:last_space], line[last_space + 1:]
+                else:
+                    cut = len(line)
+                    while cut > 1 and line[cut - 1][0] in THAI_LEADING_VOWELS:
+                        cut -= 1
+                    head, tail = line[:cut], line[cut:]
+                self._emit_line(head, runs[0][1])
+                line = tail
+                width = sum(c[2] for c in line)
+                last_space = max((i for i, c in enumerate(line) if c[0] == ' '), default=-1)
+                if not line and text == ' ':
+                    continue
+            line.append(cluster)
+            width += cluster_width
+            if text == ' ':
+                last_space = len(line) - 1
+        self._emit_line(line, runs[0][1])
+
+    def _emit_line(self, clusters: List[Tuple[str, str, float]], default_tag: str):
+        tags = [c[1] for c in clusters] or [default_tag]
+        size = max(TAG_STYLES.get(t, TAG_STYLES[''])[0] for t in tags)
+        line_height = size * LINE_SPACING
+        if self.cursor_y - line_height < PAGE_MARGIN:
+            self._finish_page()
+        baseline = self.cursor_y - size
+        self.cursor_y -= line_height
+        if not clusters:
+            return
+
+        align = TAG_STYLES.get(tags[0], TAG_STYLES[''])[3]
+        x = PAGE_MARGIN
+        if align == 'center':
+            x += max(0.0, (self.max_width - sum(c[2] for c in clusters)) / 2)
+
+        # รวม Cluster ที่ Tag เดียวกันเป็น Run เดียว
+        runs = []
+        for text, tag, _ in clusters:
+            if runs and runs[-1][1] == tag:
+                runs[-1][0].append(text)
+            else:
+                runs.append(([text], tag))
+        self.page_ops.append(self._text_ops(x, baseline, [(''.join(parts), tag) for parts, tag in runs]))
+
+    def _text_ops(self, x: float, y: float, runs: List[Tuple[str, Any]]) -> str:
+        """สร้างคำสั่ง Content Stream สำหรับข้อความหนึ่งบรรทัด (Glyph ID แบบ Identity-H)"""
+        ops = [f"BT {x:.2f} {y:.2f} Td"]
+        for text, tag in runs:
+            size, color, bold, _ = tag if isinstance(tag, tuple) else TAG_STYLES.get(tag, TAG_STYLES[''])
+            rgb = ' '.join(f"{c / 255:.3f}" for c in color)
+            ops.append(f"/F1 {size} Tf {rgb} rg {rgb} RG {'2 Tr 0.3 w' if bold else '0 Tr'}")
+            ops.append(f"<{self._encode(text)}> Tj")
+        ops.append("ET")
+        return '\n'.join(ops)
+
+    def _encode(self, text: str) -> str:
+        """แปลงข้อความเป็น Glyph ID (hex 4 หลัก) และจดจำ Glyph ที่ใช้สำหรับ Subset"""
+        hex_ids = []
+        for char in text:
+            gid = self.font.glyph_id(char)
+            if not gid: # ไม่มี Glyph ในฟอนต์ (เช่น Emoji) ให้ข้าม
+                continue
+            self.glyph_unicode.setdefault(gid, char)
+            hex_ids.append(f"{gid:04X}")
+        return ''.join(hex_ids)
+
+    def _finish_page(self):
+        """เขียนหน้าปัจจุบันลงไฟล์ แล้วเริ่มหน้าใหม่"""
+        page_number = len(self.page_objs) + 1
+        footer = f"- {page_number} -"
+        footer_width = sum(self._char_width(c, FOOTER_STYLE[0]) for c in footer)
+        self.page_ops.append(self._text_ops((PAGE_WIDTH - footer_width) / 2, PAGE_MARGIN / 2, [(footer, FOOTER_STYLE)]))
+
+        content_obj = self._alloc()
+        page_obj = self._alloc()
+        self._write_stream(content_obj, '\n'.join(self.page_ops).encode('latin-1'))
+        self._write_obj(page_obj, (
+            f"<< /Type /Page /Parent {self.pages_obj} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {self.font_obj} 0 R >> >> /Contents {content_obj} 0 R >>"
+        ))
+        self.page_objs.append(page_obj)
+        self.page_ops = []
+        self.cursor_y = PAGE_HEIGHT - PAGE_MARGIN
+
+    # --- Finalize ---
+
+    def _write_font(self):
+        """ฝังฟอนต์ Subset (CIDFontType2 + Identity-H) พร้อมตาราง ToUnicode"""
+        font = self.font
+        scale = 1000 / font.units_per_em
+        used = sorted(self.glyph_unicode)
+        tag = ''.join(chr(65 + b % 26) for b in hashlib.md5(repr(used).encode()).digest()[:6])
+        base_font = f"{tag}+{font.ps_name}"
+
+        cid_obj, descriptor_obj, file_obj, tounicode_obj = (self._alloc() for _ in range(4))
+
+        font_data = font.subset(used)
+        self._write_stream(file_obj, font_data, f" /Length1 {len(font_data)}")
+
+        bbox = ' '.join(str(round(v * scale)) for v in font.bbox)
+        self._write_obj(descriptor_obj, (
+            f"<< /Type /FontDescriptor /FontName /{base_font} /Flags 32 /FontBBox [{bbox}] "
+            f"/ItalicAngle 0 /Ascent {round(font.ascent * scale)} /Descent {round(font.descent * scale)} "
+            f"/CapHeight {round(font.ascent * scale)} /StemV 80 /FontFile2 {file_obj} 0 R >>"
+        ))
+
+        widths = ' '.join(f"{gid} [{round(font.advance(gid) * scale)}]" for gid in used)
+        self._write_obj(cid_obj, (
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_font} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor_obj} 0 R /DW 0 /W [{widths}] /CIDToGIDMap /Identity >>"
+        ))
+
+        cmap_lines = [
+            "/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+            "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+            "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange",
+        ]
+        for start in range(0, len(used), 100):
+            chunk = used[start:start + 100]
+            cmap_lines.append(f"{len(chunk)} beginbfchar")
+            cmap_lines.extend(f"<{gid:04X}> <{self.glyph_unicode[gid].encode('utf-16-be').hex().upper()}>" for gid in chunk)
+            cmap_lines.append("endbfchar")
+        cmap_lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        self._write_stream(tounicode_obj, '\n'.join(cmap_lines).encode('latin-1'))
+
+        self._write_obj(self.font_obj, (
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_font} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid_obj} 0 R] /ToUnicode {tounicode_obj} 0 R >>"
+        ))
+
+    def close(self) -> int:
+        """เขียนหน้าสุดท้าย ฟอนต์ โครงสร้างหน้า และ xref แล้วปิดไฟล์ คืนจำนวนหน้า"""
+        if self.paragraph:
+            self._flush_paragraph()
+        if self.page_ops or not self.page_objs:
+            self._finish_page()
+        self._write_font()
+
+        kids = ' '.join(f"{num} 0 R" for num in self.page_objs)
+        self._write_obj(self.pages_obj, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objs)} >>")
+        self._write_obj(self.catalog_obj, f"<< /Type /Catalog /Pages {self.pages_obj} 0 R >>")
+        info_obj = self._alloc()
+        self._write_obj(info_obj, f"<< /Title {_pdf_text_string(self.title)} /Producer (PyStone) >>")
+
+        xref_offset = self.file.tell()
+        lines = [f"xref\n0 {self.next_obj}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets[num]:010d} 00000 n \n" for num in range(1, self.next_obj)]
+        lines.append(f"trailer\n<< /Size {self.next_obj} /Root {self.catalog_obj} 0 R /Info {info_obj} 0 R >>\n")
+        lines.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        self._write(''.join(lines).encode('latin-1'))
+        self.file.close()
+        return len(self.page_objs)
+
+# =======================================================
+# CONVENIENCE FUNCTION
+# =======================================================
+
+@timed('export.pdf')
+def export_segments_to_pdf(segments: Iterable[Segment], file_path: str, font_path: Optional[str] = None, title: str = '') -> int:
+    """
+    เขียน Segment Stream (จาก format_stone_detail / _format_detail_view) เป็นไฟล์ PDF
+    segments เป็น Iterator ได้ เพื่อส่งออกรายงานยาวโดยไม่ต้องเก็บทั้งหมดไว้ในหน่วยความจำ
+    :return: จำนวนหน้าที่เขียน
+    """
+    with StreamingPdfWriter(file_path, font_path=font_path, title=title) as writer:
+        writer.write_segments(segments)
+    return len(writer.page_objs)
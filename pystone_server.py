@@ -0,0 +1,460 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, unquote
+from typing import Dict, Any, Tuple, Optional, Union
+
+from pystone_engine.catalog import Catalog
+from pystone_engine.data import DATA_FOLDER, _json_default
+from pystone_engine.loader import get_catalog, clear_catalog_cache
+from pystone_engine.shared import SharedCatalog, build_shared_catalog
+from pystone_engine.auspice import calculate_auspice_ids
+from pystone_engine.search import condition_search_params, date_search_params, add_lucky_color_param, unlucky_notes
+from pystone_engine.formatting import format_date_summary, format_condition_summary, segments_to_text
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+KEEP_ALIVE_TIMEOUT = 15       # วินาทีที่รอคำขอถัดไปบน Connection เดิม
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+RESPONSE_CACHE_SIZE = 2048    # จำนวน Response (JSON ที่ Serialize แล้ว) ที่เก็บต่อเวอร์ชันแคตตาล็อก
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024 # ขนาดรวมของ Response ใน Cache (Process เดียว)
+PREFORK_CACHE_BYTES = 4 * 1024 * 1024   # ขนาดรวมต่อ Worker ของโหมด Pre-fork (หน่วยความจำไม่โตตามแคตตาล็อก)
+RESPONSE_CACHE_MAX_RATIO = 8  # ไม่ Cache Response ที่ใหญ่กว่า 1/8 ของขนาดรวม (เช่นผลค้นหาทั้งแคตตาล็อก)
+
+LOOKUP_KEYS = ('groups', 'days', 'months', 'colors', 'animals', 'signs', 'chakra', 'element', 'numerology')
+DETAIL_LOOKUP_KEYS = ('chakra', 'element', 'numerology')
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+# =======================================================
+# SEARCH SERVICE (ไม่ขึ้นกับ Network: รับคำขอ -> คืน JSON bytes)
+# =======================================================
+
+class SearchService:
+    """
+    Endpoint ของบริการค้นหา (ตรรกะเดียวกับ filter_data / apply_auspice_filter ในหน้าหลัก)
+
+        GET  /health
+        GET  /search?mode=name&q=...
+        GET  /search?mode=group&group_id=..
+        GET  /search?mode=condition&day_id=..&month_id=..&animal_id=..&sign_id=..
+        GET  /search?mode=date&date=DD/MM/YYYY          (พ.ศ.)
+        GET  /recommend?date=DD/MM/YYYY
+        GET  /stones/<id>
+        GET  /lookups  |  /lookups/<key>  |  /lookups/<key>/detail
+        POST /search, /recommend                        (JSON body แทน Query String)
+
+    ผลลัพธ์ทุกแบบรองรับ offset / limit และถูก Cache เป็น bytes ตาม (คำขอ, เวอร์ชันแคตตาล็อก)
+    ไม่เกิน RESPONSE_CACHE_SIZE รายการและ cache_bytes รวม (Response ที่ใหญ่เกิน cache_bytes / RESPONSE_CACHE_MAX_RATIO ไม่ถูก Cache)
+    catalog เป็น Catalog (Process เดียว) หรือ SharedCatalog (Worker ของโหมด Pre-fork)
+    """
+    def __init__(self, catalog: Union[Catalog, SharedCatalog], cache_bytes: int = RESPONSE_CACHE_BYTES):
+        self.catalog = catalog
+        self.cache_bytes = cache_bytes
+        self._cache: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._cache_size = 0 # ขนาดรวมของ bytes ใน Cache
+        self._cache_version = catalog.version
+        self.hits = 0
+        self.misses = 0
+
+    def reload(self, all_data: Dict[str, Any]):
+        """เปลี่ยนข้อมูลแคตตาล็อก (Cache เก่าจะถูกทิ้งเมื่อเวอร์ชันเปลี่ยน)"""
+        self.catalog.reload(all_data)
+
+    # --- Cache ---
+
+    def handle(self, method: str, path: str, params: Dict[str, str]) -> bytes:
+        """คืน JSON bytes ของคำขอ (โยน HttpError เมื่อคำขอไม่ถูกต้อง)"""
+        if self._cache_version != self.catalog.version:
+            self._cache.clear()
+            self._cache_size = 0
+            self._cache_version = self.catalog.version
+
+        cache_key = (path, tuple(sorted(params.items())))
+        body = self._cache.get(cache_key)
+        if body is not None:
+            self._cache.move_to_end(cache_key)
+            self.hits += 1
+            return body
+
+        self.misses += 1
+        body = json.dumps(self._route(method, path, params), ensure_ascii=False, separators=(',', ':'),
+                          default=_json_default).encode('utf-8')
+        if len(body) * RESPONSE_CACHE_MAX_RATIO <= self.cache_bytes:
+            self._cache[cache_key] = body
+            self._cache_size += len(body)
+            while len(self._cache) > RESPONSE_CACHE_SIZE or self._cache_size > self.cache_bytes:
+                self._cache_size -= len(self._cache.popitem(last=False)[1])
+        return body
+
+    # --- Routing ---
+
+    def _route(self, method: str, path: str, params: Dict[str, str]) -> Any:
+        parts = [unquote(p) for p in path.strip('/').split('/') if p]
+        if method not in ('GET', 'POST'):
+            raise HttpError(405, f"ไม่รองรับ Method {method}")
+        if method == 'POST' and parts[:1] not in (['search'], ['recommend']):
+            raise HttpError(405, "POST ใช้ได้เฉพาะ /search และ /recommend")
+
+        if parts == ['health']:
+            return {'status': 'ok', 'version': self.catalog.version, 'stones': len(self.catalog.stones)}
+        if parts == ['search']:
+            return self.search(params)
+        if parts == ['recommend']:
+            return self.search(dict(params, mode='date'))
+        if len(parts) == 2 and parts[0] == 'stones':
+            return self.stone_detail(parts[1])
+        if parts == ['lookups']:
+            return {'lookups': list(LOOKUP_KEYS)}
+        if len(parts) in (2, 3) and parts[0] == 'lookups':
+            return self.lookup(parts[1], detail=len(parts) == 3 and parts[2] == 'detail')
+        raise HttpError(404, f"ไม่พบ {path}")
+
+    # --- Endpoints ---
+
+    def search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        mode = params.get('mode', 'name')
+        all_data = self.catalog.data
+        day_id = 0
+        summary = None
+
+        if mode == 'name':
+            stones = self.catalog.search_name(params.get('q', ''))
+        elif mode == 'group':
+            group_id = _int_param(params, 'group_id')
+            stones = self.catalog.search(condition_search_params(group_id=group_id)) if group_id else list(self.catalog.stones)
+        elif mode == 'condition':
+            ids = {key: _int_param(params, key) for key in ('day_id', 'month_id', 'animal_id', 'sign_id')}
+            if not any(ids.values()):
+                raise HttpError(400, "กรุณาเลือกเงื่อนไขอย่างน้อยหนึ่งข้อ")
+            day_id = ids['day_id']
+            stones = self.catalog.search(add_lucky_color_param(condition_search_params(**ids), day_id, all_data))
+        elif mode == 'date':
+            date_th = params.get('date', '').strip()
+            if not date_th:
+                raise HttpError(400, "กรุณาระบุ date (วัน/เดือน/พ.ศ.)")
+            auspice_result = calculate_auspice_ids(date_th, all_data)
+            if 'error' in auspice_result:
+                raise HttpError(400, auspice_result['error'])
+            day_id = auspice_result['day_id']
+            stones = self.catalog.search(add_lucky_color_param(date_search_params(auspice_result), day_id, all_data))
+        else:
+            raise HttpError(400, f"ไม่รู้จัก mode '{mode}' (name, group, condition, date)")
+
+        notes = unlucky_notes(stones, day_id, all_data)
+        results = [_stone_with_unlucky(stone, notes.get(stone['id'], '')) for stone in stones]
+        unlucky_count = len(notes)
+        if mode == 'date':
+            summary = format_date_summary(auspice_result, all_data, unlucky_count)
+        elif mode == 'condition' and day_id:
+            summary = format_condition_summary(day_id, all_data, unlucky_count)
+
+        offset = _int_param(params, 'offset')
+        limit = _int_param(params, 'limit') or len(results)
+        response = {
+            'mode': mode,
+            'count': len(results),
+            'unlucky_count': unlucky_count,
+            'offset': offset,
+            'stones': results[offset:offset + limit],
+        }
+        if summary is not None:
+            response['summary'] = summary
+        if mode == 'date':
+            response['auspice'] = auspice_result
+        return response
+
+    def stone_detail(self, stone_id: str) -> Dict[str, Any]:
+        stone = self.catalog.stone(int(stone_id)) if stone_id.isdigit() else None
+        if stone is None:
+            raise HttpError(404, f"ไม่พบหิน ID {stone_id}")
+        segments = self.catalog.detail(stone)
+        return {'stone': dict(stone.items()), 'text': segments_to_text(segments), 'segments': segments}
+
+    def lookup(self, key: str, detail: bool = False) -> Dict[str, Any]:
+        if key not in LOOKUP_KEYS:
+            raise HttpError(404, f"ไม่พบ Lookup '{key}'")
+        if not detail:
+            return {'key': key, 'items': self.catalog.data.get(key, [])}
+        if key not in DETAIL_LOOKUP_KEYS:
+            raise HttpError(404, f"Lookup '{key}' ไม่มีหน้ารายละเอียด")
+        segments = self.catalog.lookup_detail(key)
+        return {'key': key, 'text': segments_to_text(segments), 'segments': segments}
+
+def _int_param(params: Dict[str, str], key: str) -> int:
+    value = str(params.get(key, '') or '0').strip()
+    if not value.isdigit():
+        raise HttpError(400, f"{key} ต้องเป็นตัวเลข")
+    return int(value)
+
+def _stone_with_unlucky(stone: Dict[str, Any], note: str) -> Dict[str, Any]:
+    """สำเนาหินพร้อม is_unlucky / unlucky_note ของคำขอนี้ (note จาก unlucky_notes, ไม่แก้หินในแคตตาล็อก)"""
+    return dict(stone.items(), is_unlucky=bool(note), unlucky_note=note)
+
+# =======================================================
+# HTTP/1.1 SERVER (asyncio, Keep-alive + Pipelining)
+# =======================================================
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+    """อ่านคำขอ 1 รายการ คืน None เมื่อ Client ปิด Connection"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HttpError(400, "คำขอไม่สมบูรณ์")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "Header ใหญ่เกินไป")
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400, "Request line ไม่ถูกต้อง")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    body = b''
+    length = headers.get('content-length', '0')
+    if not length.isdigit():
+        raise HttpError(400, "Content-Length ไม่ถูกต้อง")
+    if int(length) > MAX_BODY_BYTES:
+        raise HttpError(413, "Body ใหญ่เกินไป")
+    if int(length):
+        body = await reader.readexactly(int(length))
+    return method.upper(), target, version, headers, body
+
+def _request_params(target: str, body: bytes) -> Tuple[str, Dict[str, str]]:
+    url = urlsplit(target)
+    params = dict(parse_qsl(url.query, keep_blank_values=True))
+    if body:
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise HttpError(400, "Body ต้องเป็น JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "Body ต้องเป็น JSON Object")
+        params.update({k: str(v) for k, v in payload.items()})
+    return url.path, params
+
+def _response(status: int, body: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        f"\r\n"
+    )
+    return head.encode('latin-1') + body
+
+def _error_body(message: str) -> bytes:
+    return json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+class SearchServer:
+    """
+    HTTP Server บน asyncio ที่เก็บแคตตาล็อกและ Index ไว้ในหน่วยความจำ
+    คำขอที่ส่งต่อกันบน Connection เดียว (Pipelining) ถูกตอบตามลำดับ
+    """
+    def __init__(self, service: SearchService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 sock: Optional[socket.socket] = None):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.sock = sock # Socket ที่เปิดไว้แล้ว (โหมด Pre-fork: ทุก Worker รับ Connection จาก Socket เดียวกัน)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        if self.sock is not None:
+            self._server = await asyncio.start_server(self._handle_connection, sock=self.sock, limit=MAX_HEADER_BYTES)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1] # กรณี port=0 (ให้ระบบเลือก)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as e:
+                    writer.write(_response(e.status, _error_body(str(e)), keep_alive=False))
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers, body = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+                try:
+                    path, params = _request_params(target, body)
+                    status, payload = 200, self.service.handle(method, path, params)
+                except HttpError as e:
+                    status, payload = e.status, _error_body(str(e))
+                except Exception as e:
+                    status, payload = 500, _error_body(f"เกิดข้อผิดพลาด: {e}")
+
+                # คำขอที่ Pipeline มาแล้วรออยู่ใน Buffer ของ reader จะถูกอ่านในรอบถัดไปตามลำดับ
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, RuntimeError):
+                pass
+
+# =======================================================
+# PRE-FORK (หลาย Process อ่านแคตตาล็อกในไฟล์ mmap เดียวกัน)
+# =======================================================
+
+def _run_worker(sock: socket.socket, segment_path: str):
+    """Worker: mmap ไฟล์แคตตาล็อกแบบอ่านอย่างเดียว แล้วรับคำขอจาก Socket ที่แชร์กัน"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C ให้ Process หลักจัดการ
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    server = SearchServer(SearchService(SharedCatalog(segment_path), PREFORK_CACHE_BYTES), sock=sock)
+    asyncio.run(server.serve_forever())
+
+def _build_segment(data_folder: str, segment_path: str, generation: int) -> int:
+    """
+    โหลดไฟล์ผ่าน get_catalog (compact + ตรวจข้อมูลเหมือนทุกโปรแกรม) และเขียนไฟล์แคตตาล็อกแบบแชร์
+    แล้วลืมแคตตาล็อกนั้น: Process หลักไม่ค้างข้อมูลไว้ และ SIGHUP ครั้งถัดไปอ่านไฟล์ใหม่
+    """
+    clear_catalog_cache(data_folder)
+    try:
+        catalog = get_catalog(data_folder, log=print)
+        build_shared_catalog(catalog.data, segment_path, generation)
+        return len(catalog.stones)
+    finally:
+        clear_catalog_cache(data_folder)
+
+def serve_prefork(host: str, port: int, data_folder: str, workers: int, segment_path: Optional[str] = None):
+    """
+    สร้างไฟล์แคตตาล็อก + Index ครั้งเดียวใน Process หลัก แล้ว fork Worker จำนวน workers
+    Worker ทุกตัว mmap ไฟล์เดียวกันแบบอ่านอย่างเดียว (หน่วยความจำต่อ Worker ไม่โตตามขนาดแคตตาล็อก)
+
+    SIGHUP: โหลดข้อมูลใหม่ สร้างไฟล์ใหม่แล้วสลับด้วย os.replace (Worker เห็นภายใน REFRESH_INTERVAL)
+    SIGINT/SIGTERM: หยุด Worker ทั้งหมด
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("โหมด Pre-fork ต้องใช้ระบบที่รองรับ os.fork (Linux/macOS)")
+
+    segment_path = segment_path or os.path.join(tempfile.gettempdir(), f"pystone-{os.getpid()}.catalog")
+    generation = 1
+    stone_count = _build_segment(data_folder, segment_path, generation)
+
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.setblocking(False)
+    children: Dict[int, int] = {} # pid -> ลำดับ Worker
+    state = {'reload': False, 'stop': False}
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(sock, segment_path)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+
+    signal.signal(signal.SIGHUP, lambda *_: state.update(reload=True))
+    signal.signal(signal.SIGTERM, lambda *_: state.update(stop=True))
+    signal.signal(signal.SIGINT, lambda *_: state.update(stop=True))
+
+    for slot in range(workers):
+        spawn(slot)
+    print(f"--- PyStone Search Service: http://{host}:{sock.getsockname()[1]} "
+          f"({stone_count} หิน, {workers} Worker, {segment_path}) ---")
+
+    try:
+        while not state['stop']:
+            if state['reload']:
+                state['reload'] = False
+                try:
+                    stone_count = _build_segment(data_folder, segment_path, generation + 1)
+                    generation += 1
+                    print(f"🔄 โหลดข้อมูลใหม่ (generation {generation}, {stone_count} หิน)")
+                except Exception as e:
+                    print(f"❌ โหลดข้อมูลใหม่ไม่สำเร็จ (ใช้ข้อมูลเดิมต่อ): {e}")
+
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid and pid in children and not state['stop']:
+                print(f"⚠️ Worker {pid} หยุดทำงาน: เริ่มใหม่")
+                spawn(children.pop(pid))
+            time.sleep(0.2)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
+        try:
+            os.remove(segment_path)
+        except OSError:
+            pass
+
+# =======================================================
+# COMMAND LINE
+# =======================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="บริการค้นหาหินมงคล (HTTP/JSON)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data', default=DATA_FOLDER, help='โฟลเดอร์ข้อมูล JSON')
+    parser.add_argument('--workers', type=int, default=0, help='จำนวน Worker Process (0 = Process เดียว)')
+    parser.add_argument('--segment', default=None, help='path ไฟล์แคตตาล็อกแบบแชร์ของโหมด Pre-fork')
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        serve_prefork(args.host, args.port, args.data, args.workers, args.segment)
+        sys.exit(0)
+
+    catalog = get_catalog(args.data, log=print) # สร้าง Index ก่อนรับคำขอแรก
+    server = SearchServer(SearchService(catalog), args.host, args.port)
+    print(f"--- PyStone Search Service: http://{args.host}:{args.port} ({len(catalog.stones)} หิน) ---")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("หยุดบริการ")
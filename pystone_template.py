@@ -0,0 +1,34 @@
+"""
+Deprecated: Template Engine ย้ายไปอยู่ที่ pystone_engine.template แล้ว
+โมดูลนี้เป็นเพียงชื่อเดิมที่ Re-export ให้ Script เก่า (แจ้ง DeprecationWarning เมื่อ Import)
+โค้ดใหม่ให้ใช้ `from pystone_engine.template import ...` หรือ `from pystone_engine import get_template`
+
+ยังใช้เป็นคำสั่งได้: python pystone_template.py [โฟลเดอร์] คัดลอก Template เริ่มต้นออกมาให้แก้ไข
+"""
+import sys
+import warnings
+
+from pystone_engine.template import (
+    TEMPLATE_FOLDER, TEMPLATE_EXT, MISSING, DEFAULT_TEMPLATES, Segment, TemplateError, Template,
+    compile_template, template_path, get_template, render_template, clear_template_cache, export_default_templates,
+)
+
+__all__ = [
+    'TEMPLATE_FOLDER', 'TEMPLATE_EXT', 'MISSING', 'DEFAULT_TEMPLATES', 'Segment', 'TemplateError', 'Template',
+    'compile_template', 'template_path', 'get_template', 'render_template', 'clear_template_cache',
+    'export_default_templates',
+]
+
+if __name__ != "__main__":
+    warnings.warn("pystone_template ถูกแทนที่ด้วย pystone_engine.template", DeprecationWarning, stacklevel=2)
+
+# =======================================================
+# EXAMPLE USAGE
+# =======================================================
+
+if __name__ == "__main__":
+    # python pystone_template.py [โฟลเดอร์]  -> คัดลอก Template เริ่มต้นออกมาให้แก้ไข
+    target = sys.argv[1] if len(sys.argv) > 1 else TEMPLATE_FOLDER
+    for path in export_default_templates(target):
+        print(f"✅ เขียน {path}")
+    print(f"แก้ไขไฟล์ {TEMPLATE_EXT} ในโฟลเดอร์ '{target}' เพื่อปรับรูปแบบรายงาน (ไม่ต้องแก้โค้ด)")
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from logging.handlers import RotatingFileHandler
+from typing import Any, Optional, Tuple
+
+from pystone_engine.timing import record_timing
+
+# =======================================================
+# CONFIGURATION
+# =======================================================
+HEARTBEAT_MS = 100 # ความถี่ของ Heartbeat บน Event Loop
+# Event Loop ค้างนานกว่านี้ (ms) ถือเป็น Stall (ปรับได้ด้วย PYSTONE_STALL_MS, 0 = ปิด Watchdog)
+STALL_THRESHOLD_MS = int(os.environ.get('PYSTONE_STALL_MS', '500') or 0)
+
+STALL_LOG_FILE = 'pystone_stalls.log'
+STALL_LOG_MAX_BYTES = 1024 * 1024
+STALL_LOG_BACKUPS = 3
+
+_TK_SOURCE = f"{os.sep}tkinter{os.sep}"
+
+# =======================================================
+# HELPER FUNCTIONS
+# =======================================================
+
+def _stall_logger(log_path: str) -> logging.Logger:
+    """Logger ของไฟล์ Stall (หมุนไฟล์เมื่อเกิน STALL_LOG_MAX_BYTES) ไม่ส่งต่อไปยัง Root Logger"""
+    logger = logging.getLogger(f'pystone.stall.{os.path.abspath(log_path)}')
+    if not logger.handlers:
+        handler = RotatingFileHandler(log_path, maxBytes=STALL_LOG_MAX_BYTES, backupCount=STALL_LOG_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def handler_name(stack: traceback.StackSummary) -> str:
+    """
+    ชื่อ Handler ที่ Event Loop เรียกอยู่: เฟรมแรกของโปรแกรมถัดจาก tkinter (mainloop -> CallWrapper)
+    ข้าม lambda ของ bind/command เพื่อให้ได้ Method จริง เช่น filter_data, save_stone
+    """
+    seen_tk = False
+    for frame in stack:
+        if _TK_SOURCE in frame.filename:
+            seen_tk = True
+        elif seen_tk and frame.name != '<lambda>':
+            return frame.name
+    return stack[-1].name if stack else 'unknown'
+
+# =======================================================
+# STALL WATCHDOG
+# =======================================================
+
+class StallWatchdog:
+    """
+    ตรวจจับช่วงที่ Tk Event Loop ค้าง (หน้าจอไม่ตอบสนอง)
+    - Heartbeat ด้วย after() ทุก HEARTBEAT_MS และวัดว่าแต่ละครั้งมาช้ากว่ากำหนดเท่าใด
+    - Thread เบื้องหลังเก็บ Stack ของ Main Thread ระหว่างที่ยังค้างอยู่ (เห็นว่า Handler ใดทำงานนานเกิน)
+    - เมื่อ Heartbeat กลับมา บันทึกเวลาค้าง, ชื่อ Handler และ Stack ลงไฟล์แบบหมุนเวียน และ Histogram 'stall'
+
+    ต้องสร้างบน Main Thread (Thread เดียวกับ mainloop)
+    """
+    def __init__(self, widget: Any, threshold_ms: int = STALL_THRESHOLD_MS, heartbeat_ms: int = HEARTBEAT_MS,
+                 log_path: str = STALL_LOG_FILE):
+        self.widget = widget
+        self.threshold_s = threshold_ms / 1000
+        self.heartbeat_ms = heartbeat_ms
+        self.logger = _stall_logger(log_path)
+        self.stall_count = 0
+        self._main_thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._expected = 0.0 # เวลาที่ Heartbeat ถัดไปควรทำงาน (time.monotonic)
+        self._sample: Optional[Tuple[str, str]] = None # (handler, stack) ของ Stall ที่กำลังเกิด
+        self._after_id = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._schedule()
+        self._thread = threading.Thread(target=self._monitor, name='pystone-stall-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _schedule(self):
+        with self._lock:
+            self._expected = time.monotonic() + self.heartbeat_ms / 1000
+        self._after_id = self.widget.after(self.heartbeat_ms, self._tick)
+
+    def _tick(self):
+        late = time.monotonic() - self._expected
+        with self._lock:
+            sample, self._sample = self._sample, None
+        if late >= self.threshold_s:
+            self._report(late, sample)
+        if not self._stop_event.is_set():
+            self._schedule()
+
+    def _monitor(self):
+        """Thread เบื้องหลัง: เก็บ Stack ของ Main Thread ครั้งเดียวต่อ Stall เมื่อค้างเกิน Threshold"""
+        while not self._stop_event.wait(self.threshold_s / 2):
+            with self._lock:
+                if self._sample is not None or time.monotonic() - self._expected < self.threshold_s:
+                    continue
+                frame = sys._current_frames().get(self._main_thread_id)
+                if frame is None:
+                    continue
+                stack = traceback.extract_stack(frame)
+                del frame
+                self._sample = (handler_name(stack), ''.join(stack.format()))
+
+    def _report(self, late: float, sample: Optional[Tuple[str, str]]):
+        self.stall_count += 1
+        record_timing('stall', late)
+        handler, stack = sample or ('unknown', '(Stack ไม่ถูกเก็บ: Heartbeat กลับมาก่อน Thread เบื้องหลังตรวจพบ)\n')
+        self.logger.warning(f"STALL {late * 1000:.0f} ms handler={handler}\n{stack}")
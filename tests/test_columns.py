@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from pystone_engine import columns as columns_module
+from pystone_engine.catalog import Catalog
+from pystone_engine.columns import ColumnStore
+from pystone_engine.data import load_all_data
+from pystone_engine.index import RELATION_FIELDS
+from pystone_engine.records import compact_stones
+from pystone_engine.search import add_lucky_color_param, apply_auspice_filter, search_by_name, unlucky_notes
+from pystone_export import iter_column_rows, iter_export_rows
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+SEARCHES = [
+    {'group_id': '1'},
+    {'day_id': '4', 'month_id': '8'},
+    add_lucky_color_param({'day_id': '7', 'sign_id': '5'}, 7, load_all_data(DATA_FOLDER)),
+]
+
+@pytest.fixture(scope='module')
+def catalog():
+    all_data = load_all_data(DATA_FOLDER)
+    all_data['stones'] = compact_stones(all_data['stones'])
+    return Catalog(all_data)
+
+@pytest.fixture(params=[False, True], ids=['python', 'numpy'])
+def use_numpy(request, monkeypatch):
+    if request.param and columns_module.numpy is None:
+        pytest.skip("ไม่มี numpy")
+    monkeypatch.setattr(columns_module, 'USE_NUMPY', request.param)
+    monkeypatch.setattr('pystone_engine.catalog.USE_NUMPY', request.param)
+
+def test_rows_round_trip_including_other_keys():
+    stones = [{'id': 3, 'english_name': 'A', 'thai_name': 'ก', 'other_names': '', 'description': 'ไทย',
+               'color_ids': '1 300', 'good_days': '01', 'revision': 2},
+              {'id': 'x', 'thai_name': 'ข', 'english_name': None, 'color_ids': ''}]
+    store = ColumnStore(stones)
+    assert [dict(row) for row in store] == stones
+    assert list(store.relation_ids(0, 'color_ids')) == [1, 300]
+    assert store.stone(3)['good_days'] == '01' and store.stone('x') is None
+
+def test_search_matches_linear_filter(catalog, use_numpy):
+    for params in SEARCHES:
+        expected = [s['id'] for s in apply_auspice_filter(catalog.stones, params)]
+        assert [s['id'] for s in catalog.search(params)] == expected
+        assert [catalog.stones[pos]['id'] for pos in catalog.columns.match_positions(params)] == expected
+
+def test_search_name_matches_search_by_name(catalog, use_numpy):
+    for term in ('a', 'หิน', 'QUARTZ', '', 'zzz'):
+        assert catalog.search_name(term) == search_by_name(catalog.stones, term)
+
+def test_facet_counts_match_index(catalog, use_numpy):
+    index = catalog.index
+    for field in RELATION_FIELDS:
+        expected = {rel_id: len(ids) for rel_id, ids in index.postings[field].items() if ids}
+        assert catalog.facet_counts(field) == expected
+        assert catalog.columns.facet_counts(field) == expected
+    base = SEARCHES[2]
+    matched = {s['id'] for s in catalog.search(base)}
+    expected = {rel_id: len(matched & ids) for rel_id, ids in index.postings['good_months'].items() if matched & ids}
+    assert catalog.facet_counts('good_months', base) == expected
+
+def test_unlucky_notes_match_search(catalog):
+    positions = range(len(catalog.columns))
+    assert catalog.columns.unlucky_notes(positions, 7, catalog.data) == unlucky_notes(catalog.stones, 7, catalog.data)
+
+def test_column_export_rows_match_record_rows(catalog):
+    notes = unlucky_notes(catalog.stones, 7, catalog.data)
+    stones = catalog.search(SEARCHES[1])
+    rows = list(iter_column_rows(catalog.columns, catalog.positions(stones), catalog.data, notes))
+    assert rows == list(iter_export_rows(stones, catalog.data, notes))
+
+def test_columns_are_rebuilt_after_apply_stones():
+    stones = compact_stones([{'id': 1, 'english_name': 'A', 'thai_name': 'ก', 'other_names': '', 'color_ids': '1'}])
+    catalog = Catalog({'stones': stones})
+    assert [catalog.stones[p]['id'] for p in catalog.columns.search_name('a')] == [1]
+    new = compact_stones([{'id': 1, 'english_name': 'B', 'thai_name': 'ข', 'other_names': '', 'color_ids': '1'}])
+    catalog.apply_stones(new, stones, new)
+    assert catalog.search_name('a') == [] and catalog.search_name('b') == new
@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+from pystone_engine.catalog import Catalog
+from pystone_engine.data import load_all_data
+from pystone_engine.records import StoneRecord, compact_stones
+from pystone_server import SearchService, LOOKUP_KEYS, DETAIL_LOOKUP_KEYS, RESPONSE_CACHE_MAX_RATIO
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+@pytest.fixture(scope='module')
+def service():
+    all_data = load_all_data(DATA_FOLDER)
+    all_data['stones'] = compact_stones(all_data['stones'])
+    return SearchService(Catalog(all_data))
+
+def _get(service, path, **params):
+    return json.loads(service.handle('GET', path, params))
+
+ENDPOINTS = [
+    ('/health', {}),
+    ('/search', {'mode': 'name', 'q': 'a'}),
+    ('/search', {'mode': 'group', 'group_id': '1'}),
+    ('/search', {'mode': 'condition', 'day_id': '3', 'month_id': '8'}),
+    ('/search', {'mode': 'date', 'date': '25/08/2530', 'limit': '5'}),
+    ('/recommend', {'date': '25/08/2530'}),
+    ('/lookups', {}),
+] + [(f'/lookups/{key}', {}) for key in LOOKUP_KEYS] + [(f'/lookups/{key}/detail', {}) for key in DETAIL_LOOKUP_KEYS]
+
+@pytest.mark.parametrize('path, params', ENDPOINTS)
+def test_endpoints_with_compact_catalog(service, path, params):
+    assert _get(service, path, **params)
+
+def test_stone_detail_serializes_stone_record(service):
+    stone = service.catalog.stones[0]
+    assert isinstance(stone, StoneRecord)
+    body = _get(service, f"/stones/{stone['id']}")
+    assert body['stone'] == dict(stone.items())
+    assert body['text']
+
+def test_response_cache_is_bounded_by_bytes(service):
+    small = SearchService(service.catalog, cache_bytes=256 * 1024)
+    full_catalog = small.handle('GET', '/search', {'mode': 'name', 'q': ''})
+    assert len(full_catalog) * RESPONSE_CACHE_MAX_RATIO > small.cache_bytes
+    assert small._cache == {} # ผลค้นหาทั้งแคตตาล็อกใหญ่เกินกว่าจะ Cache
+
+    for stone in service.catalog.stones:
+        small.handle('GET', f"/stones/{stone['id']}", {})
+    assert 0 < small._cache_size <= small.cache_bytes
+    assert small._cache_size == sum(len(body) for body in small._cache.values())
+
+def test_search_does_not_flag_catalog_stones(service):
+    before = [dict(stone.items()) for stone in service.catalog.stones]
+    body = _get(service, '/search', mode='condition', day_id='7')
+    assert body['unlucky_count'] == sum(1 for stone in body['stones'] if stone['is_unlucky']) > 0
+    assert [dict(stone.items()) for stone in service.catalog.stones] == before
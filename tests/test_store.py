@@ -0,0 +1,147 @@
+import json
+import os
+
+import pytest
+
+from pystone_engine import store
+from pystone_engine.catalog import Catalog
+from pystone_engine.data import LockTimeout, file_stamp, write_json_atomic
+from pystone_engine.records import compact_stones
+from pystone_engine.store import (
+    REVISION_KEY, merge_save_records, record_change, referencing_stones, cascade_lookup_change,
+)
+from pystone_engine.watch import diff_stones, patch_stones
+
+FILENAME = 'lookup_test.json'
+
+def _base(record_id, **fields):
+    return {'id': record_id, 'name': f'item {record_id}', 'note': '', REVISION_KEY: 1, **fields}
+
+@pytest.fixture
+def folder(tmp_path):
+    write_json_atomic(os.path.join(tmp_path, FILENAME), [_base(1), _base(2)])
+    return str(tmp_path)
+
+def _disk(folder):
+    with open(os.path.join(folder, FILENAME), encoding='utf-8') as f:
+        return {r['id']: r for r in json.load(f)}
+
+def _edit_on_disk(folder, record_id, **fields):
+    """จำลองผู้ใช้อื่นบันทึกรายการก่อนเรา"""
+    records = list(_disk(folder).values())
+    for r in records:
+        if r['id'] == record_id:
+            r.update(fields, **{REVISION_KEY: r[REVISION_KEY] + 1})
+    write_json_atomic(os.path.join(folder, FILENAME), records)
+
+def test_unchanged_revision_applies_and_bumps_revision(folder):
+    result = merge_save_records(FILENAME, [record_change(_base(1), _base(1, name='new'))], folder)
+    assert (result['applied'], result['conflicts']) == (1, [])
+    assert _disk(folder)[1]['name'] == 'new'
+    assert _disk(folder)[1][REVISION_KEY] == 2
+
+def test_different_fields_are_merged(folder):
+    _edit_on_disk(folder, 1, note='theirs')
+    result = merge_save_records(FILENAME, [record_change(_base(1), _base(1, name='mine'))], folder)
+    assert result['conflicts'] == []
+    assert (_disk(folder)[1]['name'], _disk(folder)[1]['note']) == ('mine', 'theirs')
+
+def test_same_field_conflict_keeps_disk_value(folder):
+    _edit_on_disk(folder, 1, name='theirs')
+    result = merge_save_records(FILENAME, [record_change(_base(1), _base(1, name='mine'))], folder)
+    assert result['applied'] == 0
+    assert result['conflicts'] == [{'id': 1, 'reason': "ถูกแก้ไขโดยผู้ใช้อื่น", 'fields': ['name']}]
+    assert _disk(folder)[1]['name'] == 'theirs'
+
+def test_delete_of_record_edited_by_others_is_conflict(folder):
+    _edit_on_disk(folder, 2, note='theirs')
+    result = merge_save_records(FILENAME, [record_change(_base(2), None)], folder)
+    assert [c['id'] for c in result['conflicts']] == [2]
+    assert 2 in _disk(folder)
+
+def test_edit_of_record_deleted_by_others_is_conflict(folder):
+    merge_save_records(FILENAME, [record_change(_base(2), None)], folder)
+    result = merge_save_records(FILENAME, [record_change(_base(2), _base(2, name='mine'))], folder)
+    assert [c['id'] for c in result['conflicts']] == [2]
+    assert 2 not in _disk(folder)
+
+def test_new_record_with_taken_id_is_renumbered(folder):
+    result = merge_save_records(FILENAME, [record_change(None, {'id': 2, 'name': 'added'})], folder)
+    assert result['renumbered'] == {2: 3}
+    assert _disk(folder)[3]['name'] == 'added'
+    assert _disk(folder)[2]['name'] == 'item 2'
+
+def test_validator_rejects_record(folder):
+    def validator(record):
+        return [{'key': 'test', 'id': record['id'], 'field': 'name', 'message': 'ห้ามว่าง'}] if not record['name'] else []
+    result = merge_save_records(FILENAME, [record_change(_base(1), _base(1, name=''))], folder, validator=validator)
+    assert result['applied'] == 0
+    assert result['conflicts'][0]['fields'] == ['name']
+    assert _disk(folder)[1]['name'] == 'item 1'
+
+def test_base_stamp_is_the_file_that_was_merged(folder):
+    before = file_stamp(os.path.join(folder, FILENAME))
+    result = merge_save_records(FILENAME, [record_change(_base(1), _base(1, name='new'))], folder)
+    assert result['base_stamp'] == before != file_stamp(os.path.join(folder, FILENAME))
+
+def test_all_or_nothing_writes_nothing_on_conflict(folder):
+    _edit_on_disk(folder, 2, name='theirs')
+    changes = [record_change(_base(1), _base(1, name='mine')), record_change(_base(2), _base(2, name='mine'))]
+    result = merge_save_records(FILENAME, changes, folder, all_or_nothing=True)
+    assert (result['applied'], [c['id'] for c in result['conflicts']]) == (0, [2])
+    assert (_disk(folder)[1]['name'], _disk(folder)[2]['name']) == ('item 1', 'theirs')
+    assert [r['name'] for r in result['records']] == ['item 1', 'theirs']
+
+def test_write_during_merge_is_retried_from_latest_file(folder, monkeypatch):
+    write_temp = store.write_json_temp
+    calls = []
+    def racing_write_temp(path, content):
+        if not calls:
+            _edit_on_disk(folder, 2, note='theirs') # ผู้อื่นบันทึกหลังเราอ่านไฟล์
+        calls.append(path)
+        return write_temp(path, content)
+    monkeypatch.setattr(store, 'write_json_temp', racing_write_temp)
+
+    result = merge_save_records(FILENAME, [record_change(_base(1), _base(1, name='mine'))], folder)
+    assert (result['applied'], len(calls)) == (1, 2)
+    assert (_disk(folder)[1]['name'], _disk(folder)[2]['note']) == ('mine', 'theirs')
+    assert [name for name in os.listdir(folder) if name.endswith('.tmp')] == []
+
+def test_gives_up_when_file_keeps_changing(folder, monkeypatch):
+    write_temp = store.write_json_temp
+    def racing_write_temp(path, content):
+        _edit_on_disk(folder, 2, note='theirs')
+        return write_temp(path, content)
+    monkeypatch.setattr(store, 'write_json_temp', racing_write_temp)
+
+    with pytest.raises(LockTimeout):
+        merge_save_records(FILENAME, [record_change(_base(1), _base(1, name='mine'))], folder)
+    assert _disk(folder)[1]['name'] == 'item 1'
+
+def _catalog():
+    stones = [{'id': 10, 'english_name': 'A', 'thai_name': 'ก', 'color_ids': '1 2'},
+              {'id': 5, 'english_name': 'B', 'thai_name': 'ข', 'color_ids': '2'},
+              {'id': 7, 'english_name': 'C', 'thai_name': 'ค', 'color_ids': '3 2 3'}]
+    return Catalog({'stones': compact_stones(stones), 'colors': [{'id': i} for i in (1, 2, 3)]})
+
+def test_referencing_stones_in_catalog_order():
+    catalog = _catalog()
+    assert [s['id'] for s in referencing_stones(catalog, 'colors', 2)] == [10, 5, 7]
+    assert [s['id'] for s in referencing_stones(catalog, 'colors', 3)] == [7]
+    assert referencing_stones(catalog, 'colors', 4) == []
+
+def test_cascade_removes_or_replaces_lookup_id():
+    catalog = _catalog()
+    removed = {c['id']: c['updated']['color_ids'] for c in cascade_lookup_change(catalog, 'colors', 2)}
+    assert removed == {10: '1', 5: '', 7: '3'}
+    replaced = {c['id']: c['updated']['color_ids'] for c in cascade_lookup_change(catalog, 'colors', 3, 1)}
+    assert replaced == {7: '1 2'}
+
+def test_patch_stones_matches_diff_of_saved_records():
+    old = compact_stones(_catalog().stones)
+    saved = {10: {**old[0], 'english_name': 'A2'}, 5: None, 8: {'id': 8, 'english_name': 'D', 'thai_name': 'ง'}}
+    new_stones, removed, added = patch_stones(old, saved)
+    assert [s['id'] for s in new_stones] == [10, 7, 8]
+    assert new_stones[1] is old[2]
+    expected = diff_stones(old, new_stones)
+    assert ([s['id'] for s in removed], [s['id'] for s in added]) == ([s['id'] for s in expected[0]], [s['id'] for s in expected[1]])